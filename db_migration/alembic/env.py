@@ -14,6 +14,8 @@ from models.db.city_model import City
 from models.db.country_model import Country
 from models.db.state_model import State
 from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.earthquake_event_model import EarthquakeCatalogSync, EarthquakeEvent
+from models.db.reverse_geocode_model import ReverseGeocode
 
 load_dotenv()  # Load .env file
 
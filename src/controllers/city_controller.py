@@ -1,22 +1,15 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
+from helper.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_PAGE_HEADER, next_page_after_id
 from models.schemas.city_schema import CityCreate, CityResponse
 from services.city_service import CityService
+from services.container import get_city_service
 
 city_router = APIRouter()
 
 
-def get_city_service():
-    """
-    Returns an instance of the CityService class.
-
-    :return: CityService instance
-    """
-    return CityService()
-
-
 @city_router.post(
     "/v1/cities/", response_model=CityResponse, status_code=status.HTTP_201_CREATED
 )
@@ -47,9 +40,25 @@ def add_city(
 
 
 @city_router.get("/v1/cities/", response_model=List[CityResponse])
-def list_cities(city_service: CityService = Depends(get_city_service)):
+def list_cities(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    state_id: Optional[int] = None,
+    country_id: Optional[int] = None,
+    city_service: CityService = Depends(get_city_service),
+):
     """
-    Retrieve a list of cities.
+    Retrieve one page of cities, ordered by ID.
+
+    When the page is full, the `X-Next-After-Id` response header holds the
+    `after_id` of the next page.
+
+    Args:
+        limit (int): The maximum number of cities of the page.
+        after_id (int): The ID of the last city of the previous page.
+        state_id (int): The ID of the state whose cities are listed.
+        country_id (int): The ID of the country whose cities are listed.
 
     Returns:
         List[CityResponse]: A list of city responses.
@@ -58,7 +67,10 @@ def list_cities(city_service: CityService = Depends(get_city_service)):
         HTTPException: If there is a validation error (status code 400) or an unexpected error occurs (status code 500).
     """
     try:
-        cities = city_service.get_cities()
+        cities = city_service.get_cities(limit, after_id, state_id, country_id)
+        next_after_id = next_page_after_id(cities, limit)
+        if next_after_id is not None:
+            response.headers[NEXT_PAGE_HEADER] = str(next_after_id)
         return cities
     except ValueError as e: #pragma: no cover
         raise HTTPException(status_code=400, detail=str(e)) from e
@@ -1,20 +1,15 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
+from helper.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_PAGE_HEADER, next_page_after_id
 from models.schemas.country_schema import CountryCreate, CountryResponse
+from services.container import get_country_service
 from services.country_service import CountryService
 
 country_router = APIRouter()
 
 
-def get_country_service():
-    """
-    Dependency injector function that creates an instance of the CountryService class.
-    """
-    return CountryService()
-
-
 @country_router.post(
     "/v1/countries/",
     response_model=CountryResponse,
@@ -44,14 +39,26 @@ def add_country(
         raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e: #pragma: no cover
         raise HTTPException(
-            status_code=500, detail=f"An unexpected error occurred {e}"
+            status_code=500, detail="An unexpected error occurred"
         ) from e
 
 
 @country_router.get("/v1/countries/", response_model=List[CountryResponse])
-def list_countries(country_service: CountryService = Depends(get_country_service)):
+def list_countries(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    country_service: CountryService = Depends(get_country_service),
+):
     """
-    Retrieve a list of countries.
+    Retrieve one page of countries, ordered by ID.
+
+    When the page is full, the `X-Next-After-Id` response header holds the
+    `after_id` of the next page.
+
+    Args:
+        limit (int): The maximum number of countries of the page.
+        after_id (int): The ID of the last country of the previous page.
 
     Returns:
         List[CountryResponse]: A list of countries.
@@ -60,7 +67,10 @@ def list_countries(country_service: CountryService = Depends(get_country_service
         HTTPException: If there is a client-side error (status code 400) or an unexpected error occurs (status code 500).
     """
     try:
-        countries = country_service.get_countries()
+        countries = country_service.get_countries(limit, after_id)
+        next_after_id = next_page_after_id(countries, limit)
+        if next_after_id is not None:
+            response.headers[NEXT_PAGE_HEADER] = str(next_after_id)
         return countries
     except ValueError as e: #pragma: no cover
         raise HTTPException(status_code=400, detail=str(e)) from e
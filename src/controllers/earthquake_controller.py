@@ -1,53 +1,351 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+import json
+import os
+from typing import Optional
 
-from models.schemas.earthquake_schema import EarthquakeModel, EarthquakeResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Response
+from fastapi.responses import StreamingResponse
+
+from helper.result_cache import etag, etag_matches
+from models.schemas.earthquake_schema import (
+    EarthquakeBatchQuery,
+    EarthquakeBatchResponse,
+    EarthquakeModel,
+    EarthquakeNearbyResponse,
+    EarthquakeResponse,
+)
 from services.city_service import CityService
+from services.container import get_city_service, get_earthquake_service
+from services.earthquake_catalog_service import MIN_MAGNITUDE
 from services.earthquake_service import EarthquakeService
 
 earthquake_router = APIRouter()
 
 
+# Registered before the single city route, whose path would otherwise capture "batch".
+@earthquake_router.post("/v1/earthquakes/batch", response_model=EarthquakeBatchResponse)
+async def get_closest_earthquakes(
+    batch_query: EarthquakeBatchQuery,
+    city_service: CityService = Depends(get_city_service),
+    earthquake_service: EarthquakeService = Depends(get_earthquake_service),
+)-> EarthquakeBatchResponse:
+    """
+    Get the closest earthquake to each of many cities within one date range.
+
+    The cities are given by ID or as every city of a state or country. The
+    earthquake catalog is loaded once for the whole batch; at most
+    `EARTHQUAKE_BATCH_MAX_CITIES` cities are accepted.
+
+    Args:
+        batch_query (EarthquakeBatchQuery): The selected cities and the date range.
+        city_service (CityService): The service for retrieving city information.
+        earthquake_service (EarthquakeService): The service for processing earthquake data.
+
+    Returns:
+        EarthquakeBatchResponse: The closest earthquake information of every city, ordered by city ID.
+
+    Raises:
+        HTTPException: If a city is not found, the batch is too large, the dates are invalid
+        or there is an internal server error.
+    """
+    try:
+        cities = await city_service.find_cities_async(
+            batch_query.city_ids, batch_query.state_id, batch_query.country_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if batch_query.city_ids is not None:
+        missing = sorted(set(batch_query.city_ids) - {city.id for city in cities})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Cities not found: {missing}")
+    max_cities = int(os.getenv("EARTHQUAKE_BATCH_MAX_CITIES", "1000"))
+    if len(cities) > max_cities:
+        raise HTTPException(
+            status_code=400, detail=f"A batch may contain at most {max_cities} cities."
+        )
+
+    queries = [batch_city_query(city, batch_query) for city in cities]
+    try:
+        results = await earthquake_service.closest_earthquakes_batch_async(
+            queries, batch_query.start_date, batch_query.end_date
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return EarthquakeBatchResponse(results=results)
+
+
+@earthquake_router.post("/v1/earthquakes/batch/stream")
+async def stream_closest_earthquakes(
+    batch_query: EarthquakeBatchQuery,
+    output_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|sse)$", description="ndjson or sse"
+    ),
+    city_service: CityService = Depends(get_city_service),
+    earthquake_service: EarthquakeService = Depends(get_earthquake_service),
+)-> StreamingResponse:
+    """
+    Stream the closest earthquake to each of many cities within one date range.
+
+    Cities are read with a server-side cursor in chunks of
+    `EARTHQUAKE_STREAM_CHUNK_SIZE`, and the results of each chunk are sent
+    as soon as they are computed, so memory stays flat however many cities
+    a state or country holds. Each result is a JSON line (NDJSON) or a
+    Server-Sent Event; an error after the stream started is sent as a last
+    `{"error": ...}` record. Unknown city IDs are skipped.
+
+    Args:
+        batch_query (EarthquakeBatchQuery): The selected cities and the date range.
+        output_format (str): The stream format, "ndjson" or "sse".
+        city_service (CityService): The service for retrieving city information.
+        earthquake_service (EarthquakeService): The service for processing earthquake data.
+
+    Returns:
+        StreamingResponse: The results of every city, ordered by city ID.
+
+    Raises:
+        HTTPException: If the dates are invalid.
+    """
+    try:
+        earthquake_service.convert_date(batch_query.start_date)
+        earthquake_service.convert_date(batch_query.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    chunk_size = int(os.getenv("EARTHQUAKE_STREAM_CHUNK_SIZE", "100"))
+
+    async def query_chunks():
+        async for cities in city_service.iter_cities_async(
+            batch_query.city_ids, batch_query.state_id, batch_query.country_id, chunk_size
+        ):
+            yield [batch_city_query(city, batch_query) for city in cities]
+
+    async def records():
+        try:
+            async for result in earthquake_service.iter_closest_earthquakes_async(
+                query_chunks(), batch_query.start_date, batch_query.end_date
+            ):
+                yield format_record(result, output_format)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield format_record({"error": detail}, output_format, event="error")
+
+    media_type = "text/event-stream" if output_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(records(), media_type=media_type)
+
+
+def batch_city_query(city, batch_query: EarthquakeBatchQuery)-> EarthquakeModel:
+    """
+    Builds the earthquake query of one city of a batch.
+
+    Args:
+        city (City): The city, with its state loaded.
+        batch_query (EarthquakeBatchQuery): The batch query holding the date range.
+
+    Returns:
+        EarthquakeModel: The query of the city.
+    """
+    return EarthquakeModel(
+        city_id=city.id,
+        city_name=city.name,
+        state_abbreviation=city.state.state_abbreviation if city.state else "",
+        start_date=batch_query.start_date,
+        end_date=batch_query.end_date,
+        latitude=city.latitude,
+        longitude=city.longitude,
+    )
+
+
+def format_record(record: dict, output_format: str, event: Optional[str] = None)-> str:
+    """
+    Formats one record of a result stream.
+
+    Args:
+        record (dict): The record.
+        output_format (str): "ndjson" for a JSON line, "sse" for a Server-Sent Event.
+        event (str): The event type of a Server-Sent Event, if not the default one.
+
+    Returns:
+        str: The formatted record.
+    """
+    data = json.dumps(record)
+    if output_format == "sse":
+        return (f"event: {event}\n" if event else "") + f"data: {data}\n\n"
+    return data + "\n"
+
+
 @earthquake_router.post("/v1/earthquakes/{city_id}", response_model=EarthquakeResponse)
-def get_closest_earthquake(
+async def get_closest_earthquake(
+    response: Response,
     city_id: int = Path(..., description="The ID of the city"),
     start_date: str = Query(..., description="The start date of the date range"),
     end_date: str = Query(..., description="The end date of the date range"),
-    city_service: CityService = Depends(),
-    earthquake_service: EarthquakeService = Depends(),
+    if_none_match: Optional[str] = Header(None),
+    earthquake_service: EarthquakeService = Depends(get_earthquake_service),
 )-> EarthquakeResponse:
     """
     Get the closest earthquake to a given city within a specified date range.
 
+    Results are cached by city and date range, and concurrent identical
+    queries share one computation. On a miss the city, its state, its stored
+    coordinates and any reusable recorded search are read with one query,
+    and the earthquake catalog is only loaded when there is no such search;
+    the new search is recorded on the same session. No step blocks the
+    event loop.
+
     Args:
+        response (Response): The response, used to set the cache headers.
         city_id (int): The ID of the city.
         start_date (str): The start date of the date range.
         end_date (str): The end date of the date range.
-        city_service (CityService): The service for retrieving city information.
+        if_none_match (str): The ETags of the results already held by the client.
         earthquake_service (EarthquakeService): The service for processing earthquake data.
 
     Returns:
-        EarthquakeResponse: The response containing the closest earthquake information.
+        EarthquakeResponse: The response containing the closest earthquake information,
+        or an empty 304 response when the client already holds it.
 
     Raises:
         HTTPException: If the city is not found or if there is an internal server error.
     """
+
+    async def compute() -> dict:
+        result = await earthquake_service.closest_earthquake_for_city_async(city_id, start_date, end_date)
+        if result is None:
+            raise HTTPException(status_code=404, detail="City not found")
+        return result
+
     try:
-        city = city_service.get_city_by_id(city_id)
+        ttl = earthquake_service.result_ttl(end_date)
+        result, cached = await earthquake_service.result_cache.get_or_compute(
+            earthquake_service.result_cache_key(city_id, start_date, end_date), compute, ttl
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        return EarthquakeResponse(message=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    not_modified = apply_cache_headers(response, result, ttl, cached, if_none_match)
+    if not_modified is not None:
+        return not_modified
+    return EarthquakeResponse(message=result["message"])
+
+
+@earthquake_router.post(
+    "/v1/earthquakes/{city_id}/nearby", response_model=EarthquakeNearbyResponse
+)
+async def get_nearby_earthquakes(
+    response: Response,
+    city_id: int = Path(..., description="The ID of the city"),
+    start_date: str = Query(..., description="The start date of the date range"),
+    end_date: str = Query(..., description="The end date of the date range"),
+    mode: str = Query("top_k", pattern="^(top_k|radius)$", description="top_k or radius"),
+    k: int = Query(
+        10,
+        ge=1,
+        le=1000,
+        description="The number of earthquakes of a top_k query, or the maximum number of a radius query",
+    ),
+    radius_km: Optional[float] = Query(None, gt=0, description="The radius of a radius query in kilometers"),
+    min_magnitude: float = Query(MIN_MAGNITUDE, ge=-2, le=10, description="The minimum magnitude"),
+    if_none_match: Optional[str] = Header(None),
+    city_service: CityService = Depends(get_city_service),
+    earthquake_service: EarthquakeService = Depends(get_earthquake_service),
+)-> EarthquakeNearbyResponse:
+    """
+    Get the k earthquakes nearest to a city, or every earthquake within a radius of it, ranked by distance.
+
+    Results are cached like those of the closest earthquake endpoint.
+
+    Args:
+        response (Response): The response, used to set the cache headers.
+        city_id (int): The ID of the city.
+        start_date (str): The start date of the date range.
+        end_date (str): The end date of the date range.
+        mode (str): "top_k" for the k nearest earthquakes, "radius" for those within `radius_km`.
+        k (int): The number of earthquakes of a top_k query, or the maximum number of a radius query.
+        radius_km (float): The radius of a radius query in kilometers.
+        min_magnitude (float): The minimum magnitude of the earthquakes.
+        if_none_match (str): The ETags of the results already held by the client.
+        city_service (CityService): The service for retrieving city information.
+        earthquake_service (EarthquakeService): The service for processing earthquake data.
+
+    Returns:
+        EarthquakeNearbyResponse: The ranked earthquakes, or an empty 304 response when the
+        client already holds them.
+
+    Raises:
+        HTTPException: If the query is invalid, the city is not found or there is an internal server error.
+    """
+    if mode == "radius" and radius_km is None:
+        raise HTTPException(status_code=400, detail="radius_km is required in radius mode.")
+    radius = radius_km if mode == "radius" else None
+
+    async def compute() -> dict:
+        try:
+            city = await city_service.get_city_by_id_async(city_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e)) from e
         if not city:
             raise HTTPException(status_code=404, detail="City not found")
-
-        state_abbreviation = city.state.state_abbreviation if city.state else ""
         query = EarthquakeModel(
             city_id=city_id,
             city_name=city.name,
-            state_abbreviation=state_abbreviation,
+            state_abbreviation=city.state.state_abbreviation if city.state else "",
             start_date=start_date,
             end_date=end_date,
+            latitude=city.latitude,
+            longitude=city.longitude,
+        )
+        return await earthquake_service.nearby_earthquakes_result_async(
+            query, k, radius, min_magnitude
         )
 
-        result = earthquake_service.process_earthquake_data(query)
-        return EarthquakeResponse(message=result["message"])
+    try:
+        ttl = earthquake_service.result_ttl(end_date)
+        result, cached = await earthquake_service.result_cache.get_or_compute(
+            earthquake_service.nearby_cache_key(
+                city_id, start_date, end_date, k, radius, min_magnitude
+            ),
+            compute,
+            ttl,
+        )
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+    not_modified = apply_cache_headers(response, result, ttl, cached, if_none_match)
+    if not_modified is not None:
+        return not_modified
+    return EarthquakeNearbyResponse(**result)
+
+
+def apply_cache_headers(response, result, ttl, cached, if_none_match)-> Optional[Response]:
+    """
+    Sets the ETag, Cache-Control and X-Cache headers of a cached result.
+
+    Args:
+        response (Response): The response of the endpoint.
+        result (dict): The result.
+        ttl (float): The time to live of the result in seconds.
+        cached (bool): Whether the result was served from the cache.
+        if_none_match (str): The ETags of the results already held by the client.
+
+    Returns:
+        Response or None: An empty 304 response when the client already holds the result.
+    """
+    headers = {
+        "ETag": etag(result),
+        "Cache-Control": f"max-age={int(ttl)}",
+        "X-Cache": "HIT" if cached else "MISS",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,53 @@
+import asyncio
+import io
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from models.schemas.import_schema import ImportSummary
+from services.container import get_import_service
+from services.import_service import IMPORT_FORMATS, ImportService
+
+import_router = APIRouter()
+
+
+@import_router.post("/v1/import/", response_model=ImportSummary)
+async def import_places(request: Request, import_service: ImportService = Depends(get_import_service)):
+    """
+    Imports countries, states and cities in bulk from the request body.
+
+    The body is a CSV file with a header line (`text/csv`), one JSON object
+    per line (`application/x-ndjson`) or a JSON array (`application/json`),
+    whose rows hold `country`, `state`, `state_abbreviation`, `city`,
+    `latitude` and `longitude`. The body is streamed to a temporary file and
+    imported in batches off the event loop; invalid rows are reported in the
+    summary instead of failing the import.
+
+    Returns:
+        ImportSummary: The number of rows read and created, and the rejected rows.
+
+    Raises:
+        HTTPException: If the content type is not supported (status code 415), the file cannot be read
+            (status code 400) or an unexpected error occurs (status code 500).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    file_format = IMPORT_FORMATS.get(content_type)
+    if file_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content type. Use one of: {', '.join(IMPORT_FORMATS)}.",
+        )
+    try:
+        # A real file: SpooledTemporaryFile only supports TextIOWrapper from Python 3.11.
+        with tempfile.TemporaryFile() as upload:
+            async for chunk in request.stream():
+                upload.write(chunk)
+            upload.seek(0)
+            text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+            return await asyncio.to_thread(import_service.import_file, text, file_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e: #pragma: no cover
+        raise HTTPException(
+            status_code=500, detail="An unexpected error occurred"
+        ) from e
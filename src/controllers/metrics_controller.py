@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from helper.metrics import collect_metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/v1/metrics")
+def get_metrics() -> dict:
+    """
+    Retrieve runtime metrics for monitoring.
+
+    Returns:
+        dict: The metrics of every registered subsystem, keyed by section name.
+    """
+    return collect_metrics()
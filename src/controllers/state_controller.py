@@ -1,20 +1,15 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
+from helper.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_PAGE_HEADER, next_page_after_id
 from models.schemas.state_schema import StateCreate, StateResponse
+from services.container import get_state_service
 from services.state_service import StateService
 
 state_router = APIRouter()
 
 
-def get_state_service():
-    """
-    Returns an instance of the StateService class.
-    """
-    return StateService()
-
-
 @state_router.post(
     "/v1/states/", response_model=StateResponse, status_code=status.HTTP_201_CREATED
 )
@@ -45,9 +40,23 @@ def add_state(
 
 
 @state_router.get("/v1/states/", response_model=List[StateResponse])
-def list_states(state_service: StateService = Depends(get_state_service)):
+def list_states(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    country_id: Optional[int] = None,
+    state_service: StateService = Depends(get_state_service),
+):
     """
-    Retrieve a list of states.
+    Retrieve one page of states, ordered by ID.
+
+    When the page is full, the `X-Next-After-Id` response header holds the
+    `after_id` of the next page.
+
+    Args:
+        limit (int): The maximum number of states of the page.
+        after_id (int): The ID of the last state of the previous page.
+        country_id (int): The ID of the country whose states are listed.
 
     Returns:
         List[StateResponse]: A list of state responses.
@@ -56,7 +65,10 @@ def list_states(state_service: StateService = Depends(get_state_service)):
         HTTPException: If there is a validation error (status code 400) or an unexpected error occurs (status code 500).
     """
     try:
-        states = state_service.get_states()
+        states = state_service.get_states(limit, after_id, country_id)
+        next_after_id = next_page_after_id(states, limit)
+        if next_after_id is not None:
+            response.headers[NEXT_PAGE_HEADER] = str(next_after_id)
         return states
     except ValueError as e: #pragma: no cover
         raise HTTPException(status_code=400, detail=str(e)) from e
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a time to live.
+
+    When the cache is full the least recently used entry is evicted. Hits,
+    misses, evictions and expirations are counted for monitoring.
+
+    Attributes:
+        maxsize (int): The maximum number of entries.
+        ttl (float): The default time to live of an entry in seconds, or None to never expire.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.monotonic):
+        self.maxsize = int(maxsize)
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value of a key and marks it as recently used.
+
+        Args:
+            key (Hashable): The key.
+            default: The value returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self._timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=_MISSING):
+        """
+        Stores a value, evicting the least recently used entry when the cache is full.
+
+        Args:
+            key (Hashable): The key.
+            value: The value.
+            ttl (float): The time to live in seconds; defaults to the cache TTL, None never expires.
+        """
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = None if ttl is None else self._timer() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """
+        Removes a key from the cache.
+
+        Args:
+            key (Hashable): The key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self) -> list:
+        """
+        Returns a snapshot of the keys in the cache, including expired ones not yet removed.
+
+        Returns:
+            list: The keys, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def statistics(self) -> dict:
+        """
+        Returns the size and the hit, miss, eviction and expiration counters of the cache.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
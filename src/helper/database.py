@@ -1,29 +1,332 @@
+import asyncio
 import json
 import os
-from contextlib import contextmanager
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from helper.metrics import register_metrics
 
 Base = declarative_base()
 
+_engines: Dict[str, Engine] = {}
+_session_factories: Dict[str, sessionmaker] = {}
+_async_engines: Dict[str, AsyncEngine] = {}
+_async_session_factories: Dict[str, async_sessionmaker] = {}
+_registry_lock = threading.Lock()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait to obtain a connection.
+
+    The measured time covers both waiting for a pooled connection to be
+    returned and opening a new one when the pool is allowed to grow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._wait_lock:
+                self.wait_count += 1
+                self.wait_time_total += elapsed
+                self.wait_time_max = max(self.wait_time_max, elapsed)
+
+    def recreate(self):
+        # Carry the wait statistics over when the engine is disposed.
+        pool = super().recreate()
+        pool.wait_count = self.wait_count
+        pool.wait_time_total = self.wait_time_total
+        pool.wait_time_max = self.wait_time_max
+        return pool
+
 
 def create_session(database_url: str) -> Session:
-    session = sessionmaker(bind=get_connection(database_url))
-    return session()
+    return get_session_factory(database_url)()
 
 
 @contextmanager
-def session_scope():
+def session_scope(database_url: str = "DATABASE_URL"):
     """Provide a transactional scope around a series of operations."""
-    session = create_session("DATABASE_URL")
+    session = create_session(database_url)
     try:
         yield session
     finally:
         session.close()
 
 
+def get_engine(database_url: str = "DATABASE_URL") -> Engine:
+    """
+    Returns the process-wide engine for the given environment variable.
+
+    The engine (and its connection pool) is created on first use and reused
+    by every later call until `dispose_engines` is called.
+
+    Args:
+        database_url (str): The name of the environment variable holding the connection string.
+
+    Returns:
+        Engine: The shared SQLAlchemy engine.
+    """
+    engine = _engines.get(database_url)
+    if engine is None:
+        with _registry_lock:
+            engine = _engines.get(database_url)
+            if engine is None:
+                engine = get_connection(database_url)
+                _engines[database_url] = engine
+    return engine
+
+
+def get_session_factory(database_url: str = "DATABASE_URL") -> sessionmaker:
+    """
+    Returns the cached session factory bound to the shared engine.
+
+    Args:
+        database_url (str): The name of the environment variable holding the connection string.
+
+    Returns:
+        sessionmaker: The session factory.
+    """
+    factory = _session_factories.get(database_url)
+    if factory is None:
+        engine = get_engine(database_url)
+        with _registry_lock:
+            factory = _session_factories.get(database_url)
+            if factory is None:
+                factory = sessionmaker(bind=engine)
+                _session_factories[database_url] = factory
+    return factory
+
+
+def dispose_engines():
+    """Closes every pooled connection and clears the engine registry."""
+    with _registry_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+        _session_factories.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def get_async_session_factory(database_url: str = "DATABASE_URL") -> Optional[async_sessionmaker]:
+    """
+    Returns the cached async session factory for the given environment variable.
+
+    The async connection string is read from the same variable name prefixed
+    with `ASYNC_` (for example `ASYNC_DATABASE_URL`). When it is not set the
+    database has no async driver configured and None is returned.
+
+    Args:
+        database_url (str): The name of the environment variable holding the sync connection string.
+
+    Returns:
+        async_sessionmaker or None: The async session factory.
+    """
+    factory = _async_session_factories.get(database_url)
+    if factory is None:
+        connection_string = os.getenv(f"ASYNC_{database_url}")
+        if not connection_string:
+            return None
+        with _registry_lock:
+            factory = _async_session_factories.get(database_url)
+            if factory is None:
+                engine = create_async_engine(
+                    connection_string,
+                    echo=os.getenv("ECHO_SQL", "false").lower() == "true",
+                    **get_pool_options(connection_string, async_driver=True),
+                )
+                factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+                _async_engines[database_url] = engine
+                _async_session_factories[database_url] = factory
+    return factory
+
+
+async def run_with_session(function: Callable, *args, database_url: str = "DATABASE_URL"):
+    """
+    Runs `function(session, *args)` without blocking the event loop.
+
+    With an async driver configured the function runs on an async session
+    through `AsyncSession.run_sync`; otherwise it runs on a regular session
+    in a worker thread. Either way the same synchronous query code serves
+    both the sync and the async endpoints.
+
+    Args:
+        function (Callable): The function to run, receiving a `Session` as first argument.
+        *args: Extra positional arguments for the function.
+        database_url (str): The name of the environment variable holding the connection string.
+
+    Returns:
+        The return value of the function.
+    """
+    factory = get_async_session_factory(database_url)
+    if factory is None:
+
+        def run():
+            with session_scope(database_url) as session:
+                return function(session, *args)
+
+        return await asyncio.to_thread(run)
+    async with factory() as session:
+        return await session.run_sync(function, *args)
+
+
+@asynccontextmanager
+async def session_runner(database_url: str = "DATABASE_URL") -> AsyncIterator[Callable]:
+    """
+    Keeps one session open across several steps of a request, without blocking the event loop.
+
+    Yields an awaitable `run(function, *args)` that runs `function(session, *args)`
+    like `run_with_session`, but every call gets the same session, so a request
+    reading and then writing the database uses one session instead of one per
+    step. The session is closed on exit.
+
+    Args:
+        database_url (str): The name of the environment variable holding the connection string.
+
+    Yields:
+        Callable: The runner of the functions.
+    """
+    factory = get_async_session_factory(database_url)
+    if factory is None:
+        session = create_session(database_url)
+        try:
+            yield lambda function, *args: asyncio.to_thread(function, session, *args)
+        finally:
+            await asyncio.to_thread(session.close)
+        return
+    async with factory() as session:
+        yield lambda function, *args: session.run_sync(function, *args)
+
+
+async def stream_partitions(
+    statement, size: int, database_url: str = "DATABASE_URL"
+) -> AsyncIterator[List]:
+    """
+    Yields the ORM objects selected by a statement in partitions of at most `size` rows.
+
+    Rows are fetched with `yield_per`, which reads them through a server-side
+    cursor where the driver supports one, so only one partition is held in
+    memory at a time. With an async driver configured the rows are streamed
+    from an async session; otherwise each partition is fetched from a
+    regular session in a worker thread.
+
+    Args:
+        statement (Select): The select statement of the ORM entity.
+        size (int): The number of rows of each partition.
+        database_url (str): The name of the environment variable holding the connection string.
+
+    Yields:
+        List: The next partition of ORM objects.
+    """
+    statement = statement.execution_options(yield_per=size)
+    factory = get_async_session_factory(database_url)
+    if factory is not None:
+        async with factory() as session:
+            result = await session.stream_scalars(statement)
+            async for partition in result.partitions():
+                yield partition
+        return
+
+    session = create_session(database_url)
+    try:
+        partitions = (await asyncio.to_thread(session.scalars, statement)).partitions()
+        while (partition := await asyncio.to_thread(next, partitions, None)) is not None:
+            yield partition
+    finally:
+        await asyncio.to_thread(session.close)
+
+
+async def dispose_async_engines():
+    """Closes every pooled async connection and clears the async engine registry."""
+    with _registry_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+        _async_session_factories.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+def get_pool_statistics() -> dict:
+    """
+    Returns connection pool statistics for every registered engine.
+
+    Returns:
+        dict: Pool statistics keyed by environment variable name.
+    """
+    statistics = {}
+    engines = list(_engines.items()) + [
+        (f"ASYNC_{database_url}", engine.sync_engine)
+        for database_url, engine in list(_async_engines.items())
+    ]
+    for database_url, engine in engines:
+        pool = engine.pool
+        stats = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        if isinstance(pool, InstrumentedQueuePool):
+            stats.update(
+                wait_count=pool.wait_count,
+                wait_time_total_ms=round(pool.wait_time_total * 1000, 3),
+                wait_time_max_ms=round(pool.wait_time_max * 1000, 3),
+            )
+        statistics[database_url] = stats
+    return statistics
+
+
+def get_pool_options(connection_string: str, async_driver: bool = False) -> dict:
+    """
+    Builds the connection pool options from the environment.
+
+    Pool sizing options are only applied to server databases; SQLite keeps the
+    pool class chosen by SQLAlchemy. Async engines keep SQLAlchemy's async
+    queue pool, which cannot record wait times.
+
+    Args:
+        connection_string (str): The connection string of the database.
+        async_driver (bool): Whether the options are for an async engine.
+
+    Returns:
+        dict: Keyword arguments for `create_engine`.
+    """
+    options = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"}
+    if make_url(connection_string).get_backend_name() == "sqlite":
+        return options
+
+    if not async_driver:
+        options["poolclass"] = InstrumentedQueuePool
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    )
+    return options
+
+
 def get_connection(database_url):
     mssql_connection_string = os.getenv(database_url)
 
@@ -37,12 +340,21 @@ def get_connection(database_url):
         else None
     )
 
+    options = get_pool_options(mssql_connection_string)
+    if make_url(mssql_connection_string).get_driver_name() == "pyodbc":
+        # Sends the parameters of `executemany` (bulk inserts) in one round trip.
+        options["fast_executemany"] = True
+
     return create_engine(
         mssql_connection_string,
         echo=echo_sql,
         execution_options=sqlalchemy_execution_options,
+        **options,
     )
 
 
 def is_sqlite(session: Session = None):
     return session.get_bind().name == "sqlite"
+
+
+register_metrics("database_pools", get_pool_statistics)
@@ -0,0 +1,231 @@
+import heapq
+
+import numpy as np
+from geopy.distance import geodesic
+
+EARTH_RADIUS_KM = 6371.0088
+# Upper bound of the relative difference between the spherical (haversine)
+# distance and the WGS-84 geodesic distance.
+SPHERICAL_RELATIVE_ERROR = 0.006
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes) -> np.ndarray:
+    """
+    Computes the great-circle distance from one point to many points in a single vectorized pass.
+
+    The origin may also be given as arrays, in which case the distances are
+    computed element-wise.
+
+    Args:
+        latitude (float): The latitude of the origin in degrees.
+        longitude (float): The longitude of the origin in degrees.
+        latitudes (np.ndarray): The latitudes of the destinations in degrees.
+        longitudes (np.ndarray): The longitudes of the destinations in degrees.
+
+    Returns:
+        np.ndarray: The distances in kilometers.
+    """
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    half_dlat = (lat2 - lat1) * 0.5
+    half_dlon = np.radians(np.asarray(longitudes) - longitude) * 0.5
+    a = np.sin(half_dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(half_dlon) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def geodesic_km(origin, latitude, longitude) -> float:
+    """
+    Computes the exact WGS-84 geodesic distance between two points.
+
+    Args:
+        origin (tuple): The latitude and longitude of the origin.
+        latitude (float): The latitude of the destination.
+        longitude (float): The longitude of the destination.
+
+    Returns:
+        float: The distance in kilometers.
+    """
+    return geodesic(origin, (float(latitude), float(longitude))).kilometers
+
+
+def spherical_bound(distance_km) -> float:
+    """
+    Returns the largest spherical distance that may still be geodesically
+    closer than a point at the given spherical distance.
+
+    Args:
+        distance_km (float): The spherical distance in kilometers.
+
+    Returns:
+        float: The bound in kilometers.
+    """
+    return distance_km * (1 + SPHERICAL_RELATIVE_ERROR) / (1 - SPHERICAL_RELATIVE_ERROR)
+
+
+def refine_candidates(origin, candidates, latitudes, longitudes) -> tuple:
+    """
+    Picks the geodesically nearest point among candidates pre-selected by spherical distance.
+
+    Args:
+        origin (tuple): The latitude and longitude of the origin.
+        candidates (np.ndarray): The indices of the candidate points.
+        latitudes (np.ndarray): The latitudes of all points.
+        longitudes (np.ndarray): The longitudes of all points.
+
+    Returns:
+        tuple: The index of the nearest point and its geodesic distance in kilometers.
+    """
+    best_index, best_distance = None, float("inf")
+    for index in candidates:
+        distance = geodesic_km(origin, latitudes[index], longitudes[index])
+        if distance < best_distance:
+            best_index, best_distance = int(index), distance
+    return best_index, best_distance
+
+
+def nearest_point(latitude, longitude, latitudes, longitudes) -> tuple:
+    """
+    Finds the point nearest to the origin.
+
+    Distances are computed with the vectorized haversine formula and only the
+    few candidates within the spherical error bound of the minimum are
+    refined with the exact geodesic distance.
+
+    Args:
+        latitude (float): The latitude of the origin in degrees.
+        longitude (float): The longitude of the origin in degrees.
+        latitudes (np.ndarray): The latitudes of the points in degrees.
+        longitudes (np.ndarray): The longitudes of the points in degrees.
+
+    Returns:
+        tuple: The index of the nearest point and its geodesic distance in kilometers,
+        or (None, inf) when there are no points.
+    """
+    if len(latitudes) == 0:
+        return None, float("inf")
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    candidates = np.flatnonzero(distances <= spherical_bound(distances.min()))
+    return refine_candidates((latitude, longitude), candidates, latitudes, longitudes)
+
+
+def nearest_points(latitudes, longitudes, point_latitudes, point_longitudes, max_cells=4_000_000) -> list:
+    """
+    Finds the point nearest to each of several origins.
+
+    The origins × points haversine matrix is computed in blocks of rows of
+    at most `max_cells` distances, and only the candidates within the
+    spherical error bound of each row minimum are refined with the exact
+    geodesic distance.
+
+    Args:
+        latitudes (np.ndarray): The latitudes of the origins in degrees.
+        longitudes (np.ndarray): The longitudes of the origins in degrees.
+        point_latitudes (np.ndarray): The latitudes of the points in degrees.
+        point_longitudes (np.ndarray): The longitudes of the points in degrees.
+        max_cells (int): The maximum number of distances computed at once.
+
+    Returns:
+        list: For each origin, the index of the nearest point and its geodesic distance
+        in kilometers, or (None, inf) when there are no points.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if len(point_latitudes) == 0:
+        return [(None, float("inf"))] * len(latitudes)
+    rows = max(1, max_cells // len(point_latitudes))
+    results = []
+    for start in range(0, len(latitudes), rows):
+        block_latitudes = latitudes[start : start + rows]
+        block_longitudes = longitudes[start : start + rows]
+        matrix = haversine_km(
+            block_latitudes[:, None],
+            block_longitudes[:, None],
+            point_latitudes[None, :],
+            point_longitudes[None, :],
+        )
+        bounds = spherical_bound(matrix.min(axis=1))
+        for latitude, longitude, distances, bound in zip(
+            block_latitudes, block_longitudes, matrix, bounds
+        ):
+            results.append(
+                refine_candidates(
+                    (float(latitude), float(longitude)),
+                    np.flatnonzero(distances <= bound),
+                    point_latitudes,
+                    point_longitudes,
+                )
+            )
+    return results
+
+
+def refine_nearest_k(origin, candidates, latitudes, longitudes, k) -> list:
+    """
+    Picks the k geodesically nearest points among candidates pre-selected by spherical distance.
+
+    Args:
+        origin (tuple): The latitude and longitude of the origin.
+        candidates (np.ndarray): The indices of the candidate points.
+        latitudes (np.ndarray): The latitudes of all points.
+        longitudes (np.ndarray): The longitudes of all points.
+        k (int): The number of points to return.
+
+    Returns:
+        list: Tuples of point index and geodesic distance in kilometers, nearest first.
+    """
+    distances = (
+        (int(index), geodesic_km(origin, latitudes[index], longitudes[index])) for index in candidates
+    )
+    return heapq.nsmallest(k, distances, key=lambda result: result[1])
+
+
+def nearest_k_points(latitude, longitude, latitudes, longitudes, k) -> list:
+    """
+    Finds the k points nearest to the origin.
+
+    A partial selection over the vectorized haversine distances finds the
+    k-th smallest spherical distance; only the points within its spherical
+    error bound are refined with the exact geodesic distance.
+
+    Args:
+        latitude (float): The latitude of the origin in degrees.
+        longitude (float): The longitude of the origin in degrees.
+        latitudes (np.ndarray): The latitudes of the points in degrees.
+        longitudes (np.ndarray): The longitudes of the points in degrees.
+        k (int): The number of points to return.
+
+    Returns:
+        list: Tuples of point index and geodesic distance in kilometers, nearest first.
+    """
+    k = min(int(k), len(latitudes))
+    if k <= 0:
+        return []
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    kth_distance = np.partition(distances, k - 1)[k - 1]
+    candidates = np.flatnonzero(distances <= spherical_bound(kth_distance))
+    return refine_nearest_k((latitude, longitude), candidates, latitudes, longitudes, k)
+
+
+def points_within_radius(latitude, longitude, latitudes, longitudes, radius_km) -> list:
+    """
+    Finds every point within a geodesic radius of the origin.
+
+    Args:
+        latitude (float): The latitude of the origin in degrees.
+        longitude (float): The longitude of the origin in degrees.
+        latitudes (np.ndarray): The latitudes of the points in degrees.
+        longitudes (np.ndarray): The longitudes of the points in degrees.
+        radius_km (float): The radius in kilometers.
+
+    Returns:
+        list: Tuples of point index and geodesic distance in kilometers, nearest first.
+    """
+    if len(latitudes) == 0:
+        return []
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    candidates = np.flatnonzero(distances <= radius_km / (1 - SPHERICAL_RELATIVE_ERROR))
+    results = []
+    for index in candidates:
+        distance = geodesic_km((latitude, longitude), latitudes[index], longitudes[index])
+        if distance <= radius_km:
+            results.append((int(index), distance))
+    return sorted(results, key=lambda result: result[1])
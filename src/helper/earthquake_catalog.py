@@ -0,0 +1,298 @@
+from collections.abc import Sequence
+from typing import Iterable, List
+
+import numpy as np
+
+from helper.distance import nearest_k_points, nearest_point, nearest_points, points_within_radius
+
+# Lines of an FDSN text response converted to arrays at a time.
+FDSN_TEXT_CHUNK_LINES = 10000
+
+
+class EarthquakeCatalog:
+    """
+    A set of earthquake events stored column by column.
+
+    Coordinates, times, depths and magnitudes are kept in contiguous NumPy
+    arrays so distance computations run over the whole catalog in a single
+    vectorized pass. Missing magnitudes and depths are stored as NaN.
+
+    Attributes:
+        ids (List[str]): The USGS event ids.
+        times (np.ndarray): The origin times in milliseconds since the epoch (int64).
+        latitudes (np.ndarray): The latitudes of the epicenters (float64).
+        longitudes (np.ndarray): The longitudes of the epicenters (float64).
+        depths (np.ndarray): The depths in kilometers (float64).
+        magnitudes (np.ndarray): The magnitudes (float64).
+        places (List[str]): The USGS descriptions of the regions of the events.
+    """
+
+    def __init__(self, ids, times, latitudes, longitudes, depths, magnitudes, places):
+        self.ids = ids if isinstance(ids, StringColumn) else list(ids)
+        self.times = np.ascontiguousarray(times, dtype=np.int64)
+        self.latitudes = np.ascontiguousarray(latitudes, dtype=np.float64)
+        self.longitudes = np.ascontiguousarray(longitudes, dtype=np.float64)
+        self.depths = np.ascontiguousarray(depths, dtype=np.float64)
+        self.magnitudes = np.ascontiguousarray(magnitudes, dtype=np.float64)
+        self.places = places if isinstance(places, StringColumn) else list(places)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def empty(cls) -> "EarthquakeCatalog":
+        """Returns a catalog without events."""
+        return cls([], [], [], [], [], [], [])
+
+    @classmethod
+    def merge(cls, catalogs: Iterable["EarthquakeCatalog"]) -> "EarthquakeCatalog":
+        """
+        Concatenates catalogs, keeping the last occurrence of every event id.
+
+        Args:
+            catalogs (Iterable[EarthquakeCatalog]): The catalogs, in order.
+
+        Returns:
+            EarthquakeCatalog: The merged catalog.
+        """
+        catalogs = list(catalogs)
+        if len(catalogs) == 1:
+            return catalogs[0]
+        ids = [event_id for catalog in catalogs for event_id in catalog.ids]
+        last_positions = {event_id: position for position, event_id in enumerate(ids)}
+        keep = np.fromiter(sorted(last_positions.values()), dtype=np.int64, count=len(last_positions))
+        places = [place for catalog in catalogs for place in catalog.places]
+        return cls(
+            ids=[ids[position] for position in keep],
+            times=np.concatenate([catalog.times for catalog in catalogs] or [[]])[keep],
+            latitudes=np.concatenate([catalog.latitudes for catalog in catalogs] or [[]])[keep],
+            longitudes=np.concatenate([catalog.longitudes for catalog in catalogs] or [[]])[keep],
+            depths=np.concatenate([catalog.depths for catalog in catalogs] or [[]])[keep],
+            magnitudes=np.concatenate([catalog.magnitudes for catalog in catalogs] or [[]])[keep],
+            places=[places[position] for position in keep],
+        )
+
+    @classmethod
+    def from_features(cls, features: Iterable[dict]) -> "EarthquakeCatalog":
+        """
+        Builds a catalog from GeoJSON features as returned by the USGS API.
+
+        Args:
+            features (Iterable[dict]): The GeoJSON features.
+
+        Returns:
+            EarthquakeCatalog: The catalog.
+        """
+        features = list(features)
+        coordinates = [feature["geometry"]["coordinates"] for feature in features]
+        return cls(
+            ids=[feature.get("id") for feature in features],
+            times=[feature["properties"]["time"] for feature in features],
+            latitudes=[point[1] for point in coordinates],
+            longitudes=[point[0] for point in coordinates],
+            depths=[_or_nan(point[2] if len(point) > 2 else None) for point in coordinates],
+            magnitudes=[_or_nan(feature["properties"].get("mag")) for feature in features],
+            places=[feature["properties"].get("place") or "" for feature in features],
+        )
+
+    @classmethod
+    def from_fdsn_text(cls, lines: Iterable, chunk_size=FDSN_TEXT_CHUNK_LINES) -> "EarthquakeCatalog":
+        """
+        Builds a catalog from the `format=text` output of an FDSN event service.
+
+        The lines are parsed a chunk at a time, each chunk going straight into
+        NumPy arrays, so the whole response is never held as Python objects.
+        Columns are `EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|
+        Contributor|ContributorID|MagType|Magnitude|MagAuthor|EventLocationName`.
+
+        Args:
+            lines (Iterable): The lines of the response, as str or bytes.
+            chunk_size (int): The number of lines parsed at a time.
+
+        Returns:
+            EarthquakeCatalog: The catalog.
+        """
+        ids, places, columns = [], [], []
+        chunk = []
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line or line.startswith("#"):
+                continue
+            chunk.append(line.rstrip("\r\n").split("|", 12))
+            if len(chunk) >= chunk_size:
+                columns.append(_text_columns(chunk, ids, places))
+                chunk = []
+        if chunk:
+            columns.append(_text_columns(chunk, ids, places))
+        if not columns:
+            return cls.empty()
+        times, latitudes, longitudes, depths, magnitudes = (np.concatenate(column) for column in zip(*columns))
+        return cls(ids, times, latitudes, longitudes, depths, magnitudes, places)
+
+    @classmethod
+    def from_events(cls, events: List) -> "EarthquakeCatalog":
+        """
+        Builds a catalog from rows of the local earthquake catalog.
+
+        Args:
+            events (List[EarthquakeEvent]): The events.
+
+        Returns:
+            EarthquakeCatalog: The catalog.
+        """
+        return cls(
+            ids=[event.id for event in events],
+            times=[event.time for event in events],
+            latitudes=[event.latitude for event in events],
+            longitudes=[event.longitude for event in events],
+            depths=[_or_nan(event.depth) for event in events],
+            magnitudes=[_or_nan(event.magnitude) for event in events],
+            places=[event.place or "" for event in events],
+        )
+
+    def nearest(self, latitude, longitude) -> tuple:
+        """
+        Finds the event nearest to a point.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+
+        Returns:
+            tuple: The index of the nearest event and its geodesic distance in kilometers,
+            or (None, inf) when the catalog is empty.
+        """
+        return nearest_point(latitude, longitude, self.latitudes, self.longitudes)
+
+    def nearest_many(self, latitudes, longitudes) -> list:
+        """
+        Finds the event nearest to each of several points in one vectorized pass.
+
+        Args:
+            latitudes (np.ndarray): The latitudes of the points.
+            longitudes (np.ndarray): The longitudes of the points.
+
+        Returns:
+            list: For each point, the index of the nearest event and its geodesic distance
+            in kilometers, or (None, inf) when the catalog is empty.
+        """
+        return nearest_points(latitudes, longitudes, self.latitudes, self.longitudes)
+
+    def nearest_k(self, latitude, longitude, k) -> list:
+        """
+        Finds the k events nearest to a point.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            k (int): The number of events to return.
+
+        Returns:
+            list: Tuples of event index and geodesic distance in kilometers, nearest first.
+        """
+        return nearest_k_points(latitude, longitude, self.latitudes, self.longitudes, k)
+
+    def within_radius(self, latitude, longitude, radius_km) -> list:
+        """
+        Finds every event within a geodesic radius of a point.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            radius_km (float): The radius in kilometers.
+
+        Returns:
+            list: Tuples of event index and geodesic distance in kilometers, nearest first.
+        """
+        return points_within_radius(latitude, longitude, self.latitudes, self.longitudes, radius_km)
+
+    def event(self, index) -> dict:
+        """
+        Returns one event as a plain dictionary.
+
+        Args:
+            index (int): The position of the event in the catalog.
+
+        Returns:
+            dict: The event id, time, coordinates, depth, magnitude and place.
+        """
+        return {
+            "id": self.ids[index],
+            "time": int(self.times[index]),
+            "latitude": float(self.latitudes[index]),
+            "longitude": float(self.longitudes[index]),
+            "depth": _or_none(self.depths[index]),
+            "magnitude": _or_none(self.magnitudes[index]),
+            "place": self.places[index],
+        }
+
+
+class StringColumn(Sequence):
+    """
+    A read-only column of strings kept as UTF-8 bytes and end offsets.
+
+    Used for the ids and places of large catalogs, which would otherwise be
+    one Python string per event; items are decoded when accessed.
+
+    Attributes:
+        offsets (np.ndarray): The start of every string in `data`, followed by the end of the last one (int64).
+        data (np.ndarray): The concatenated UTF-8 bytes (uint8).
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, values) -> "StringColumn":
+        """Encodes a sequence of strings into a column."""
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StringColumn index out of range")
+        return self.data[self.offsets[index] : self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __add__(self, other) -> list:
+        return list(self) + list(other)
+
+    def __radd__(self, other) -> list:
+        return list(other) + list(self)
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the offsets and bytes in memory."""
+        return self.offsets.nbytes + self.data.nbytes
+
+
+def _text_columns(rows, ids, places) -> tuple:
+    # Appends the ids and places of a chunk of text rows, and returns its numeric columns.
+    ids.extend(row[0] for row in rows)
+    places.extend(row[12] if len(row) > 12 else "" for row in rows)
+    times = np.array([row[1].rstrip("Z") for row in rows], dtype="datetime64[ms]").astype(np.int64)
+    return (
+        times,
+        np.array([row[2] for row in rows], dtype=np.float64),
+        np.array([row[3] for row in rows], dtype=np.float64),
+        np.array([row[4] or "nan" for row in rows], dtype=np.float64),
+        np.array([(row[10] or "nan") if len(row) > 10 else "nan" for row in rows], dtype=np.float64),
+    )
+
+
+def _or_nan(value) -> float:
+    return float("nan") if value is None else value
+
+
+def _or_none(value):
+    return None if np.isnan(value) else float(value)
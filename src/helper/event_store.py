@@ -0,0 +1,257 @@
+import os
+import tempfile
+
+import numpy as np
+
+from helper.earthquake_catalog import EarthquakeCatalog, StringColumn
+
+# Bumped whenever the layout of the snapshot files changes.
+SNAPSHOT_VERSION = 1
+# The arrays of a snapshot, in file order. The numeric columns come first so
+# every one of them starts on an 8-byte boundary and can be mapped in place.
+SNAPSHOT_ARRAYS = (
+    "header",
+    "times",
+    "latitudes",
+    "longitudes",
+    "depths",
+    "magnitudes",
+    "id_offsets",
+    "place_offsets",
+    "id_data",
+    "place_data",
+)
+
+
+class EventStore:
+    """
+    Compact store of earthquake events sorted by time.
+
+    Events are kept column by column in NumPy arrays, with ids and places as
+    UTF-8 bytes and offsets instead of Python strings. Because the events are
+    sorted by time, the events of a date range are a contiguous slice found
+    with two binary searches, and the numeric columns of the slice are views.
+
+    A store can be saved to a snapshot file and loaded back memory-mapped:
+    every process mapping the same snapshot shares its pages with the others
+    through the operating system page cache, so the catalog is held in memory
+    once per host instead of once per worker.
+
+    Attributes:
+        catalog (EarthquakeCatalog): All the events, sorted by time.
+        cursor (int): The latest `updated` timestamp of the events, or None.
+        sync_cursor (int): The cursor of the catalog synchronization the events reflect, or None.
+        mapped (bool): Whether the columns are memory-mapped from a snapshot file.
+    """
+
+    def __init__(self, catalog, cursor=None, sync_cursor=None, mapped=False):
+        self.catalog = catalog
+        self.cursor = cursor
+        self.sync_cursor = sync_cursor
+        self.mapped = mapped
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    @classmethod
+    def empty(cls) -> "EventStore":
+        """Returns a store without events."""
+        return cls.from_catalog(EarthquakeCatalog.empty())
+
+    @classmethod
+    def from_catalog(cls, catalog, cursor=None, sync_cursor=None) -> "EventStore":
+        """
+        Builds a store from a catalog in any order.
+
+        Args:
+            catalog (EarthquakeCatalog): The events.
+            cursor (int): The latest `updated` timestamp of the events.
+            sync_cursor (int): The cursor of the catalog synchronization the events reflect.
+
+        Returns:
+            EventStore: The store.
+        """
+        order = np.argsort(catalog.times, kind="stable")
+        sorted_catalog = EarthquakeCatalog(
+            ids=StringColumn.from_strings(catalog.ids[position] for position in order),
+            times=catalog.times[order],
+            latitudes=catalog.latitudes[order],
+            longitudes=catalog.longitudes[order],
+            depths=catalog.depths[order],
+            magnitudes=catalog.magnitudes[order],
+            places=StringColumn.from_strings(catalog.places[position] for position in order),
+        )
+        return cls(sorted_catalog, cursor, sync_cursor)
+
+    def bounds(self, start_ms=None, end_ms=None) -> tuple:
+        """
+        Finds the positions of the events of a time range with binary searches.
+
+        Args:
+            start_ms (int): The earliest event time in milliseconds since the epoch.
+            end_ms (int): The latest event time in milliseconds since the epoch.
+
+        Returns:
+            tuple: The first position in the range and the position after the last one.
+        """
+        times = self.catalog.times
+        low = 0 if start_ms is None else int(np.searchsorted(times, start_ms, side="left"))
+        high = len(times) if end_ms is None else int(np.searchsorted(times, end_ms, side="right"))
+        return low, max(low, high)
+
+    def slice(self, start_ms=None, end_ms=None, min_magnitude=None) -> EarthquakeCatalog:
+        """
+        Returns the events of a time range, ordered by time.
+
+        Args:
+            start_ms (int): The earliest event time in milliseconds since the epoch.
+            end_ms (int): The latest event time in milliseconds since the epoch.
+            min_magnitude (float): The minimum magnitude of the events.
+
+        Returns:
+            EarthquakeCatalog: The matching events.
+        """
+        low, high = self.bounds(start_ms, end_ms)
+        catalog = self.catalog
+        # A plain slice keeps the numeric columns as views of the store.
+        columns = slice(low, high)
+        positions = range(low, high)
+        if min_magnitude is not None:
+            columns = positions = np.flatnonzero(catalog.magnitudes[low:high] >= min_magnitude) + low
+        return EarthquakeCatalog(
+            ids=[catalog.ids[position] for position in positions],
+            times=catalog.times[columns],
+            latitudes=catalog.latitudes[columns],
+            longitudes=catalog.longitudes[columns],
+            depths=catalog.depths[columns],
+            magnitudes=catalog.magnitudes[columns],
+            places=[catalog.places[position] for position in positions],
+        )
+
+    def statistics(self) -> dict:
+        """
+        Returns the size of the store and whether it is memory-mapped.
+
+        Returns:
+            dict: The store statistics.
+        """
+        return {"events": len(self), "memory_bytes": self.nbytes, "mapped": self.mapped}
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the columns, mapped or not."""
+        catalog = self.catalog
+        return int(
+            sum(
+                column.nbytes
+                for column in (
+                    catalog.times,
+                    catalog.latitudes,
+                    catalog.longitudes,
+                    catalog.depths,
+                    catalog.magnitudes,
+                    catalog.ids,
+                    catalog.places,
+                )
+            )
+        )
+
+    def save(self, path):
+        """
+        Writes the store to a snapshot file.
+
+        The snapshot is written next to the target and renamed over it, so
+        processes mapping the previous snapshot keep reading a complete file.
+
+        Args:
+            path (str): The path of the snapshot file.
+        """
+        catalog = self.catalog
+        ids = _string_column(catalog.ids)
+        places = _string_column(catalog.places)
+        arrays = {
+            "header": np.array(
+                [SNAPSHOT_VERSION, _or_missing(self.cursor), _or_missing(self.sync_cursor)],
+                dtype=np.int64,
+            ),
+            "times": catalog.times,
+            "latitudes": catalog.latitudes,
+            "longitudes": catalog.longitudes,
+            "depths": catalog.depths,
+            "magnitudes": catalog.magnitudes,
+            "id_offsets": ids.offsets,
+            "place_offsets": places.offsets,
+            "id_data": ids.data,
+            "place_data": places.data,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                for name in SNAPSHOT_ARRAYS:
+                    np.lib.format.write_array(file, np.ascontiguousarray(arrays[name]), allow_pickle=False)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    @classmethod
+    def load(cls, path) -> "EventStore":
+        """
+        Maps a snapshot file into memory without copying it.
+
+        Args:
+            path (str): The path of the snapshot file.
+
+        Returns:
+            EventStore: The store, backed by the file.
+
+        Raises:
+            ValueError: If the file is not a snapshot of this version.
+        """
+        arrays = {}
+        with open(path, "rb") as file:
+            for name in SNAPSHOT_ARRAYS:
+                version = np.lib.format.read_magic(file)
+                read_header = (
+                    np.lib.format.read_array_header_1_0
+                    if version == (1, 0)
+                    else np.lib.format.read_array_header_2_0
+                )
+                shape, fortran_order, dtype = read_header(file)
+                if fortran_order or dtype.hasobject:
+                    raise ValueError(f"{path} is not an earthquake event snapshot.")
+                offset = file.tell()
+                count = int(np.prod(shape))
+                arrays[name] = (
+                    np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+                    if count
+                    else np.zeros(shape, dtype=dtype)
+                )
+                file.seek(offset + count * dtype.itemsize)
+        header = arrays["header"]
+        if len(header) != 3 or header[0] != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} earthquake event snapshot.")
+        catalog = EarthquakeCatalog(
+            ids=StringColumn(arrays["id_offsets"], arrays["id_data"]),
+            times=arrays["times"],
+            latitudes=arrays["latitudes"],
+            longitudes=arrays["longitudes"],
+            depths=arrays["depths"],
+            magnitudes=arrays["magnitudes"],
+            places=StringColumn(arrays["place_offsets"], arrays["place_data"]),
+        )
+        return cls(catalog, _or_none(header[1]), _or_none(header[2]), mapped=True)
+
+
+def _string_column(values) -> StringColumn:
+    return values if isinstance(values, StringColumn) else StringColumn.from_strings(values)
+
+
+def _or_missing(value) -> int:
+    return -1 if value is None else int(value)
+
+
+def _or_none(value):
+    return None if value < 0 else int(value)
@@ -0,0 +1,364 @@
+import asyncio
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from helper.distance import SPHERICAL_RELATIVE_ERROR
+from helper.earthquake_catalog import EarthquakeCatalog
+from utils.logger import Logger
+
+logger = Logger(name="fdsn_fetcher")
+
+DAY_MS = 24 * 60 * 60 * 1000
+# FDSN event services refuse or truncate queries matching more events than this.
+FDSN_MAX_EVENTS = 20000
+# Windows this short are never split again, even when they hit the limit.
+MIN_WINDOW_MS = 1000
+# The largest `maxradiuskm` accepted by FDSN event services (180 degrees).
+MAX_RADIUS_KM = 20001.6
+
+
+def timestamp_ms_to_iso(timestamp_ms) -> str:
+    """
+    Converts milliseconds since the epoch to the ISO 8601 format accepted by the USGS API.
+
+    Args:
+        timestamp_ms (int): The timestamp in milliseconds.
+
+    Returns:
+        str: The UTC time in ISO 8601 format.
+    """
+    date = datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc)
+    return date.strftime("%Y-%m-%dT%H:%M:%S.") + f"{date.microsecond // 1000:03d}"
+
+
+class FdsnResponseError(Exception):
+    """Raised when the FDSN event service answers a window query with an error status."""
+
+    def __init__(self, status_code):
+        super().__init__(f"The FDSN event service answered with status code {status_code}.")
+        self.status_code = status_code
+
+
+class FdsnFetcher:
+    """
+    Fetches the events of a time range from an FDSN event service in windows.
+
+    The range is split into windows of `window_days` days, fetched
+    concurrently by at most `concurrency` requests at a time. Every window
+    asks for at most `max_events` events; a window that comes back full may
+    have been truncated, so it is split in two halves which are fetched in
+    turn. Each response is turned into a columnar catalog as soon as it
+    arrives, and the window catalogs are merged with duplicate event ids
+    (events on a window boundary) removed.
+
+    Windows are asked for in the pipe-separated `text` format by default,
+    which is parsed line by line into arrays instead of being materialized
+    as one dict per GeoJSON feature.
+
+    Attributes:
+        http_client (HttpClient): The client used for the requests.
+        api_url (str): The URL of the FDSN event query endpoint.
+        window_days (float): The length of the initial windows in days.
+        max_events (int): The maximum number of events asked for per window.
+        concurrency (int): The maximum number of concurrent requests.
+        timeout (float): The timeout of each request in seconds.
+        response_format (str): The format asked for: "text" or "geojson".
+    """
+
+    def __init__(
+        self,
+        http_client,
+        api_url,
+        window_days=None,
+        max_events=None,
+        concurrency=None,
+        timeout=None,
+        response_format=None,
+    ):
+        self.http_client = http_client
+        self.api_url = api_url
+        self.window_days = float(window_days or os.getenv("EARTHQUAKE_FETCH_WINDOW_DAYS", "365"))
+        self.max_events = int(max_events or os.getenv("EARTHQUAKE_FETCH_MAX_EVENTS", FDSN_MAX_EVENTS))
+        self.concurrency = int(concurrency or os.getenv("EARTHQUAKE_FETCH_CONCURRENCY", "4"))
+        self.timeout = float(timeout or os.getenv("EARTHQUAKE_FETCH_TIMEOUT_SECONDS", "30"))
+        self.response_format = (response_format or os.getenv("EARTHQUAKE_FETCH_FORMAT", "text")).lower()
+
+    def windows(self, start_ms, end_ms) -> List[Tuple[int, int]]:
+        """
+        Splits a time range into the initial windows.
+
+        Args:
+            start_ms (int): The start of the range in milliseconds since the epoch.
+            end_ms (int): The end of the range in milliseconds since the epoch.
+
+        Returns:
+            List[Tuple[int, int]]: The start and end of every window; consecutive windows share their boundary.
+        """
+        # No event lies in the future, so the part of the range after tomorrow is a single window.
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        end_ms, range_end_ms = min(end_ms, max(start_ms, now_ms + DAY_MS)), end_ms
+        step = max(MIN_WINDOW_MS, int(self.window_days * DAY_MS))
+        bounds = list(range(start_ms, end_ms, step)) + [end_ms]
+        windows = list(zip(bounds[:-1], bounds[1:])) or [(start_ms, end_ms)]
+        if range_end_ms > end_ms:
+            windows[-1] = (windows[-1][0], range_end_ms)
+        return windows
+
+    def fetch(self, start_ms, end_ms, params) -> EarthquakeCatalog:
+        """
+        Fetches the events of a time range with a bounded pool of worker threads.
+
+        Args:
+            start_ms (int): The start of the range in milliseconds since the epoch.
+            end_ms (int): The end of the range in milliseconds since the epoch.
+            params (dict): The other query parameters, such as the minimum magnitude.
+
+        Returns:
+            EarthquakeCatalog: The events of the range, each event once.
+
+        Raises:
+            FdsnResponseError: If a window query is answered with an error status.
+            CircuitOpenError: If the circuit breaker of the client is open.
+            requests.RequestException: If a window query fails to connect.
+        """
+        catalogs = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {
+                executor.submit(self._fetch_window, window, params): window
+                for window in self.windows(start_ms, end_ms)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = pending.pop(future)
+                    catalog = future.result()
+                    if self._is_saturated(window, catalog):
+                        for half in self._split(window):
+                            pending[executor.submit(self._fetch_window, half, params)] = half
+                    else:
+                        catalogs.append(catalog)
+        return EarthquakeCatalog.merge(catalogs)
+
+    async def fetch_async(self, start_ms, end_ms, params) -> EarthquakeCatalog:
+        """
+        Fetches the events of a time range over the async client of the running event loop.
+
+        Args:
+            start_ms (int): The start of the range in milliseconds since the epoch.
+            end_ms (int): The end of the range in milliseconds since the epoch.
+            params (dict): The other query parameters, such as the minimum magnitude.
+
+        Returns:
+            EarthquakeCatalog: The events of the range, each event once.
+
+        Raises:
+            FdsnResponseError: If a window query is answered with an error status.
+            CircuitOpenError: If the circuit breaker of the client is open.
+            httpx.TransportError: If a window query fails to connect.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_window(window) -> List[EarthquakeCatalog]:
+            async with semaphore:
+                catalog = await self._fetch_window_async(window, params)
+            if not self._is_saturated(window, catalog):
+                return [catalog]
+            halves = await asyncio.gather(*(fetch_window(half) for half in self._split(window)))
+            return [catalog for half in halves for catalog in half]
+
+        results = await asyncio.gather(
+            *(fetch_window(window) for window in self.windows(start_ms, end_ms))
+        )
+        return EarthquakeCatalog.merge([catalog for result in results for catalog in result])
+
+    def ring_radii(self, start_km=None, factor=None) -> List:
+        """
+        Returns the radii of the expanding rings searched around a point.
+
+        Args:
+            start_km (float): The radius of the first ring in kilometers.
+            factor (float): The growth factor of the radius from one ring to the next.
+
+        Returns:
+            List: The radii in kilometers, ending with None for a query without radius.
+        """
+        radius = float(start_km or os.getenv("EARTHQUAKE_RING_START_KM", "250"))
+        factor = max(1.5, float(factor or os.getenv("EARTHQUAKE_RING_FACTOR", "4")))
+        radii = []
+        while radius < MAX_RADIUS_KM:
+            radii.append(radius)
+            radius *= factor
+        return radii + [None]
+
+    def fetch_nearest(self, latitude, longitude, k, start_ms, end_ms, params) -> tuple:
+        """
+        Fetches the k events of a time range nearest to a point, with expanding rings.
+
+        Each ring is a query restricted to `maxradiuskm` around the point.
+        The search stops at the first ring holding k events of which the
+        k-th is provably nearer than anything outside the ring, and widens
+        to the next ring otherwise; the last ring has no radius.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            k (int): The number of events to find.
+            start_ms (int): The start of the range in milliseconds since the epoch.
+            end_ms (int): The end of the range in milliseconds since the epoch.
+            params (dict): The other query parameters, such as the minimum magnitude.
+
+        Returns:
+            tuple: The catalog of the last ring and the k nearest matches in it, as tuples of
+            event index and geodesic distance in kilometers, nearest first.
+        """
+        for radius in self.ring_radii():
+            catalog = self.fetch(start_ms, end_ms, self._ring_params(latitude, longitude, radius, params))
+            matches = catalog.nearest_k(latitude, longitude, k)
+            if self._ring_is_conclusive(matches, k, radius):
+                return catalog, matches
+
+    async def fetch_nearest_async(self, latitude, longitude, k, start_ms, end_ms, params) -> tuple:
+        """
+        Async variant of `fetch_nearest`.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            k (int): The number of events to find.
+            start_ms (int): The start of the range in milliseconds since the epoch.
+            end_ms (int): The end of the range in milliseconds since the epoch.
+            params (dict): The other query parameters, such as the minimum magnitude.
+
+        Returns:
+            tuple: The catalog of the last ring and the k nearest matches in it.
+        """
+        for radius in self.ring_radii():
+            catalog = await self.fetch_async(
+                start_ms, end_ms, self._ring_params(latitude, longitude, radius, params)
+            )
+            matches = catalog.nearest_k(latitude, longitude, k)
+            if self._ring_is_conclusive(matches, k, radius):
+                return catalog, matches
+
+    async def fetch_within_radius_async(self, latitude, longitude, radius_km, start_ms, end_ms, params) -> EarthquakeCatalog:
+        """
+        Fetches the events of a time range around a point, pre-filtered by the service.
+
+        The service filters on the spherical distance, so the query radius
+        is widened by the spherical error bound; callers still filter on the
+        exact geodesic distance.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            radius_km (float): The radius in kilometers.
+            start_ms (int): The start of the range in milliseconds since the epoch.
+            end_ms (int): The end of the range in milliseconds since the epoch.
+            params (dict): The other query parameters, such as the minimum magnitude.
+
+        Returns:
+            EarthquakeCatalog: The events around the point.
+        """
+        radius = radius_km * (1 + SPHERICAL_RELATIVE_ERROR)
+        return await self.fetch_async(
+            start_ms,
+            end_ms,
+            self._ring_params(latitude, longitude, radius if radius < MAX_RADIUS_KM else None, params),
+        )
+
+    @staticmethod
+    def _ring_params(latitude, longitude, radius, params) -> dict:
+        if radius is None:
+            return params
+        return dict(params, latitude=latitude, longitude=longitude, maxradiuskm=round(radius, 3))
+
+    @staticmethod
+    def _ring_is_conclusive(matches, k, radius) -> bool:
+        # Events outside the ring are at least radius / (1 + error) away geodesically.
+        return radius is None or (
+            len(matches) == k and matches[-1][1] <= radius / (1 + SPHERICAL_RELATIVE_ERROR)
+        )
+
+    def _window_params(self, window, params) -> dict:
+        return dict(
+            params,
+            starttime=timestamp_ms_to_iso(window[0]),
+            endtime=timestamp_ms_to_iso(window[1]),
+            limit=self.max_events,
+            format=self.response_format,
+        )
+
+    def _fetch_window(self, window, params) -> EarthquakeCatalog:
+        response = self.http_client.get(
+            self.api_url, params=self._window_params(window, params), timeout=self.timeout
+        )
+        return self._parse(response)
+
+    async def _fetch_window_async(self, window, params) -> EarthquakeCatalog:
+        response = await self.http_client.get_async(
+            self.api_url, params=self._window_params(window, params), timeout=self.timeout
+        )
+        return self._parse(response)
+
+    def _parse(self, response) -> EarthquakeCatalog:
+        # FDSN services answer 204 when no event matches a text query.
+        if response.status_code == 204:
+            return EarthquakeCatalog.empty()
+        if response.status_code != 200:
+            raise FdsnResponseError(response.status_code)
+        if self.response_format == "text":
+            return EarthquakeCatalog.from_fdsn_text(response.iter_lines())
+        return EarthquakeCatalog.from_features(response.json().get("features", []))
+
+    def _is_saturated(self, window, catalog) -> bool:
+        if len(catalog) < self.max_events:
+            return False
+        if window[1] - window[0] <= MIN_WINDOW_MS:
+            logger.warning("Window %s holds more than %s events; keeping the first ones.", window, self.max_events)
+            return False
+        logger.info("Window %s hit the limit of %s events; splitting it.", window, self.max_events)
+        return True
+
+    @staticmethod
+    def _split(window) -> List[Tuple[int, int]]:
+        middle = (window[0] + window[1]) // 2
+        return [(window[0], middle), (middle, window[1])]
+
+
+class RingSearch:
+    """
+    The events of a date range that are still to be fetched, around the point of a query.
+
+    Returned instead of a catalog when the query point is not known yet, so
+    only the events near the point are fetched once it is.
+
+    Attributes:
+        fetcher (FdsnFetcher): The fetcher used for the ring queries.
+        start_ms (int): The start of the range in milliseconds since the epoch.
+        end_ms (int): The end of the range in milliseconds since the epoch.
+        params (dict): The other query parameters, such as the minimum magnitude.
+    """
+
+    def __init__(self, fetcher, start_ms, end_ms, params):
+        self.fetcher = fetcher
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.params = params
+
+    def nearest_k(self, latitude, longitude, k) -> tuple:
+        """Fetches the k nearest events to a point; see `FdsnFetcher.fetch_nearest`."""
+        return self.fetcher.fetch_nearest(latitude, longitude, k, self.start_ms, self.end_ms, self.params)
+
+    async def nearest_k_async(self, latitude, longitude, k) -> tuple:
+        """Fetches the k nearest events to a point; see `FdsnFetcher.fetch_nearest_async`."""
+        return await self.fetcher.fetch_nearest_async(
+            latitude, longitude, k, self.start_ms, self.end_ms, self.params
+        )
+
+    async def within_radius_async(self, latitude, longitude, radius_km) -> EarthquakeCatalog:
+        """Fetches the events around a point; see `FdsnFetcher.fetch_within_radius_async`."""
+        return await self.fetcher.fetch_within_radius_async(
+            latitude, longitude, radius_km, self.start_ms, self.end_ms, self.params
+        )
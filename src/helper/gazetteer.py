@@ -0,0 +1,272 @@
+import os
+import threading
+import unicodedata
+
+import numpy as np
+from geopy.location import Location
+
+from helper.earthquake_catalog import EarthquakeCatalog, StringColumn
+from helper.spatial_index import EarthquakeSpatialIndex
+
+# Columns of a GeoNames dump (e.g. cities500.txt) read by `Gazetteer.from_geonames`.
+GEONAMES_ID, GEONAMES_NAME, GEONAMES_ASCII_NAME = 0, 1, 2
+GEONAMES_LATITUDE, GEONAMES_LONGITUDE, GEONAMES_COUNTRY, GEONAMES_ADMIN1, GEONAMES_POPULATION = 4, 5, 8, 10, 14
+
+_gazetteers = {}
+_gazetteers_lock = threading.Lock()
+
+
+def normalize_name(name) -> str:
+    """Folds case and accents of a place name, so "São Paulo" and "sao paulo" match."""
+    decomposed = unicodedata.normalize("NFKD", name.strip().casefold())
+    return "".join(character for character in decomposed if not unicodedata.combining(character))
+
+
+class Gazetteer:
+    """
+    In-memory index of named places for offline geocoding.
+
+    Places are stored column by column: coordinates and populations in NumPy
+    arrays, names and addresses in `StringColumn`s. Forward lookups go
+    through a hash index, a sorted array of the hashes of the normalized
+    names (and ASCII names) with the position of their place, searched by
+    bisection; reverse lookups go through an `EarthquakeSpatialIndex` built
+    over the places. Both answer in well under a millisecond without a
+    Python object per place.
+
+    Attributes:
+        names (StringColumn): The names of the places.
+        ascii_names (StringColumn): The ASCII spellings of the names, also searched by forward lookups.
+        addresses (StringColumn): The "name, region, country" descriptions of the places.
+        latitudes (np.ndarray): The latitudes of the places (float64).
+        longitudes (np.ndarray): The longitudes of the places (float64).
+        populations (np.ndarray): The populations of the places, used to rank homonyms (int64).
+        regions (StringColumn): The region (first-level administrative division) codes of the places.
+        countries (StringColumn): The ISO country codes of the places.
+    """
+
+    def __init__(self, names, latitudes, longitudes, populations=None, regions=None, countries=None, ascii_names=None):
+        count = len(names)
+        regions = regions if regions is not None else [""] * count
+        countries = countries if countries is not None else [""] * count
+        ascii_names = ascii_names if ascii_names is not None else names
+        self.names = StringColumn.from_strings(names)
+        self.ascii_names = StringColumn.from_strings(ascii_names)
+        self.regions = StringColumn.from_strings(regions)
+        self.countries = StringColumn.from_strings(countries)
+        self.addresses = StringColumn.from_strings(
+            ", ".join(part for part in parts if part) for parts in zip(names, regions, countries)
+        )
+        self.latitudes = np.ascontiguousarray(latitudes, dtype=np.float64)
+        self.longitudes = np.ascontiguousarray(longitudes, dtype=np.float64)
+        self.populations = np.ascontiguousarray(
+            populations if populations is not None else np.zeros(count), dtype=np.int64
+        )
+
+        # Every place is hashed under its normalized name, and under its ASCII name when it differs.
+        hashes, positions = [], []
+        for position, (name, ascii_name) in enumerate(zip(names, ascii_names)):
+            normalized = normalize_name(name)
+            hashes.append(hash(normalized))
+            positions.append(position)
+            normalized_ascii = normalize_name(ascii_name)
+            if normalized_ascii != normalized:
+                hashes.append(hash(normalized_ascii))
+                positions.append(position)
+        hashes = np.array(hashes, dtype=np.int64)
+        positions = np.array(positions, dtype=np.int64)
+        order = np.argsort(hashes, kind="stable")
+        self._hashes = hashes[order]
+        self._hash_positions = positions[order]
+
+        self._index = EarthquakeSpatialIndex()
+        self._index.build(
+            EarthquakeCatalog(
+                ids=StringColumn.from_strings(str(position) for position in range(count)),
+                times=np.zeros(count, dtype=np.int64),
+                latitudes=self.latitudes,
+                longitudes=self.longitudes,
+                depths=np.full(count, np.nan),
+                magnitudes=np.full(count, np.nan),
+                places=self.addresses,
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_geonames(cls, path) -> "Gazetteer":
+        """
+        Loads a GeoNames dump (tab-separated, e.g. `cities500.txt` or `allCountries.txt`).
+
+        Args:
+            path (str): The path of the dump.
+
+        Returns:
+            Gazetteer: The places of the dump.
+        """
+        names, ascii_names, regions, countries = [], [], [], []
+        latitudes, longitudes, populations = [], [], []
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                row = line.rstrip("\n").split("\t")
+                if len(row) <= GEONAMES_POPULATION or line.startswith("#"):
+                    continue
+                names.append(row[GEONAMES_NAME])
+                ascii_names.append(row[GEONAMES_ASCII_NAME] or row[GEONAMES_NAME])
+                latitudes.append(row[GEONAMES_LATITUDE])
+                longitudes.append(row[GEONAMES_LONGITUDE])
+                countries.append(row[GEONAMES_COUNTRY])
+                regions.append(row[GEONAMES_ADMIN1])
+                populations.append(row[GEONAMES_POPULATION] or "0")
+        return cls(
+            names,
+            np.array(latitudes, dtype=np.float64),
+            np.array(longitudes, dtype=np.float64),
+            np.array(populations, dtype=np.int64),
+            regions,
+            countries,
+            ascii_names,
+        )
+
+    def lookup(self, query):
+        """
+        Finds a place by name.
+
+        The query may qualify the name with region or country codes after
+        commas ("Springfield, IL"); among the places sharing the name, the
+        most populated one matching the qualifiers wins.
+
+        Args:
+            query (str): The name of the place.
+
+        Returns:
+            int: The position of the place, or None when no place matches.
+        """
+        name, *qualifiers = [part.strip() for part in query.split(",")]
+        normalized = normalize_name(name)
+        key = hash(normalized)
+        low = int(np.searchsorted(self._hashes, key, side="left"))
+        high = int(np.searchsorted(self._hashes, key, side="right"))
+        qualifiers = {qualifier.casefold() for qualifier in qualifiers if qualifier}
+        best = None
+        for position in self._hash_positions[low:high]:
+            position = int(position)
+            # Distinct names can share a hash, so the candidate is checked against the query.
+            if normalized not in (normalize_name(self.names[position]), normalize_name(self.ascii_names[position])):
+                continue
+            if qualifiers and not qualifiers <= {
+                self.regions[position].casefold(),
+                self.countries[position].casefold(),
+            }:
+                continue
+            if best is None or self.populations[position] > self.populations[best]:
+                best = position
+        return best
+
+    def nearest(self, latitude, longitude) -> tuple:
+        """
+        Finds the place nearest to a point.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+
+        Returns:
+            tuple: The position of the nearest place and its distance in kilometers,
+            or (None, inf) for an empty gazetteer.
+        """
+        return self._index.nearest(latitude, longitude)
+
+    def statistics(self) -> dict:
+        """
+        Returns the size and memory footprint of the gazetteer.
+
+        Returns:
+            dict: The gazetteer statistics.
+        """
+        columns = (self.names, self.ascii_names, self.regions, self.countries, self.addresses, self.latitudes, self.longitudes)
+        return {
+            "places": len(self),
+            "memory_bytes": int(
+                sum(column.nbytes for column in columns)
+                + self.populations.nbytes
+                + self._hashes.nbytes
+                + self._hash_positions.nbytes
+                + self._index.statistics()["memory_bytes"]
+            ),
+        }
+
+
+class GazetteerGeocoder:
+    """
+    Offline geocoder with the interface of the geopy geocoders, backed by a `Gazetteer`.
+
+    Attributes:
+        gazetteer (Gazetteer): The places.
+        max_reverse_km (float): Points farther than this from every place are not reverse geocoded.
+        offline (bool): Always True; the geocoding service skips its database cache for offline geocoders.
+    """
+
+    offline = True
+
+    def __init__(self, gazetteer: Gazetteer, max_reverse_km=None):
+        self.gazetteer = gazetteer
+        self.max_reverse_km = max_reverse_km or float(os.getenv("GAZETTEER_MAX_REVERSE_KM", "100"))
+
+    @classmethod
+    def shared(cls, path) -> "GazetteerGeocoder":
+        """
+        Returns a geocoder over the GeoNames dump at `path`, loaded once per process.
+
+        Args:
+            path (str): The path of the dump.
+
+        Returns:
+            GazetteerGeocoder: The geocoder.
+        """
+        with _gazetteers_lock:
+            gazetteer = _gazetteers.get(path)
+            if gazetteer is None:
+                gazetteer = _gazetteers[path] = Gazetteer.from_geonames(path)
+        return cls(gazetteer)
+
+    def geocode(self, query, exactly_one=True):
+        """
+        Geocodes a place name.
+
+        Args:
+            query (str): The name of the place, optionally followed by region or country codes.
+            exactly_one (bool): Kept for compatibility with geopy; a single location is returned.
+
+        Returns:
+            Location: The place, or None when it is not in the gazetteer.
+        """
+        position = self.gazetteer.lookup(query)
+        return None if position is None else self._location(position)
+
+    def reverse(self, query, exactly_one=True):
+        """
+        Finds the place nearest to a point.
+
+        Args:
+            query (tuple): The latitude and longitude of the point.
+            exactly_one (bool): Kept for compatibility with geopy; a single location is returned.
+
+        Returns:
+            Location: The nearest place, or None when it is farther than `max_reverse_km`.
+        """
+        latitude, longitude = query
+        position, distance_km = self.gazetteer.nearest(latitude, longitude)
+        if position is None or distance_km > self.max_reverse_km:
+            return None
+        return self._location(position)
+
+    def _location(self, position) -> Location:
+        gazetteer = self.gazetteer
+        return Location(
+            gazetteer.addresses[position],
+            (float(gazetteer.latitudes[position]), float(gazetteer.longitudes[position])),
+            {"population": int(gazetteer.populations[position])},
+        )
@@ -0,0 +1,379 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Dict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from helper.metrics import register_metrics
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_clients: Dict[str, "HttpClient"] = {}
+_clients_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is refused because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive failed calls the breaker opens and
+    refuses every call for `reset_timeout` seconds. It then lets a single
+    trial call through (half-open): a success closes the breaker, a failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, timer=time.monotonic):
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.open_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._timer() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Returns whether a call may be made now.
+
+        Returns:
+            bool: False while the breaker is open or a half-open trial call is in flight.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._timer() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """Lets another trial call through after a half-open trial was abandoned."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.open_count += 1
+                self._state = self.OPEN
+                self._opened_at = self._timer()
+                self._trial_in_flight = False
+
+
+class HttpClient:
+    """
+    HTTP client for an upstream service, shared by every request of the process.
+
+    Sync calls go through a `requests.Session` and async calls through an
+    `httpx.AsyncClient` per event loop, both keeping a pool of keep-alive
+    connections.
+    Connection errors and 429/5xx responses are retried up to `retries`
+    times with exponential backoff and full jitter (a `Retry-After` header
+    is honoured up to `backoff_max`). Calls that still fail count towards a
+    circuit breaker; while it is open calls fail fast with `CircuitOpenError`.
+
+    Latency, retries, failures and the breaker state are reported under
+    `http_<name>` at `/v1/metrics`.
+
+    Attributes:
+        name (str): The name of the upstream service, used for the metrics section.
+        retries (int): The maximum number of retries of a call.
+        backoff (float): The base backoff delay in seconds.
+        backoff_max (float): The maximum backoff delay in seconds.
+        breaker (CircuitBreaker): The circuit breaker of the upstream service.
+    """
+
+    def __init__(
+        self,
+        name,
+        retries=None,
+        backoff=None,
+        backoff_max=None,
+        failure_threshold=None,
+        reset_timeout=None,
+        pool_size=None,
+        sleep=time.sleep,
+    ):
+        self.name = name
+        self.retries = int(retries if retries is not None else os.getenv("HTTP_RETRIES", "3"))
+        self.backoff = float(
+            backoff if backoff is not None else os.getenv("HTTP_BACKOFF_SECONDS", "0.5")
+        )
+        self.backoff_max = float(
+            backoff_max if backoff_max is not None else os.getenv("HTTP_BACKOFF_MAX_SECONDS", "10")
+        )
+        self.pool_size = int(pool_size or os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.breaker = CircuitBreaker(
+            failure_threshold
+            if failure_threshold is not None
+            else os.getenv("HTTP_BREAKER_FAILURES", "5"),
+            reset_timeout
+            if reset_timeout is not None
+            else os.getenv("HTTP_BREAKER_RESET_SECONDS", "30"),
+        )
+        self._sleep = sleep
+        self._session = None
+        # Pooled connections cannot move between event loops, so each loop gets its own client.
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.request_count = 0
+        self.retry_count = 0
+        self.failure_count = 0
+        self.rejected_count = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    @property
+    def session(self) -> requests.Session:
+        """The pooled `requests.Session`, created on first use."""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """
+        Returns the async client of the running event loop, creating it on first use.
+
+        Pooled connections cannot move between event loops, so every loop
+        gets a client of its own; the clients of other loops are kept until
+        `aclose` is awaited on them.
+
+        Returns:
+            httpx.AsyncClient: The shared client of the loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=int(
+                            os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+                        ),
+                    ),
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def get(self, url, params=None, timeout=10) -> requests.Response:
+        """
+        Sends a GET request, retrying transient failures.
+
+        Args:
+            url (str): The URL.
+            params (dict): The query parameters.
+            timeout (float): The timeout of each attempt in seconds.
+
+        Returns:
+            requests.Response: The last response, which may still be an error response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            requests.RequestException: If every attempt failed to connect.
+        """
+        self._before_call()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except requests.RequestException:
+                if attempt >= self.retries:
+                    self._after_call(start, success=False)
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    self._after_call(start, success=response.status_code not in RETRY_STATUS_CODES)
+                    return response
+                delay = self.retry_delay(attempt, response.headers.get("Retry-After"))
+            self._record_retry()
+            self._sleep(delay)
+            attempt += 1
+
+    async def get_async(self, url, params=None, timeout=10) -> httpx.Response:
+        """
+        Sends a GET request over the async client, retrying transient failures.
+
+        Args:
+            url (str): The URL.
+            params (dict): The query parameters.
+            timeout (float): The timeout of each attempt in seconds.
+
+        Returns:
+            httpx.Response: The last response, which may still be an error response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            httpx.TransportError: If every attempt failed to connect.
+        """
+        self._before_call()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = await self.get_async_client().get(url, params=params, timeout=timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    self._after_call(start, success=False)
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    self._after_call(start, success=response.status_code not in RETRY_STATUS_CODES)
+                    return response
+                delay = self.retry_delay(attempt, response.headers.get("Retry-After"))
+            self._record_retry()
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            attempt += 1
+
+    def retry_delay(self, attempt, retry_after=None) -> float:
+        """
+        Returns the delay before a retry: full jitter over an exponential backoff.
+
+        Args:
+            attempt (int): The 0-based number of the failed attempt.
+            retry_after (str): The `Retry-After` header of the response, in seconds, if any.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+    async def aclose(self):
+        """Closes the async client of the running event loop, leaving those of other loops open."""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Closes the pooled connections of the sync session."""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def statistics(self) -> dict:
+        """
+        Returns the call counts, latency and circuit breaker state of the client.
+
+        Returns:
+            dict: The client statistics.
+        """
+        with self._stats_lock:
+            return {
+                "requests": self.request_count,
+                "retries": self.retry_count,
+                "failures": self.failure_count,
+                "rejected": self.rejected_count,
+                "latency_avg_ms": round(self.latency_total_ms / self.request_count, 3)
+                if self.request_count
+                else 0.0,
+                "latency_max_ms": round(self.latency_max_ms, 3),
+                "breaker_state": self.breaker.state,
+                "breaker_open_count": self.breaker.open_count,
+            }
+
+    def _before_call(self):
+        if not self.breaker.allow():
+            with self._stats_lock:
+                self.rejected_count += 1
+            raise CircuitOpenError(f"The circuit breaker of {self.name} is open.")
+
+    def _after_call(self, start, success):
+        elapsed = (time.perf_counter() - start) * 1000
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        with self._stats_lock:
+            self.request_count += 1
+            self.failure_count += 0 if success else 1
+            self.latency_total_ms += elapsed
+            self.latency_max_ms = max(self.latency_max_ms, elapsed)
+
+    def _record_retry(self):
+        with self._stats_lock:
+            self.retry_count += 1
+
+
+def get_http_client(name) -> HttpClient:
+    """
+    Returns the process-wide client of an upstream service, creating it on first use.
+
+    Args:
+        name (str): The name of the upstream service.
+
+    Returns:
+        HttpClient: The shared client.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = HttpClient(name)
+                _clients[name] = client
+                register_metrics(f"http_{name}", client.statistics)
+    return client
+
+
+async def close_http_clients():
+    """Closes the pooled connections of every shared client."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.aclose()
+        client.close()
@@ -0,0 +1,40 @@
+import threading
+from typing import Callable, Dict
+
+_providers: Dict[str, Callable[[], dict]] = {}
+_lock = threading.Lock()
+
+
+def register_metrics(name: str, provider: Callable[[], dict]) -> None:
+    """
+    Registers a metrics provider under the given section name.
+
+    Args:
+        name (str): The section name used in the metrics report.
+        provider (Callable[[], dict]): A callable returning a JSON serializable dict.
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def unregister_metrics(name: str) -> None:
+    """
+    Removes a previously registered metrics provider.
+
+    Args:
+        name (str): The section name of the provider.
+    """
+    with _lock:
+        _providers.pop(name, None)
+
+
+def collect_metrics() -> dict:
+    """
+    Collects a snapshot of every registered metrics provider.
+
+    Returns:
+        dict: The metrics of each provider keyed by section name.
+    """
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in sorted(providers.items())}
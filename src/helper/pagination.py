@@ -0,0 +1,46 @@
+from sqlalchemy.orm import load_only
+
+# Number of rows of a page when the client does not ask for a limit.
+DEFAULT_PAGE_SIZE = 100
+# Largest page a client can ask for.
+MAX_PAGE_SIZE = 1000
+# Response header holding the `after_id` of the next page, set when the page is full.
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+
+
+def keyset_page(statement, model, columns, limit=DEFAULT_PAGE_SIZE, after_id=None):
+    """
+    Restricts a statement to one page of rows ordered by ID.
+
+    Pages are selected by keyset (`id > after_id ORDER BY id LIMIT n`)
+    rather than by offset, so every page is an index range scan however
+    deep it is, and only the given columns are loaded.
+
+    Args:
+        statement (Select): The statement selecting `model`, filters included.
+        model (type): The mapped class, with an `id` primary key.
+        columns (tuple): The columns to load.
+        limit (int): The maximum number of rows of the page.
+        after_id (int): The ID of the last row of the previous page.
+
+    Returns:
+        Select: The statement of the page.
+    """
+    statement = statement.options(load_only(*columns))
+    if after_id is not None:
+        statement = statement.where(model.id > after_id)
+    return statement.order_by(model.id).limit(min(limit, MAX_PAGE_SIZE))
+
+
+def next_page_after_id(rows, limit):
+    """
+    Returns the `after_id` of the page following `rows`.
+
+    Args:
+        rows (list): The rows of the current page, ordered by ID.
+        limit (int): The limit the page was selected with.
+
+    Returns:
+        int: The ID of the last row when the page is full, None when it is the last page.
+    """
+    return rows[-1].id if rows and len(rows) >= limit else None
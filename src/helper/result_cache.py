@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from helper.cache import TTLCache
+from utils.logger import Logger
+
+logger = Logger(name="result_cache")
+
+# Every result cache of the process, so catalog changes can evict the results they affect.
+_result_caches = weakref.WeakSet()
+
+
+class MemoryCacheBackend:
+    """Result cache backend keeping entries in an in-process LRU cache."""
+
+    name = "memory"
+
+    def __init__(self, maxsize=10000):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    async def get(self, key) -> Optional[dict]:
+        return self._cache.get(key)
+
+    async def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl=ttl)
+
+    def evict(self, predicate) -> int:
+        evicted = 0
+        for key in self._cache.keys():
+            if predicate(key):
+                self._cache.delete(key)
+                evicted += 1
+        return evicted
+
+    def clear(self):
+        self._cache.clear()
+
+
+class RedisCacheBackend:
+    """
+    Result cache backend storing JSON entries in Redis, shared by every process.
+
+    Any client with the `get(key)`, `set(key, value, ex=seconds)`,
+    `scan_iter(match=pattern)` and `delete(*keys)` methods of `redis.Redis`
+    can be used. Its calls are blocking, so lookups and stores run in a
+    worker thread.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix="earthquakes:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key) -> Optional[dict]:
+        raw = await asyncio.to_thread(self.client.get, self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key, value, ttl):
+        await asyncio.to_thread(
+            self.client.set, self.prefix + key, json.dumps(value), ex=max(1, int(ttl))
+        )
+
+    def evict(self, predicate) -> int:
+        keys = [
+            raw_key
+            for raw_key in self.client.scan_iter(match=self.prefix + "*")
+            if predicate(_decode(raw_key)[len(self.prefix):])
+        ]
+        if keys:
+            self.client.delete(*keys)
+        return len(keys)
+
+
+def _decode(raw_key) -> str:
+    return raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+
+
+def create_cache_backend():
+    """
+    Creates the result cache backend selected by `RESULT_CACHE_BACKEND`.
+
+    Returns:
+        MemoryCacheBackend, RedisCacheBackend or None: The backend, or None when caching is disabled.
+
+    Raises:
+        RuntimeError: If the Redis backend is selected and the redis package is not installed.
+    """
+    backend = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+    if backend == "none":
+        return None
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "The redis package is required when RESULT_CACHE_BACKEND is 'redis'."
+            ) from exc
+        return RedisCacheBackend(
+            redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        )
+    return MemoryCacheBackend(maxsize=int(os.getenv("RESULT_CACHE_SIZE", "10000")))
+
+
+def key_overlaps(key, start_ms, end_ms) -> bool:
+    """
+    Returns whether the date range of a result cache key overlaps a time span.
+
+    Keys of date range results are built as "<kind>:<id>:<start date>:<end date>:...",
+    with "YYYY-MM-DD" dates; the range runs from the start date to the end date
+    at midnight UTC, like the catalog queries. Keys without a date range never overlap.
+
+    Args:
+        key (str): The cache key.
+        start_ms (int): The start of the span in milliseconds since the epoch.
+        end_ms (int): The end of the span in milliseconds since the epoch.
+
+    Returns:
+        bool: True if a result cached under the key may include the span.
+    """
+    parts = key.split(":")
+    try:
+        start = datetime.strptime(parts[2], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        end = datetime.strptime(parts[3], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except (IndexError, ValueError):
+        return False
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return start <= epoch + timedelta(milliseconds=end_ms) and end >= epoch + timedelta(milliseconds=start_ms)
+
+
+def invalidate_result_caches(start_ms, end_ms) -> int:
+    """
+    Evicts the results overlapping a time span from every result cache of the process.
+
+    Called after a catalog synchronization commits changed events, so that
+    no cache keeps serving the answers they made stale.
+
+    Args:
+        start_ms (int): The start of the span in milliseconds since the epoch.
+        end_ms (int): The end of the span in milliseconds since the epoch.
+
+    Returns:
+        int: The number of evicted results.
+    """
+    return sum(cache.invalidate_range(start_ms, end_ms) for cache in list(_result_caches))
+
+
+def etag(value) -> str:
+    """
+    Returns a strong ETag of a JSON serializable value.
+
+    Args:
+        value: The value.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    digest = hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, tag) -> bool:
+    """
+    Returns whether an `If-None-Match` header matches an ETag.
+
+    Args:
+        if_none_match (str): The header value, possibly a list of weak or strong tags.
+        tag (str): The ETag of the current representation.
+
+    Returns:
+        bool: True if the client already holds the representation.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or tag in (
+        candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates
+    )
+
+
+class ResultCache:
+    """
+    Cache of computed results with request coalescing.
+
+    Concurrent misses for the same key on an event loop share a single
+    computation, which runs as its own task: it completes for the
+    remaining requests even when the one that started it is cancelled.
+    Backend errors are logged and treated as misses, so an
+    unavailable cache never fails a request.
+
+    Results overlapping changed catalog events are evicted by
+    `invalidate_range`; a computation that was running meanwhile is
+    returned to its requests but not stored.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats_lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.invalidated = 0
+        _result_caches.add(self)
+
+    async def get_or_compute(self, key, compute: Callable[[], Awaitable[dict]], ttl) -> tuple:
+        """
+        Returns the cached value of a key, computing and storing it on a miss.
+
+        Args:
+            key (str): The cache key.
+            compute (Callable[[], Awaitable[dict]]): Computes the value; errors are not cached.
+            ttl (float): The time to live of a computed value in seconds.
+
+        Returns:
+            tuple: The value and whether it was served from the cache.
+        """
+        if self.backend is None:
+            return await compute(), False
+        value = await self._backend_get(key)
+        if value is not None:
+            self._count("hits")
+            return value, True
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._count("coalesced")
+        else:
+            self._count("misses")
+            # The computation runs as a task of its own, so a request that goes away (e.g. a
+            # disconnected client) only stops waiting and never cancels it for the others.
+            task = asyncio.get_running_loop().create_task(self._compute_and_store(key, compute, ttl))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), False
+
+    async def _compute_and_store(self, key, compute, ttl):
+        generation = self._generation
+        value = await compute()
+        if generation == self._generation:
+            await self._backend_set(key, value, ttl)
+        return value
+
+    def _finish(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Waiters retrieve the error themselves; this marks it retrieved when there are none.
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate_range(self, start_ms, end_ms) -> int:
+        """
+        Evicts the cached results whose date range overlaps a time span.
+
+        Blocking; called from the catalog synchronization and index refresh threads.
+
+        Args:
+            start_ms (int): The start of the span in milliseconds since the epoch.
+            end_ms (int): The end of the span in milliseconds since the epoch.
+
+        Returns:
+            int: The number of evicted results.
+        """
+        if self.backend is None:
+            return 0
+        with self._stats_lock:
+            self._generation += 1
+        try:
+            evicted = self.backend.evict(lambda key: key_overlaps(key, start_ms, end_ms))
+        except Exception as exc:
+            self._count("errors")
+            logger.warning("Result cache invalidation failed: %s", exc)
+            return 0
+        with self._stats_lock:
+            self.invalidated += evicted
+        return evicted
+
+    def statistics(self) -> dict:
+        """
+        Returns the hit, miss, coalescing and invalidation counts of the cache.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self._stats_lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "backend": self.backend.name if self.backend is not None else "none",
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "invalidated": self.invalidated,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    async def _backend_get(self, key):
+        try:
+            return await self.backend.get(key)
+        except Exception as exc:
+            self._count("errors")
+            logger.warning("Result cache lookup failed: %s", exc)
+            return None
+
+    async def _backend_set(self, key, value, ttl):
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as exc:
+            self._count("errors")
+            logger.warning("Result cache store failed: %s", exc)
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
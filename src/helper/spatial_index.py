@@ -0,0 +1,442 @@
+import heapq
+import threading
+import time
+
+import numpy as np
+
+from helper.distance import (
+    SPHERICAL_RELATIVE_ERROR,
+    geodesic_km,
+    haversine_km,
+    refine_candidates,
+    refine_nearest_k,
+    spherical_bound,
+)
+from helper.earthquake_catalog import EarthquakeCatalog, StringColumn
+
+
+class EarthquakeSpatialIndex:
+    """
+    In-memory grid index over earthquake events.
+
+    Events are bucketed into latitude/longitude cells of `cell_degrees`
+    degrees, and inside each cell they are kept sorted by time, so a date
+    range is a binary search per cell. Nearest-neighbour queries visit cells
+    in increasing order of their lower-bound distance to the query point and
+    stop as soon as no unvisited cell can hold a closer event.
+
+    Events can be added, replaced and removed incrementally; replaced and
+    removed events are masked out until the next full build.
+
+    A full build keeps the columns of the given catalog instead of copying
+    them, so an index built from a memory-mapped `EventStore` shares its
+    pages with the other processes. When the built events are sorted by
+    time, as in a store, `select` finds a date range by binary search.
+    """
+
+    def __init__(self, cell_degrees=5.0):
+        self.cell_degrees = float(cell_degrees)
+        self._lat_cells = int(np.ceil(180.0 / self.cell_degrees))
+        self._lon_cells = int(np.ceil(360.0 / self.cell_degrees))
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self.build_time_ms = 0.0
+        self.build_count = 0
+        self.query_count = 0
+        self.query_time_total_ms = 0.0
+        self.query_time_max_ms = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._catalog = EarthquakeCatalog.empty()
+        self._sorted_count = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._positions = {}
+        self._cells = {}
+        self._cell_times = {}
+        self._refresh_cell_geometry()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @property
+    def stored_events(self) -> int:
+        """The number of stored events, including replaced and removed ones."""
+        return len(self._catalog)
+
+    def build(self, catalog: EarthquakeCatalog):
+        """
+        Replaces the content of the index with the given events.
+
+        Args:
+            catalog (EarthquakeCatalog): The events to index.
+        """
+        with self._lock:
+            self._reset()
+            self.upsert(catalog)
+            if np.all(catalog.times[1:] >= catalog.times[:-1]):
+                self._sorted_count = len(catalog)
+
+    def upsert(self, catalog: EarthquakeCatalog):
+        """
+        Adds new events and replaces the events whose id is already indexed.
+
+        Args:
+            catalog (EarthquakeCatalog): The new or revised events.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if self._positions:
+                self.remove(catalog.ids)
+            offset = len(self._catalog)
+            if offset == 0:
+                self._catalog = catalog
+            else:
+                self._catalog = EarthquakeCatalog(
+                    ids=self._catalog.ids + catalog.ids,
+                    times=np.concatenate([self._catalog.times, catalog.times]),
+                    latitudes=np.concatenate([self._catalog.latitudes, catalog.latitudes]),
+                    longitudes=np.concatenate([self._catalog.longitudes, catalog.longitudes]),
+                    depths=np.concatenate([self._catalog.depths, catalog.depths]),
+                    magnitudes=np.concatenate([self._catalog.magnitudes, catalog.magnitudes]),
+                    places=self._catalog.places + catalog.places,
+                )
+            self._alive = np.concatenate([self._alive, np.ones(len(catalog), dtype=bool)])
+            for position, event_id in enumerate(catalog.ids, start=offset):
+                previous = self._positions.get(event_id)
+                if previous is not None:
+                    self._alive[previous] = False
+                self._positions[event_id] = position
+
+            new_positions = np.arange(offset, len(self._catalog))
+            keys = self._cell_keys(catalog.latitudes, catalog.longitudes)
+            for key in np.unique(keys):
+                positions = new_positions[keys == key]
+                if key in self._cells:
+                    positions = np.concatenate([self._cells[key], positions])
+                order = np.argsort(self._catalog.times[positions], kind="stable")
+                self._cells[key] = positions[order]
+                self._cell_times[key] = self._catalog.times[self._cells[key]]
+            self._refresh_cell_geometry()
+        with self._stats_lock:
+            self.build_time_ms += (time.perf_counter() - start) * 1000
+            self.build_count += 1
+
+    def remove(self, event_ids):
+        """
+        Removes events from the index.
+
+        Args:
+            event_ids (Iterable[str]): The ids of the events to remove.
+        """
+        with self._lock:
+            for event_id in event_ids:
+                position = self._positions.pop(event_id, None)
+                if position is not None:
+                    self._alive[position] = False
+
+    def event(self, position) -> dict:
+        """
+        Returns one indexed event as a plain dictionary.
+
+        Args:
+            position (int): The position returned by a query.
+
+        Returns:
+            dict: The event id, time, coordinates, depth, magnitude and place.
+        """
+        return self._catalog.event(position)
+
+    def nearest(self, latitude, longitude, start_ms=None, end_ms=None, min_magnitude=None) -> tuple:
+        """
+        Finds the event nearest to a point.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            start_ms (int): The earliest event time in milliseconds since the epoch.
+            end_ms (int): The latest event time in milliseconds since the epoch.
+            min_magnitude (float): The minimum magnitude of the events.
+
+        Returns:
+            tuple: The position of the nearest event and its geodesic distance in kilometers,
+            or (None, inf) when no event matches the filters.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            lower_bounds = self._cell_lower_bounds(latitude, longitude)
+            best = float("inf")
+            candidate_positions, candidate_distances = [], []
+            for cell in np.argsort(lower_bounds):
+                if lower_bounds[cell] > spherical_bound(best):
+                    break
+                positions = self._filter_cell(self._cell_key_list[cell], start_ms, end_ms, min_magnitude)
+                if len(positions) == 0:
+                    continue
+                distances = haversine_km(
+                    latitude,
+                    longitude,
+                    self._catalog.latitudes[positions],
+                    self._catalog.longitudes[positions],
+                )
+                candidate_positions.append(positions)
+                candidate_distances.append(distances)
+                best = min(best, float(distances.min()))
+
+            if not candidate_positions:
+                result = (None, float("inf"))
+            else:
+                positions = np.concatenate(candidate_positions)
+                distances = np.concatenate(candidate_distances)
+                result = refine_candidates(
+                    (latitude, longitude),
+                    positions[distances <= spherical_bound(best)],
+                    self._catalog.latitudes,
+                    self._catalog.longitudes,
+                )
+        self._record_query(start)
+        return result
+
+    def nearest_k(
+        self, latitude, longitude, k, start_ms=None, end_ms=None, min_magnitude=None
+    ) -> list:
+        """
+        Finds the k events nearest to a point.
+
+        Cells are visited like in `nearest`, keeping the k smallest spherical
+        distances seen so far in a heap; the search stops once no unvisited
+        cell can hold an event closer than the current k-th one.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            k (int): The number of events to return.
+            start_ms (int): The earliest event time in milliseconds since the epoch.
+            end_ms (int): The latest event time in milliseconds since the epoch.
+            min_magnitude (float): The minimum magnitude of the events.
+
+        Returns:
+            list: Tuples of event position and geodesic distance in kilometers, nearest first.
+        """
+        k = int(k)
+        if k <= 0:
+            return []
+        start = time.perf_counter()
+        # Max-heap (negated) of the k smallest spherical distances seen so far.
+        heap = []
+        candidate_positions, candidate_distances = [], []
+        with self._lock:
+            lower_bounds = self._cell_lower_bounds(latitude, longitude)
+            for cell in np.argsort(lower_bounds):
+                if len(heap) == k and lower_bounds[cell] > spherical_bound(-heap[0]):
+                    break
+                positions = self._filter_cell(self._cell_key_list[cell], start_ms, end_ms, min_magnitude)
+                if len(positions) == 0:
+                    continue
+                distances = haversine_km(
+                    latitude,
+                    longitude,
+                    self._catalog.latitudes[positions],
+                    self._catalog.longitudes[positions],
+                )
+                candidate_positions.append(positions)
+                candidate_distances.append(distances)
+                for distance in np.partition(distances, min(k, len(distances)) - 1)[:k]:
+                    if len(heap) < k:
+                        heapq.heappush(heap, -distance)
+                    elif distance < -heap[0]:
+                        heapq.heapreplace(heap, -distance)
+
+            if not candidate_positions:
+                results = []
+            else:
+                positions = np.concatenate(candidate_positions)
+                distances = np.concatenate(candidate_distances)
+                results = refine_nearest_k(
+                    (latitude, longitude),
+                    positions[distances <= spherical_bound(-heap[0])],
+                    self._catalog.latitudes,
+                    self._catalog.longitudes,
+                    k,
+                )
+        self._record_query(start)
+        return results
+
+    def within_radius(
+        self, latitude, longitude, radius_km, start_ms=None, end_ms=None, min_magnitude=None
+    ) -> list:
+        """
+        Finds every event within a geodesic radius of a point.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            radius_km (float): The radius in kilometers.
+            start_ms (int): The earliest event time in milliseconds since the epoch.
+            end_ms (int): The latest event time in milliseconds since the epoch.
+            min_magnitude (float): The minimum magnitude of the events.
+
+        Returns:
+            list: Tuples of event position and geodesic distance in kilometers, nearest first.
+        """
+        start = time.perf_counter()
+        search_radius = radius_km / (1 - SPHERICAL_RELATIVE_ERROR)
+        results = []
+        with self._lock:
+            lower_bounds = self._cell_lower_bounds(latitude, longitude)
+            for cell in np.flatnonzero(lower_bounds <= search_radius):
+                positions = self._filter_cell(self._cell_key_list[cell], start_ms, end_ms, min_magnitude)
+                if len(positions) == 0:
+                    continue
+                distances = haversine_km(
+                    latitude,
+                    longitude,
+                    self._catalog.latitudes[positions],
+                    self._catalog.longitudes[positions],
+                )
+                for position in positions[distances <= search_radius]:
+                    distance = geodesic_km(
+                        (latitude, longitude),
+                        self._catalog.latitudes[position],
+                        self._catalog.longitudes[position],
+                    )
+                    if distance <= radius_km:
+                        results.append((int(position), distance))
+        self._record_query(start)
+        return sorted(results, key=lambda result: result[1])
+
+    def select(self, start_ms=None, end_ms=None, min_magnitude=None) -> EarthquakeCatalog:
+        """
+        Returns the indexed events matching the filters as a catalog ordered by time.
+
+        Args:
+            start_ms (int): The earliest event time in milliseconds since the epoch.
+            end_ms (int): The latest event time in milliseconds since the epoch.
+            min_magnitude (float): The minimum magnitude of the events.
+
+        Returns:
+            EarthquakeCatalog: The matching events.
+        """
+        with self._lock:
+            catalog = self._catalog
+            # Built events sorted by time are sliced by binary search; only
+            # the events upserted since are scanned.
+            sorted_times = catalog.times[: self._sorted_count]
+            low = 0 if start_ms is None else np.searchsorted(sorted_times, start_ms, side="left")
+            high = len(sorted_times) if end_ms is None else np.searchsorted(sorted_times, end_ms, side="right")
+            positions = np.arange(low, max(low, high))
+            if len(catalog) > self._sorted_count:
+                upserted = np.arange(self._sorted_count, len(catalog))
+                mask = np.ones(len(upserted), dtype=bool)
+                if start_ms is not None:
+                    mask &= catalog.times[upserted] >= start_ms
+                if end_ms is not None:
+                    mask &= catalog.times[upserted] <= end_ms
+                positions = np.concatenate([positions, upserted[mask]])
+                positions = positions[np.argsort(catalog.times[positions], kind="stable")]
+            positions = positions[self._alive[positions]]
+            if min_magnitude is not None:
+                positions = positions[catalog.magnitudes[positions] >= min_magnitude]
+            return EarthquakeCatalog(
+                ids=[catalog.ids[position] for position in positions],
+                times=catalog.times[positions],
+                latitudes=catalog.latitudes[positions],
+                longitudes=catalog.longitudes[positions],
+                depths=catalog.depths[positions],
+                magnitudes=catalog.magnitudes[positions],
+                places=[catalog.places[position] for position in positions],
+            )
+
+    def statistics(self) -> dict:
+        """
+        Returns the size, memory footprint, build time and query latency of the index.
+
+        Returns:
+            dict: The index statistics.
+        """
+        with self._lock:
+            catalog = self._catalog
+            array_bytes = sum(
+                array.nbytes
+                for array in (
+                    catalog.times,
+                    catalog.latitudes,
+                    catalog.longitudes,
+                    catalog.depths,
+                    catalog.magnitudes,
+                    self._alive,
+                    *self._cells.values(),
+                    *self._cell_times.values(),
+                )
+            )
+            string_bytes = sum(
+                column.nbytes if isinstance(column, StringColumn) else sum(len(value) for value in column)
+                for column in (catalog.ids, catalog.places)
+            )
+            stats = {
+                "events": len(self._positions),
+                "stored_events": len(catalog),
+                "cells": len(self._cells),
+                "cell_degrees": self.cell_degrees,
+                "memory_bytes": int(array_bytes + string_bytes),
+            }
+        with self._stats_lock:
+            stats.update(
+                build_count=self.build_count,
+                build_time_total_ms=round(self.build_time_ms, 3),
+                query_count=self.query_count,
+                query_time_avg_ms=round(self.query_time_total_ms / self.query_count, 3)
+                if self.query_count
+                else 0.0,
+                query_time_max_ms=round(self.query_time_max_ms, 3),
+            )
+        return stats
+
+    def _record_query(self, start):
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.query_count += 1
+            self.query_time_total_ms += elapsed
+            self.query_time_max_ms = max(self.query_time_max_ms, elapsed)
+
+    def _cell_keys(self, latitudes, longitudes) -> np.ndarray:
+        lat_cells = np.clip(
+            np.floor((np.asarray(latitudes) + 90.0) / self.cell_degrees), 0, self._lat_cells - 1
+        ).astype(np.int64)
+        lon_cells = np.floor((np.asarray(longitudes) + 180.0) / self.cell_degrees).astype(
+            np.int64
+        ) % self._lon_cells
+        return lat_cells * self._lon_cells + lon_cells
+
+    def _refresh_cell_geometry(self):
+        """Precomputes the bounding cap (center and radius) of every non-empty cell."""
+        self._cell_key_list = list(self._cells.keys())
+        keys = np.array(self._cell_key_list, dtype=np.int64)
+        south = (keys // self._lon_cells) * self.cell_degrees - 90.0
+        west = (keys % self._lon_cells) * self.cell_degrees - 180.0
+        north = np.minimum(south + self.cell_degrees, 90.0)
+        east = west + self.cell_degrees
+        self._cell_center_lats = (south + north) / 2
+        self._cell_center_lons = (west + east) / 2
+        # The farthest point of a latitude/longitude box from its center is a corner.
+        self._cell_radii = np.zeros(len(keys))
+        for corner_lats, corner_lons in ((south, west), (south, east), (north, west), (north, east)):
+            self._cell_radii = np.maximum(
+                self._cell_radii,
+                haversine_km(self._cell_center_lats, self._cell_center_lons, corner_lats, corner_lons),
+            )
+
+    def _cell_lower_bounds(self, latitude, longitude) -> np.ndarray:
+        distances = haversine_km(latitude, longitude, self._cell_center_lats, self._cell_center_lons)
+        return np.maximum(distances - self._cell_radii, 0.0)
+
+    def _filter_cell(self, key, start_ms, end_ms, min_magnitude) -> np.ndarray:
+        times = self._cell_times[key]
+        low = 0 if start_ms is None else np.searchsorted(times, start_ms, side="left")
+        high = len(times) if end_ms is None else np.searchsorted(times, end_ms, side="right")
+        positions = self._cells[key][low:high]
+        mask = self._alive[positions]
+        if min_magnitude is not None:
+            mask &= self._catalog.magnitudes[positions] >= min_magnitude
+        return positions[mask]
+
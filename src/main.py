@@ -1,16 +1,92 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from sqlalchemy.exc import SQLAlchemyError
 
 from controllers.city_controller import city_router
 from controllers.country_controller import country_router
 from controllers.earthquake_controller import earthquake_router
+from controllers.import_controller import import_router
+from controllers.metrics_controller import metrics_router
 from controllers.state_controller import state_router
+from helper.database import dispose_async_engines, dispose_engines, get_engine
+from helper.http_client import close_http_clients
+from services.earthquake_catalog_service import (
+    EarthquakeCatalogService,
+    EarthquakeSyncScheduler,
+)
+from services.container import container
+from services.geocoding_service import GeocodingService
+from utils.logger import Logger, RequestIdMiddleware
 
 load_dotenv()
 
-app = FastAPI()
+logger = Logger(name="main")
+
+
+def preload_worker():
+    """
+    Loads what every request of a worker process needs before it serves traffic.
+
+    Opens the database connection pool, builds the spatial index of the
+    local catalog (mapping the event snapshot when one is configured) and
+    fills the reverse geocoding cache. Each step is best effort: a failure is
+    logged and the data is loaded by the first request instead.
+    """
+    try:
+        with get_engine().connect():
+            pass
+    except SQLAlchemyError as exc:
+        logger.warning("Database unavailable at startup: %s", exc)
+        return
+    if os.getenv("EARTHQUAKE_CATALOG_SOURCE", "auto").lower() != "usgs":
+        try:
+            index = EarthquakeCatalogService().get_spatial_index()
+            logger.info("Preloaded the spatial index with %s events.", len(index))
+        except SQLAlchemyError as exc:
+            logger.warning("Local earthquake catalog unavailable at startup: %s", exc)
+    GeocodingService().preload_reverse_cache()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: builds the shared services, preloads the worker data
+    unless `PRELOAD_ON_STARTUP` is false, starts the background catalog synchronization when
+    `EARTHQUAKE_SYNC_INTERVAL_SECONDS` is set and releases the pooled database
+    and HTTP connections on shutdown.
+
+    Runs once in every worker process; with several workers,
+    `EARTHQUAKE_SYNC_LOCK_PATH` makes a single one of them synchronize.
+    """
+    container.build()
+    if os.getenv("PRELOAD_ON_STARTUP", "true").lower() == "true":
+        await asyncio.to_thread(preload_worker)
+    scheduler = None
+    sync_interval = float(os.getenv("EARTHQUAKE_SYNC_INTERVAL_SECONDS", "0"))
+    if sync_interval > 0:
+        scheduler = EarthquakeSyncScheduler(
+            EarthquakeCatalogService(), sync_interval, os.getenv("EARTHQUAKE_SYNC_LOCK_PATH") or None
+        )
+        scheduler.start()
+    yield
+    if scheduler is not None:
+        scheduler.stop()
+    await close_http_clients()
+    await dispose_async_engines()
+    dispose_engines()
+    container.reset()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(earthquake_router)
 app.include_router(city_router)
 app.include_router(country_router)
 app.include_router(state_router)
+app.include_router(import_router)
+app.include_router(metrics_router)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from helper.database import Base
@@ -11,6 +11,8 @@ class City(Base):
     Attributes:
         id (int): The unique identifier for the city.
         name (str): The name of the city.
+        latitude (float): The latitude of the city, geocoded when the city is created.
+        longitude (float): The longitude of the city, geocoded when the city is created.
     """
 
     __tablename__ = "cities"
@@ -18,5 +20,9 @@ class City(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True)
     state_province_id = Column(Integer, ForeignKey("states.id"))
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Serves the pages of the cities of a state, ordered by ID.
+    __table_args__ = (Index("ix_cities_state_province_id_id", "state_province_id", "id"),)
     state = relationship("State", back_populates="cities")
     earthquake_searches = relationship("EarthquakeSearch", back_populates="city")
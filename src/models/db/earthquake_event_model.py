@@ -0,0 +1,52 @@
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, String
+
+from helper.database import Base
+
+
+class EarthquakeEvent(Base):
+    """
+    Represents an earthquake event mirrored from the USGS catalog.
+
+    Attributes:
+        id (str): The USGS event id.
+        time (int): The origin time of the event in milliseconds since the epoch.
+        latitude (float): The latitude of the epicenter.
+        longitude (float): The longitude of the epicenter.
+        depth (float): The depth of the hypocenter in kilometers.
+        magnitude (float): The magnitude of the event.
+        place (str): The USGS description of the region of the event.
+        updated (int): The last time USGS updated the event, in milliseconds since the epoch.
+    """
+
+    __tablename__ = "earthquake_events"
+
+    id = Column(String(32), primary_key=True)
+    time = Column(BigInteger, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    depth = Column(Float, nullable=True)
+    magnitude = Column(Float, nullable=True)
+    place = Column(String(255), nullable=True)
+    updated = Column(BigInteger, nullable=False)
+    __table_args__ = (Index("ix_earthquake_events_time_magnitude", "time", "magnitude"),)
+
+
+class EarthquakeCatalogSync(Base):
+    """
+    Represents the synchronization state of the local earthquake catalog.
+
+    Attributes:
+        source (str): The name of the synchronized catalog.
+        start_time (datetime): The earliest event time kept in the local catalog.
+        min_magnitude (float): The minimum magnitude kept in the local catalog.
+        updated_cursor (int): The latest `updated` timestamp seen, in milliseconds since the epoch.
+        last_synced_at (datetime): The time up to which the local catalog is complete.
+    """
+
+    __tablename__ = "earthquake_catalog_syncs"
+
+    source = Column(String(32), primary_key=True)
+    start_time = Column(DateTime, nullable=False)
+    min_magnitude = Column(Float, nullable=False)
+    updated_cursor = Column(BigInteger, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
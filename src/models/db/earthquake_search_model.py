@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey, Index, true
 from sqlalchemy.orm import relationship
 from helper.database import Base
 
@@ -16,10 +16,15 @@ class EarthquakeSearch(Base):
         closest_earthquake_magnitude (float): The magnitude of the closest earthquake found in the search.
         closest_earthquake_distance (float): The distance to the closest earthquake found in the search.
         closest_earthquake_location (str): The location of the closest earthquake found in the search.
+        searched_at (datetime): When the search was made.
+        is_current (bool): False once a catalog revision inside the date range may have changed the result.
     """
 
     __tablename__ = 'earthquake_searches'
-    
+    __table_args__ = (
+        Index("ix_earthquake_searches_city_id_start_date_end_date", "city_id", "start_date", "end_date"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     city_id = Column(Integer, ForeignKey('cities.id'))
     city = relationship("City", back_populates="earthquake_searches")
@@ -29,3 +34,5 @@ class EarthquakeSearch(Base):
     closest_earthquake_magnitude = Column(Float)
     closest_earthquake_distance = Column(Float)
     closest_earthquake_location = Column(String(255))
+    searched_at = Column(DateTime)
+    is_current = Column(Boolean, nullable=False, default=True, server_default=true())
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, String
+
+from helper.database import Base
+
+
+class ReverseGeocode(Base):
+    """
+    Represents a cached reverse geocoding result.
+
+    Attributes:
+        key (str): The cache key, either a USGS event id ("event:<id>") or rounded coordinates ("coord:<lat>,<lon>").
+        address (str): The address returned by the geocoder.
+        created_at (datetime): When the address was geocoded.
+    """
+
+    __tablename__ = "reverse_geocodes"
+
+    key = Column(String(64), primary_key=True)
+    address = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 from helper.database import Base
 
@@ -21,5 +21,9 @@ class State(Base):
     name = Column(String(100), nullable=False)
     state_abbreviation = Column(String(2), nullable=True)
     country_id = Column(Integer, ForeignKey("countries.id"), nullable=False)
-    __table_args__ = (UniqueConstraint("name", "country_id", name="_state_country_uc"),)
+    __table_args__ = (
+        UniqueConstraint("name", "country_id", name="_state_country_uc"),
+        # Serves the pages of the states of a country, ordered by ID.
+        Index("ix_states_country_id_id", "country_id", "id"),
+    )
     cities = relationship("City", back_populates="state")
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -8,10 +10,14 @@ class CityCreate(BaseModel):
     Attributes:
         name (str): The name of the city.
         state_province_id (int): The ID of the state or province the city belongs to.
+        latitude (float): The latitude of the city; geocoded from the name when omitted.
+        longitude (float): The longitude of the city; geocoded from the name when omitted.
     """
 
     name: str = Field(..., description="The name of the city.")
     state_province_id: int = Field(..., description="The ID of the state or province the city belongs to.")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="The latitude of the city.")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="The longitude of the city.")
 
     @field_validator('name')
     def validate_name(cls, value):
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class EarthquakeModel(BaseModel):
@@ -11,6 +13,8 @@ class EarthquakeModel(BaseModel):
         state_abbreviation (str): State abbreviation of the city to check for earthquakes.
         start_date (str): Start date for the earthquake query in YYYY-MM-DD format.
         end_date (str): End date for the earthquake query in YYYY-MM-DD format.
+        latitude (float): Stored latitude of the city, if already geocoded.
+        longitude (float): Stored longitude of the city, if already geocoded.
     """
     city_name: str = Field(
         ...,
@@ -37,6 +41,16 @@ class EarthquakeModel(BaseModel):
         example="2021-07-05",
         description="End date for the earthquake query in YYYY-MM-DD format",
     )
+    latitude: Optional[float] = Field(
+        None,
+        example=34.0536909,
+        description="Stored latitude of the city, if already geocoded",
+    )
+    longitude: Optional[float] = Field(
+        None,
+        example=-118.242766,
+        description="Stored longitude of the city, if already geocoded",
+    )
 
 
 class EarthquakeResponse(BaseModel):
@@ -48,3 +62,139 @@ class EarthquakeResponse(BaseModel):
     """
 
     message: str
+
+
+class EarthquakeBatchQuery(BaseModel):
+    """
+    Represents the schema of a closest earthquake query over many cities.
+
+    Exactly one of `city_ids`, `state_id` and `country_id` selects the cities.
+
+    Attributes:
+        city_ids (List[int]): IDs of the cities to check for earthquakes.
+        state_id (int): ID of the state whose cities are checked.
+        country_id (int): ID of the country whose cities are checked.
+        start_date (str): Start date for the earthquake query in YYYY-MM-DD format.
+        end_date (str): End date for the earthquake query in YYYY-MM-DD format.
+    """
+    city_ids: Optional[List[int]] = Field(
+        None,
+        example=[1, 2, 3],
+        description="IDs of the cities to check for earthquakes",
+    )
+    state_id: Optional[int] = Field(
+        None,
+        example=1,
+        description="ID of the state whose cities are checked",
+    )
+    country_id: Optional[int] = Field(
+        None,
+        example=1,
+        description="ID of the country whose cities are checked",
+    )
+    start_date: str = Field(
+        ...,
+        example="2021-06-01",
+        description="Start date for the earthquake query in YYYY-MM-DD format",
+    )
+    end_date: str = Field(
+        ...,
+        example="2021-07-05",
+        description="End date for the earthquake query in YYYY-MM-DD format",
+    )
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+            """
+            Validates that the cities are selected in exactly one way.
+
+            Raises:
+                ValueError: If none or several of the selectors are given, or the city IDs are empty.
+
+            Returns:
+                EarthquakeBatchQuery: The validated query.
+            """
+            selectors = [self.city_ids, self.state_id, self.country_id]
+            if sum(selector is not None for selector in selectors) != 1:
+                raise ValueError('Exactly one of city_ids, state_id and country_id must be given.')
+            if self.city_ids is not None and not self.city_ids:
+                raise ValueError('city_ids must not be empty.')
+            return self
+
+
+class EarthquakeBatchResult(BaseModel):
+    """
+    Represents the result of a closest earthquake query for one city of a batch.
+
+    Attributes:
+        city_id (int): The ID of the city.
+        city_name (str): The name of the city.
+        message (str): The result message, as returned for a single city.
+    """
+
+    city_id: int
+    city_name: str
+    message: str
+
+
+class EarthquakeBatchResponse(BaseModel):
+    """
+    Represents the response of a closest earthquake query over many cities.
+
+    Attributes:
+        results (List[EarthquakeBatchResult]): The results, one per city, ordered by city ID.
+    """
+
+    results: List[EarthquakeBatchResult]
+
+
+class EarthquakeEvent(BaseModel):
+    """
+    Represents one earthquake of a top-k or radius query.
+
+    Attributes:
+        id (str): The USGS event id.
+        time (int): The origin time in milliseconds since the epoch.
+        latitude (float): The latitude of the epicenter.
+        longitude (float): The longitude of the epicenter.
+        depth (float): The depth in kilometers, if known.
+        magnitude (float): The magnitude, if known.
+        place (str): The USGS description of the region of the event.
+        distance_km (float): The geodesic distance to the city in kilometers.
+    """
+
+    id: str
+    time: int
+    latitude: float
+    longitude: float
+    depth: Optional[float] = None
+    magnitude: Optional[float] = None
+    place: str
+    distance_km: float
+
+
+class EarthquakeNearbyResponse(BaseModel):
+    """
+    Represents the response of a top-k or radius earthquake query.
+
+    Attributes:
+        city_id (int): The ID of the city.
+        city_name (str): The name of the city.
+        start_date (str): The start date of the query.
+        end_date (str): The end date of the query.
+        mode (str): "top_k" or "radius".
+        k (int): The number of earthquakes of a top-k query, or the maximum number of a radius query.
+        radius_km (float): The radius of a radius query.
+        min_magnitude (float): The minimum magnitude of the earthquakes.
+        earthquakes (List[EarthquakeEvent]): The earthquakes, nearest first.
+    """
+
+    city_id: int
+    city_name: str
+    start_date: str
+    end_date: str
+    mode: str
+    k: int
+    radius_km: Optional[float] = None
+    min_magnitude: float
+    earthquakes: List[EarthquakeEvent]
@@ -0,0 +1,37 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class ImportRowError(BaseModel):
+    """
+    Represents a row rejected by a bulk import.
+
+    Attributes:
+        row (int): The number of the row in the file, starting at 1.
+        error (str): Why the row was rejected.
+    """
+
+    row: int = Field(..., example=12, description="The number of the row in the file, starting at 1")
+    error: str = Field(..., example="Already exists city with name: Lisbon", description="Why the row was rejected")
+
+
+class ImportSummary(BaseModel):
+    """
+    Represents the outcome of a bulk import.
+
+    Attributes:
+        rows (int): The number of rows read.
+        countries (int): The number of countries created.
+        states (int): The number of states created.
+        cities (int): The number of cities created.
+        failed (int): The number of rejected rows.
+        errors (List[ImportRowError]): The first rejected rows and why they were rejected.
+    """
+
+    rows: int = 0
+    countries: int = 0
+    states: int = 0
+    cities: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
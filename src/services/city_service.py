@@ -1,11 +1,16 @@
 import re
 
+from geopy.exc import GeopyError
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import joinedload
 
-from helper.database import session_scope
+from helper.database import run_with_session, session_scope, stream_partitions
+from helper.pagination import DEFAULT_PAGE_SIZE, keyset_page
 from models.db.city_model import City
+from models.db.state_model import State
 from models.schemas.city_schema import CityCreate
+from services.geocoding_service import GeocodingService
 from utils.logger import Logger
 
 logger = Logger(name="city_service")
@@ -28,22 +33,27 @@ class CityService:
         Raises:
             ValueError: If there is an issue with the provided foreign keys or an unexpected error occurs.
         """
-        logger.info(f"Starging creating city: {city_create}")
+        logger.info("Starging creating city: %s", city_create)
+        latitude, longitude = city_create.latitude, city_create.longitude
+        if latitude is None or longitude is None:
+            latitude, longitude = self.geocode_city(city_create.name)
         with session_scope() as db:
             try:
                 city = City(
                     name=city_create.name,
                     state_province_id=city_create.state_province_id,
+                    latitude=latitude,
+                    longitude=longitude,
                 )
                 db.add(city)
                 db.commit()
                 db.refresh(city)
-                logger.info(f"City: {city_create} created successfully.")
+                logger.info("City: %s created successfully.", city_create)
                 return city
             except IntegrityError as exc:
                 db.rollback()
                 error_message = self.extract_error_message(str(exc))
-                logger.error(f"City: {city_create} creation failed. Error: {error_message}")
+                logger.error("City: %s creation failed. Error: %s", city_create, error_message)
                 raise ValueError(f"Cannot create city: {error_message}") from exc
             except SQLAlchemyError as exc:
                 db.rollback()
@@ -51,6 +61,30 @@ class CityService:
                     "An unexpected error occurred while processing your request."
                 ) from exc
 
+    @staticmethod
+    def geocode_city(city_name) -> tuple:
+        """
+        Geocodes a city name, tolerating geocoder failures.
+
+        A city whose coordinates cannot be found is still created; its
+        coordinates are geocoded again the first time it is queried.
+
+        Args:
+            city_name (str): The name of the city.
+
+        Returns:
+            tuple: The latitude and longitude of the city, or (None, None).
+        """
+        try:
+            coordinates = GeocodingService().geocode(city_name)
+        except GeopyError as exc:
+            logger.warning("Geocoding %s failed. Error: %s", city_name, exc)
+            return None, None
+        if coordinates is None:
+            logger.warning("Coordinates not found for %s city.", city_name)
+            return None, None
+        return coordinates
+
     @staticmethod
     def extract_error_message(exc_message):
         """
@@ -63,7 +97,7 @@ class CityService:
             str: The extracted error message.
 
         """
-        logger.info(f"Extracting error message from: {exc_message}")
+        logger.info("Extracting error message from: %s", exc_message)
         unique_violation_pattern = re.compile(
             r"Violation of UNIQUE KEY constraint.*?The duplicate key value is \((.*?)\).",
             re.IGNORECASE,
@@ -79,24 +113,38 @@ class CityService:
         else:
             return "Data validation error. Please check the input data."
 
-    def get_cities(self):
+    def get_cities(self, limit=DEFAULT_PAGE_SIZE, after_id=None, state_id=None, country_id=None):
         """
-        Retrieves all cities from the database.
+        Retrieves one page of cities from the database, ordered by ID.
+
+        Args:
+            limit (int): The maximum number of cities of the page.
+            after_id (int): The ID of the last city of the previous page.
+            state_id (int): The ID of the state whose cities are retrieved.
+            country_id (int): The ID of the country whose cities are retrieved.
 
         Returns:
-            list: A list of City objects representing all the cities in the database.
+            list: The City objects of the page, with only their response columns loaded.
 
         Raises:
             ValueError: If an unexpected error occurs while fetching cities from the database.
         """
-        logger.info("Starting fetching cities.")
+        logger.info("Starting fetching cities after ID %s.", after_id)
+        statement = select(City)
+        if state_id is not None:
+            statement = statement.where(City.state_province_id == state_id)
+        if country_id is not None:
+            statement = statement.join(City.state).where(State.country_id == country_id)
+        statement = keyset_page(
+            statement, City, (City.id, City.name, City.state_province_id), limit, after_id
+        )
         with session_scope() as db:
             try:
-                cities = db.query(City).all()
+                cities = db.scalars(statement).all()
                 logger.info("Cities fetched successfully.")
                 return cities
             except SQLAlchemyError as exc:
-                logger.error(f"An unexpected error occurred while fetching cities. Error: {exc}")
+                logger.error("An unexpected error occurred while fetching cities. Error: %s", exc)
                 raise ValueError(
                     f"An unexpected error occurred while fetching cities. Error: {exc}"
                 ) from exc
@@ -111,23 +159,104 @@ class CityService:
         Returns:
             City or None: The city object if found, None otherwise.
         """
-        logger.info(f"Starting fetching city by ID: {city_id}")
+        logger.info("Starting fetching city by ID: %s", city_id)
         with session_scope() as db:
-            try:
-                city = (
-                    db.query(City)
-                    .options(joinedload(City.state))
-                    .filter(City.id == city_id)
-                    .first()
-                )
-                if city is None:
-                    logger.warning(f"No city found with ID {city_id} in database.")
-                    raise ValueError(f"No city found with ID {city_id} in database.")
-                
-                logger.info("City fetched successfully.")
-                return city
-            except SQLAlchemyError as exc:
-                    logger.error(f"An unexpected error occurred while fetching. Error: {exc}")
-                    raise ValueError(
-                        f"An unexpected error occurred while fetching cities. Error: {exc}"
-                    ) from exc
+            return self._get_city_by_id(db, city_id)
+
+    async def get_city_by_id_async(self, city_id):
+        """
+        Retrieve a city by its ID without blocking the event loop.
+
+        Args:
+            city_id (int): The ID of the city to retrieve.
+
+        Returns:
+            City or None: The city object if found, None otherwise.
+        """
+        logger.info("Starting fetching city by ID: %s", city_id)
+        return await run_with_session(self._get_city_by_id, city_id)
+
+    async def find_cities_async(self, city_ids=None, state_id=None, country_id=None):
+        """
+        Retrieve the cities selected by IDs, by state or by country without blocking the event loop.
+
+        Args:
+            city_ids (List[int]): The IDs of the cities to retrieve.
+            state_id (int): The ID of the state whose cities are retrieved.
+            country_id (int): The ID of the country whose cities are retrieved.
+
+        Returns:
+            list: The City objects, with their state loaded, ordered by ID.
+
+        Raises:
+            ValueError: If an unexpected error occurs while fetching cities from the database.
+        """
+        logger.info(
+            "Starting fetching cities by IDs: %s, state ID: %s, country ID: %s", city_ids, state_id, country_id
+        )
+        return await run_with_session(self._find_cities, city_ids, state_id, country_id)
+
+    def iter_cities_async(self, city_ids=None, state_id=None, country_id=None, chunk_size=100):
+        """
+        Streams the cities selected by IDs, by state or by country in chunks.
+
+        Cities are fetched with a server-side cursor, so memory stays flat
+        however many cities are selected.
+
+        Args:
+            city_ids (List[int]): The IDs of the cities to retrieve.
+            state_id (int): The ID of the state whose cities are retrieved.
+            country_id (int): The ID of the country whose cities are retrieved.
+            chunk_size (int): The number of cities of each chunk.
+
+        Returns:
+            AsyncIterator[list]: The chunks of City objects, with their state loaded, ordered by ID.
+        """
+        logger.info(
+            "Starting streaming cities by IDs: %s, state ID: %s, country ID: %s", city_ids, state_id, country_id
+        )
+        return stream_partitions(self._cities_statement(city_ids, state_id, country_id), chunk_size)
+
+    @staticmethod
+    def _cities_statement(city_ids, state_id, country_id):
+        statement = select(City).options(joinedload(City.state))
+        if city_ids is not None:
+            statement = statement.where(City.id.in_(city_ids))
+        if state_id is not None:
+            statement = statement.where(City.state_province_id == state_id)
+        if country_id is not None:
+            statement = statement.join(City.state).where(State.country_id == country_id)
+        return statement.order_by(City.id)
+
+    @classmethod
+    def _find_cities(cls, db, city_ids, state_id, country_id):
+        try:
+            cities = db.scalars(cls._cities_statement(city_ids, state_id, country_id)).all()
+            logger.info("%s cities fetched successfully.", len(cities))
+            return cities
+        except SQLAlchemyError as exc:
+            logger.error("An unexpected error occurred while fetching cities. Error: %s", exc)
+            raise ValueError(
+                f"An unexpected error occurred while fetching cities. Error: {exc}"
+            ) from exc
+
+    @staticmethod
+    def _get_city_by_id(db, city_id):
+        try:
+            city = (
+                db.query(City)
+                .options(joinedload(City.state))
+                .filter(City.id == city_id)
+                .first()
+            )
+            if city is None:
+                logger.warning("No city found with ID %s in database.", city_id)
+                return None
+
+            logger.info("City fetched successfully.")
+            return city
+        except SQLAlchemyError as exc:
+            logger.error("An unexpected error occurred while fetching. Error: %s", exc)
+            raise ValueError(
+                f"An unexpected error occurred while fetching cities. Error: {exc}"
+            ) from exc
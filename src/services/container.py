@@ -0,0 +1,88 @@
+import threading
+
+from services.city_service import CityService
+from services.country_service import CountryService
+from services.earthquake_service import EarthquakeService
+from services.import_service import ImportService
+from services.state_service import StateService
+from utils.logger import Logger
+
+logger = Logger(name="container")
+
+
+class ServiceContainer:
+    """
+    Holds one instance of every service of the application per process.
+
+    Services are stateless between requests (their caches and HTTP clients
+    are already shared at class level), so the controllers receive the same
+    instances instead of building a service, and with it a geocoder, a
+    catalog service and a fetcher, on every request.
+
+    Instances are built on first use, or all at once by `build` when the
+    application starts; `reset` discards them so the next use rebuilds them
+    from the current environment.
+    """
+
+    services = (CityService, CountryService, EarthquakeService, ImportService, StateService)
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_class):
+        """
+        Returns the shared instance of a service, building it on first use.
+
+        Args:
+            service_class (type): The service class.
+
+        Returns:
+            The service instance.
+        """
+        instance = self._instances.get(service_class)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(service_class)
+                if instance is None:
+                    instance = self._instances[service_class] = service_class()
+        return instance
+
+    def build(self):
+        """Builds every service of the application."""
+        for service_class in self.services:
+            self.get(service_class)
+        logger.info("Built %s services.", len(self.services))
+
+    def reset(self):
+        """Discards the shared instances."""
+        with self._lock:
+            self._instances.clear()
+
+
+container = ServiceContainer()
+
+
+def get_city_service() -> CityService:
+    """Dependency injector function that returns the shared instance of the CityService class."""
+    return container.get(CityService)
+
+
+def get_country_service() -> CountryService:
+    """Dependency injector function that returns the shared instance of the CountryService class."""
+    return container.get(CountryService)
+
+
+def get_earthquake_service() -> EarthquakeService:
+    """Dependency injector function that returns the shared instance of the EarthquakeService class."""
+    return container.get(EarthquakeService)
+
+
+def get_import_service() -> ImportService:
+    """Dependency injector function that returns the shared instance of the ImportService class."""
+    return container.get(ImportService)
+
+
+def get_state_service() -> StateService:
+    """Dependency injector function that returns the shared instance of the StateService class."""
+    return container.get(StateService)
@@ -1,8 +1,10 @@
 import re
 
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from helper.database import session_scope
+from helper.pagination import DEFAULT_PAGE_SIZE, keyset_page
 from models.db.country_model import Country
 from utils.logger import Logger
 
@@ -26,18 +28,18 @@ class CountryService:
         Raises:
             ValueError: If there is an issue with the database insertion.
         """
-        logger.info(f"Starting creating country: {country_create}")
+        logger.info("Starting creating country: %s", country_create)
         with session_scope() as db:
             try:
                 country = Country(name=country_create.name)
                 db.add(country)
                 db.commit()
                 db.refresh(country)
-                logger.info(f"Country: {country_create} created successfully.")
+                logger.info("Country: %s created successfully.", country_create)
                 return country
             except IntegrityError as exc:
                 db.rollback()
-                logger.error(f"Country: {country_create} creation failed. Error: {exc}")
+                logger.error("Country: %s creation failed. Error: %s", country_create, exc)
                 error_message = self.extract_error_message(str(exc))
                 raise ValueError(f"Cannot create country: {error_message}") from exc
             except SQLAlchemyError as exc:
@@ -58,7 +60,7 @@ class CountryService:
             str: The extracted error message.
 
         """
-        logger.info(f"Extracting error message from: {exc_message}")
+        logger.info("Extracting error message from: %s", exc_message)
         unique_violation_pattern = re.compile(
             r"Violation of UNIQUE KEY constraint.*?The duplicate key value is \((.*?)\).",
             re.IGNORECASE,
@@ -71,22 +73,27 @@ class CountryService:
         else:
             return "Data validation error. Please check the input data."
 
-    def get_countries(self):
+    def get_countries(self, limit=DEFAULT_PAGE_SIZE, after_id=None):
         """
-        Retrieve all countries from the database.
+        Retrieve one page of countries from the database, ordered by ID.
+
+        Args:
+            limit (int): The maximum number of countries of the page.
+            after_id (int): The ID of the last country of the previous page.
 
         Returns:
-            List[Country]: A list of Country objects representing the countries in the database.
+            List[Country]: The Country objects of the page.
 
         Raises:
             ValueError: If an unexpected database error occurs.
         """
-        logger.info("Starting fetching countries.")
+        logger.info("Starting fetching countries after ID %s.", after_id)
+        statement = keyset_page(select(Country), Country, (Country.id, Country.name), limit, after_id)
         with session_scope() as db:
             try:
-                return db.query(Country).all()
+                return db.scalars(statement).all()
             except SQLAlchemyError as exc:
-                logger.error(f"An unexpected error occurred while fetching countries. Error: {exc}")
+                logger.error("An unexpected error occurred while fetching countries. Error: %s", exc)
                 raise ValueError(
                     f"An unexpected error occurred while fetching countries. Error: {exc}"
                 ) from exc
@@ -0,0 +1,508 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List
+
+import requests
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, select, update
+
+from helper.database import session_scope
+from helper.earthquake_catalog import EarthquakeCatalog
+from helper.event_store import EventStore
+from helper.fdsn_fetcher import timestamp_ms_to_iso
+from helper.http_client import CircuitOpenError, get_http_client
+from helper.metrics import register_metrics
+from helper.result_cache import invalidate_result_caches
+from helper.spatial_index import EarthquakeSpatialIndex
+from models.db.earthquake_event_model import EarthquakeCatalogSync, EarthquakeEvent
+from services.search_history_service import SearchHistoryService
+from utils.logger import Logger
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock, so every scheduler synchronizes.
+    fcntl = None
+
+logger = Logger(name="earthquake_catalog_service")
+
+USGS_API_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
+CATALOG_SOURCE = "usgs"
+MIN_MAGNITUDE = 5
+# SQL Server accepts at most 2100 parameters per statement.
+WRITE_BATCH_SIZE = 1000
+# Changed events further apart than this are invalidated as separate spans.
+INVALIDATION_GAP_MS = 24 * 60 * 60 * 1000
+
+
+def date_to_timestamp_ms(date_str) -> int:
+    """
+    Converts a "YYYY-MM-DD" date string (UTC midnight) to milliseconds since the epoch.
+
+    Args:
+        date_str (str): The date string.
+
+    Returns:
+        int: The timestamp in milliseconds.
+    """
+    date = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+def changed_spans(times, gap_ms=INVALIDATION_GAP_MS) -> List[tuple]:
+    """
+    Groups the times of changed events into the spans to invalidate.
+
+    Times closer than `gap_ms` share a span, so a few scattered revisions only
+    invalidate the searches around them instead of the whole synchronized window.
+
+    Args:
+        times (Iterable[int]): The event times in milliseconds since the epoch; None is ignored.
+        gap_ms (int): The largest gap between two times of the same span.
+
+    Returns:
+        List[tuple]: The start and end of each span in milliseconds since the epoch, in order.
+    """
+    spans = []
+    for event_time in sorted(t for t in times if t is not None):
+        if spans and event_time - spans[-1][1] <= gap_ms:
+            spans[-1][1] = event_time
+        else:
+            spans.append([event_time, event_time])
+    return [tuple(span) for span in spans]
+
+
+class EarthquakeCatalogService:
+    """
+    Service class that mirrors the USGS earthquake catalog into the local database.
+
+    The first synchronization downloads every event since `start_time`; later
+    synchronizations only ask USGS for events updated after the latest
+    `updated` timestamp already stored.
+
+    Queries are answered from a process-wide spatial index over the local
+    catalog, which is refreshed incrementally from the database at most every
+    `index_refresh_seconds`.
+
+    Full builds of the index start from a compact `EventStore`. With a
+    `snapshot_path`, every synchronization writes the store to a snapshot
+    file, and each worker process maps that file instead of loading the
+    events from the database, so all workers share one copy of the catalog.
+    """
+
+    _store = EventStore.empty()
+    _index = EarthquakeSpatialIndex()
+    _index_lock = threading.Lock()
+    _index_cursor = None
+    _index_state = None
+    _index_refreshed_at = None
+
+    def __init__(self, api_url=None, start_time=None, min_magnitude=None, page_size=None, snapshot_path=None):
+        self.api_url = api_url or os.getenv("USGS_API_URL", USGS_API_URL)
+        self.start_time = start_time or datetime.strptime(
+            os.getenv("EARTHQUAKE_CATALOG_START", "2000-01-01"), "%Y-%m-%d"
+        )
+        self.min_magnitude = float(
+            min_magnitude
+            if min_magnitude is not None
+            else os.getenv("EARTHQUAKE_MIN_MAGNITUDE", MIN_MAGNITUDE)
+        )
+        self.page_size = int(page_size or os.getenv("EARTHQUAKE_SYNC_PAGE_SIZE", "20000"))
+        self.index_refresh_seconds = float(os.getenv("EARTHQUAKE_INDEX_REFRESH_SECONDS", "60"))
+        self.snapshot_path = snapshot_path or os.getenv("EARTHQUAKE_SNAPSHOT_PATH") or None
+
+    def fetch_updates(self, updated_after, offset) -> List[dict]:
+        """
+        Fetches one page of events updated after the given cursor.
+
+        Args:
+            updated_after (int): The cursor in milliseconds since the epoch, or None for a full download.
+            offset (int): The 1-based offset of the first event of the page.
+
+        Returns:
+            List[dict]: The events of the page as GeoJSON features.
+
+        Raises:
+            HTTPException: If the API request fails.
+        """
+        params = {
+            "format": "geojson",
+            "starttime": self.start_time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "minmagnitude": self.min_magnitude,
+            "orderby": "time-asc",
+            "includedeleted": "true",
+            "limit": self.page_size,
+            "offset": offset,
+        }
+        if updated_after is not None:
+            params["updatedafter"] = timestamp_ms_to_iso(updated_after)
+        logger.info("Fetching catalog updates after %s from offset %s.", updated_after, offset)
+        try:
+            response = get_http_client(CATALOG_SOURCE).get(self.api_url, params=params, timeout=60)
+        except (CircuitOpenError, requests.RequestException) as exc:
+            logger.error("Failed to synchronize earthquake catalog. Error: %s", exc)
+            raise HTTPException(
+                status_code=503,
+                detail="Failed to synchronize earthquake catalog.",
+            ) from exc
+        if response.status_code != 200:
+            logger.error(
+                "Failed to synchronize earthquake catalog. Status code: %s", response.status_code
+            )
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to synchronize earthquake catalog.",
+            )
+        return response.json().get("features", [])
+
+    def sync(self) -> dict:
+        """
+        Incrementally synchronizes the local catalog with the USGS API.
+
+        Returns:
+            dict: A summary with the number of upserted and deleted events and the new cursor.
+        """
+        synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        upserted = deleted = 0
+        with session_scope() as db:
+            state = db.get(EarthquakeCatalogSync, CATALOG_SOURCE)
+            if (
+                state is None
+                or state.start_time != self.start_time
+                or state.min_magnitude != self.min_magnitude
+            ):
+                logger.info("Catalog settings changed, starting a full synchronization.")
+                state = db.merge(
+                    EarthquakeCatalogSync(
+                        source=CATALOG_SOURCE,
+                        start_time=self.start_time,
+                        min_magnitude=self.min_magnitude,
+                    )
+                )
+            cursor = state.updated_cursor
+            latest_update = cursor
+            offset = 1
+            while True:
+                features = self.fetch_updates(cursor, offset)
+                for start in range(0, len(features), WRITE_BATCH_SIZE):
+                    batch = features[start : start + WRITE_BATCH_SIZE]
+                    batch_upserted, batch_deleted = self.apply_features(db, batch)
+                    upserted += batch_upserted
+                    deleted += batch_deleted
+                db.commit()
+                # Evicted only once committed, so a request cannot cache the old answer again.
+                for span in changed_spans(feature["properties"].get("time") for feature in features):
+                    invalidate_result_caches(*span)
+                for feature in features:
+                    updated = feature["properties"].get("updated")
+                    if updated is not None and (latest_update is None or updated > latest_update):
+                        latest_update = updated
+                if len(features) < self.page_size:
+                    break
+                offset += len(features)
+
+            state.updated_cursor = latest_update
+            state.last_synced_at = synced_at
+            db.commit()
+        if self.snapshot_path:
+            try:
+                self.write_snapshot()
+            except OSError as exc:
+                logger.error("Failed to write the earthquake event snapshot: %s", exc)
+        EarthquakeCatalogService._index_refreshed_at = None
+        logger.info("Catalog synchronized: %s upserted, %s deleted.", upserted, deleted)
+        return {"upserted": upserted, "deleted": deleted, "updated_cursor": latest_update}
+
+    @staticmethod
+    def apply_features(db, features) -> tuple:
+        """
+        Inserts, updates or deletes the given events in the local catalog.
+
+        Recorded searches whose date range overlaps the changed events are
+        invalidated, since their closest earthquake may have changed. The
+        cached results are evicted by `sync` once the changes are committed.
+
+        Args:
+            db (Session): The database session.
+            features (List[dict]): The events as GeoJSON features.
+
+        Returns:
+            tuple: The number of upserted and deleted events.
+        """
+        rows = {}
+        deleted_ids = set()
+        for feature in features:
+            properties = feature["properties"]
+            if properties.get("status") == "deleted":
+                deleted_ids.add(feature["id"])
+                rows.pop(feature["id"], None)
+                continue
+            longitude, latitude, depth = feature["geometry"]["coordinates"][:3]
+            rows[feature["id"]] = {
+                "id": feature["id"],
+                "time": properties["time"],
+                "latitude": latitude,
+                "longitude": longitude,
+                "depth": depth,
+                "magnitude": properties.get("mag"),
+                "place": (properties.get("place") or "")[:255],
+                "updated": properties.get("updated") or properties["time"],
+            }
+            deleted_ids.discard(feature["id"])
+
+        if deleted_ids:
+            db.execute(delete(EarthquakeEvent).where(EarthquakeEvent.id.in_(deleted_ids)))
+        if rows:
+            existing_ids = set(
+                db.scalars(select(EarthquakeEvent.id).where(EarthquakeEvent.id.in_(rows.keys())))
+            )
+            new_rows = [row for event_id, row in rows.items() if event_id not in existing_ids]
+            changed_rows = [row for event_id, row in rows.items() if event_id in existing_ids]
+            if new_rows:
+                db.execute(insert(EarthquakeEvent), new_rows)
+            if changed_rows:
+                db.execute(update(EarthquakeEvent), changed_rows)
+        for span in changed_spans(feature["properties"].get("time") for feature in features):
+            SearchHistoryService.invalidate_range(db, *span)
+        return len(rows), len(deleted_ids)
+
+    def get_spatial_index(self) -> EarthquakeSpatialIndex:
+        """
+        Returns the process-wide spatial index over the local catalog.
+
+        Events added or revised since the previous refresh are loaded from the
+        database and upserted; the index is rebuilt from scratch when events
+        were deleted or too many replaced events accumulated.
+
+        Returns:
+            EarthquakeSpatialIndex: The refreshed index.
+        """
+        cls = EarthquakeCatalogService
+        with cls._index_lock:
+            if (
+                cls._index_refreshed_at is not None
+                and time.monotonic() - cls._index_refreshed_at < self.index_refresh_seconds
+            ):
+                return cls._index
+            if cls._index.stored_events > 2 * len(cls._index) + 1000:
+                cls._index_cursor = None
+            self._refresh_spatial_index()
+            cls._index_refreshed_at = time.monotonic()
+            return cls._index
+
+    def write_snapshot(self) -> EventStore:
+        """
+        Writes the local catalog to the snapshot file mapped by the worker processes.
+
+        Returns:
+            EventStore: The store that was written.
+
+        Raises:
+            OSError: If the snapshot cannot be written.
+        """
+        with session_scope() as db:
+            state = db.get(EarthquakeCatalogSync, CATALOG_SOURCE)
+            store = self._event_store_from_database(db, state)
+        store.save(self.snapshot_path)
+        logger.info("Wrote %s events to the snapshot %s.", len(store), self.snapshot_path)
+        return store
+
+    def _refresh_spatial_index(self):
+        cls = EarthquakeCatalogService
+        with session_scope() as db:
+            state = db.get(EarthquakeCatalogSync, CATALOG_SOURCE)
+            cls._index_state = (
+                {
+                    "start_time": state.start_time,
+                    "min_magnitude": state.min_magnitude,
+                    "last_synced_at": state.last_synced_at,
+                }
+                if state is not None
+                else None
+            )
+            total = db.scalar(select(func.count()).select_from(EarthquakeEvent))
+            if cls._index_cursor is not None:
+                query = select(EarthquakeEvent).where(EarthquakeEvent.updated >= cls._index_cursor)
+                events = list(db.scalars(query))
+                cls._index.upsert(EarthquakeCatalog.from_events(events))
+                # Another process may have synchronized the events; evict the results this
+                # process cached from the previous index.
+                for span in changed_spans(
+                    event.time for event in events if event.updated > cls._index_cursor
+                ):
+                    invalidate_result_caches(*span)
+                if events:
+                    cls._index_cursor = max(cls._index_cursor, max(event.updated for event in events))
+                if len(cls._index) == total:
+                    logger.info("Spatial index refreshed with %s events.", len(events))
+                    return
+                logger.info("Local catalog events were deleted, rebuilding the spatial index.")
+            store = self._load_event_store(db, state, total)
+            cls._store = store
+            cls._index.build(store.catalog)
+            cls._index_cursor = store.cursor
+        logger.info("Spatial index rebuilt with %s events.", len(store))
+
+    def _load_event_store(self, db, state, total) -> EventStore:
+        # The snapshot is used when it reflects the latest synchronization.
+        sync_cursor = state.updated_cursor if state is not None else None
+        if self.snapshot_path and sync_cursor is not None and os.path.exists(self.snapshot_path):
+            try:
+                store = EventStore.load(self.snapshot_path)
+            except (OSError, ValueError) as exc:
+                logger.warning("Ignoring the earthquake event snapshot: %s", exc)
+            else:
+                if store.sync_cursor == sync_cursor and len(store) == total:
+                    return store
+        store = self._event_store_from_database(db, state)
+        if self.snapshot_path:
+            try:
+                store.save(self.snapshot_path)
+                return EventStore.load(self.snapshot_path)
+            except (OSError, ValueError) as exc:
+                logger.warning("Failed to write the earthquake event snapshot: %s", exc)
+        return store
+
+    @staticmethod
+    def _event_store_from_database(db, state) -> EventStore:
+        rows = db.execute(
+            select(
+                EarthquakeEvent.id,
+                EarthquakeEvent.time,
+                EarthquakeEvent.latitude,
+                EarthquakeEvent.longitude,
+                EarthquakeEvent.depth,
+                EarthquakeEvent.magnitude,
+                EarthquakeEvent.place,
+                EarthquakeEvent.updated,
+            )
+        ).all()
+        return EventStore.from_catalog(
+            EarthquakeCatalog.from_events(rows),
+            cursor=max((row.updated for row in rows), default=None),
+            sync_cursor=state.updated_cursor if state is not None else None,
+        )
+
+    @classmethod
+    def reset_spatial_index(cls):
+        """Discards the process-wide spatial index so the next query rebuilds it."""
+        with cls._index_lock:
+            cls._store = EventStore.empty()
+            cls._index = EarthquakeSpatialIndex()
+            cls._index_cursor = None
+            cls._index_state = None
+            cls._index_refreshed_at = None
+
+    def covers(self, start_date, end_date, min_magnitude=MIN_MAGNITUDE) -> bool:
+        """
+        Checks whether the local catalog, as of the last index refresh, contains every event of a query.
+
+        Args:
+            start_date (str): The start date in the format "YYYY-MM-DD".
+            end_date (str): The end date in the format "YYYY-MM-DD".
+            min_magnitude (float): The minimum magnitude of the events.
+
+        Returns:
+            bool: True if the query can be answered from the local catalog.
+        """
+        return self.is_covered(
+            EarthquakeCatalogService._index_state,
+            date_to_timestamp_ms(start_date),
+            date_to_timestamp_ms(end_date),
+            min_magnitude,
+        )
+
+    @staticmethod
+    def is_covered(state, start_ms, end_ms, min_magnitude) -> bool:
+        """
+        Checks whether the synchronized catalog contains every event of a query.
+
+        Args:
+            state (dict): The start time, minimum magnitude and last synchronization time, or None.
+            start_ms (int): The query start time in milliseconds since the epoch.
+            end_ms (int): The query end time in milliseconds since the epoch.
+            min_magnitude (float): The query minimum magnitude.
+
+        Returns:
+            bool: True if the query can be answered from the local catalog.
+        """
+        if state is None or state["last_synced_at"] is None:
+            return False
+        catalog_start_ms = int(state["start_time"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+        synced_ms = int(state["last_synced_at"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+        return (
+            state["min_magnitude"] <= min_magnitude
+            and catalog_start_ms <= start_ms
+            and end_ms <= synced_ms
+        )
+
+
+class EarthquakeSyncScheduler:
+    """
+    Runs the catalog synchronization periodically in a background thread.
+
+    With a `lock_path`, the schedulers of several worker processes compete
+    for an exclusive lock on that file and only its holder synchronizes; the
+    lock is released when the holder exits and taken over by another worker
+    at its next tick.
+    """
+
+    def __init__(self, catalog_service: EarthquakeCatalogService, interval_seconds: float, lock_path=None):
+        self.catalog_service = catalog_service
+        self.interval_seconds = interval_seconds
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the background synchronization thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="earthquake-catalog-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background synchronization thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def is_leader(self) -> bool:
+        """
+        Checks whether this process synchronizes the catalog, taking the lock when it is free.
+
+        Returns:
+            bool: True without a lock path, or when this scheduler holds the lock.
+        """
+        if self.lock_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("Process %s now synchronizes the earthquake catalog.", os.getpid())
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.is_leader():
+                    self.catalog_service.sync()
+            except Exception as exc:
+                logger.error("Earthquake catalog synchronization failed: %s", exc)
+            self._stop_event.wait(self.interval_seconds)
+
+
+register_metrics("spatial_index", lambda: EarthquakeCatalogService._index.statistics())
+register_metrics("event_store", lambda: EarthquakeCatalogService._store.statistics())
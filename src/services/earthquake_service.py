@@ -1,11 +1,34 @@
+import asyncio
+import os
 from datetime import datetime, timezone
+from typing import Optional
 
+import httpx
 import requests
 from fastapi import HTTPException
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
-from helper.database import session_scope
+from sqlalchemy import and_, false, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from helper.database import run_with_session, session_runner
+from helper.earthquake_catalog import EarthquakeCatalog
+from helper.fdsn_fetcher import FdsnFetcher, FdsnResponseError, RingSearch
+from helper.http_client import CircuitOpenError, HttpClient, get_http_client
+from helper.metrics import register_metrics
+from helper.result_cache import ResultCache, create_cache_backend
+from helper.spatial_index import EarthquakeSpatialIndex
+from models.db.city_model import City
 from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.state_model import State
+from models.schemas.earthquake_schema import EarthquakeModel
+from services.earthquake_catalog_service import (
+    CATALOG_SOURCE,
+    MIN_MAGNITUDE,
+    USGS_API_URL,
+    EarthquakeCatalogService,
+    date_to_timestamp_ms,
+)
+from services.geocoding_service import GeocodingService
+from services.search_history_service import SearchHistoryService
 from utils.logger import Logger
 
 logger = Logger(name="earthquake_service")
@@ -16,95 +39,469 @@ class EarthquakeService:
     A class that provides methods to fetch earthquake data, process the data, and retrieve a message about the search.
 
     Attributes:
-        geolocator (Nominatim): A geolocator object used for geocoding and reverse geocoding.
+        geolocator: The geocoder selected by `GEOCODER` (Nominatim or the offline gazetteer).
+        geocoding_service (GeocodingService): The cached geocoder used to locate cities and earthquakes.
         api_url (str): The URL of the earthquake data API.
+        http_client (HttpClient): The process-wide USGS client, with keep-alive, retries and a circuit breaker.
+        result_cache (ResultCache): The process-wide cache of query results.
+        catalog_service (EarthquakeCatalogService): The local mirror of the earthquake catalog.
+        fetcher (FdsnFetcher): Fetches long date ranges from the API in concurrent windows.
+        fetch_strategy (str): How single city queries use the API: "ring" (expanding radius) or "global".
+        catalog_source (str): Where earthquake data is read from: "auto", "local" or "usgs".
+        search_history (SearchHistoryService): The recorded searches reused as persisted answers.
 
     Methods:
-        fetch_earthquake_data: Fetches earthquake data from the API.
-        get_city_coordinates: Retrieves the coordinates (latitude and longitude) of a city.
-        reverse_geocode: Performs reverse geocoding to get the address of a location.
+        fetch_earthquake_catalog: Fetches earthquake data from the API as a columnar catalog, in windows.
+        fetch_earthquake_catalog_async: Async variant of `fetch_earthquake_catalog`.
+        fetch_ring: Fetches the events of a ring search holding the k nearest to a point.
+        fetch_ring_async: Async variant of `fetch_ring`, also fetching the events within a radius.
+        get_local_index: Returns the spatial index of the local catalog when it covers a date range.
+        get_earthquakes_async: Returns the local spatial index or the catalog fetched from the API.
+        get_nearest_source: Returns the local spatial index, or what to fetch from the API around a city.
+        get_nearest_source_async: Async variant of `get_nearest_source`.
+        ring_search: Builds the deferred expanding-ring search of a date range.
+        find_closest_earthquake: Finds the earthquake closest to a city within a date range.
+        find_closest_earthquake_async: Async variant of `find_closest_earthquake`.
+        find_nearby_earthquakes: Finds the k nearest earthquakes to a city, or those within a radius.
+        resolve_city_coordinates_async: Returns the stored coordinates of a city, geocoding them on first use.
         convert_date: Converts a date string to a readable format.
         convert_timestamp_to_readable_date: Converts a timestamp to a readable date format.
-        process_earthquake_data: Processes earthquake data and returns the closest earthquake to a city.
+        closest_earthquake_for_city_async: Answers a stored city with one query and one session.
+        nearby_earthquakes_result_async: Returns the ranked top-k or radius earthquakes of a city as JSON.
+        nearby_cache_key: Builds the result cache key of a top-k or radius query.
+        closest_earthquakes_batch_async: Finds the closest earthquake to each of many cities over one date range.
+        iter_closest_earthquakes_async: Yields the closest earthquake to each city of a stream of query chunks.
+        build_stored_result_message: Builds the result message of a recorded search.
+        result_cache_key: Builds the result cache key of a query.
+        result_ttl: Returns how long the result of a query may be cached.
 
     """
 
-    def __init__(self):
-        self.geolocator = Nominatim(user_agent="my_unique_geocoder")
-        self.api_url = "https://earthquake.usgs.gov/fdsnws/event/1/query"
+    http_client: HttpClient = get_http_client(CATALOG_SOURCE)
+    result_cache = ResultCache(create_cache_backend())
 
-    def fetch_earthquake_data(self, starttime, endtime)-> dict:
+    def __init__(self):
+        self.geocoding_service = GeocodingService()
+        self.api_url = os.getenv("USGS_API_URL", USGS_API_URL)
+        self.catalog_service = EarthquakeCatalogService(api_url=self.api_url)
+        self.fetcher = FdsnFetcher(self.http_client, self.api_url)
+        self.fetch_strategy = os.getenv("EARTHQUAKE_FETCH_STRATEGY", "ring").lower()
+        self.catalog_source = os.getenv("EARTHQUAKE_CATALOG_SOURCE", "auto").lower()
+        self.search_history = SearchHistoryService()
+
+    @property
+    def geolocator(self):
+        return self.geocoding_service.geolocator
+
+    @geolocator.setter
+    def geolocator(self, geolocator):
+        self.geocoding_service.geolocator = geolocator
+
+    @staticmethod
+    def earthquake_query_params(starttime, endtime, min_magnitude=MIN_MAGNITUDE)-> dict:
         """
-        Fetches earthquake data from the API.
+        Builds the USGS API query parameters of a date range.
 
         Args:
             starttime (str): The start time of the earthquake data query.
             endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
 
         Returns:
-            dict: The earthquake data in GeoJSON format.
-
-        Raises:
-            HTTPException: If the API request fails.
+            dict: The query parameters.
 
         """
-        params = {
+        return {
             "format": "geojson",
             "starttime": starttime,
             "endtime": endtime,
-            "minmagnitude": 5,
+            "minmagnitude": min_magnitude,
             "orderby": "magnitude",
         }
-        logger.info(f"Fetching earthquake data from {starttime} to {endtime}.")
-        response = requests.get(self.api_url, params=params, timeout=10)
+
+    @staticmethod
+    def raise_unavailable(exc):
+        """
+        Reports that the API could not be reached after every retry, or that its circuit breaker is open.
+
+        Args:
+            exc (Exception): The connection or circuit breaker error.
+
+        Raises:
+            HTTPException: Always, with status code 503.
+
+        """
+        logger.error("Failed to retrieve earthquake data. Error: %s", exc)
+        raise HTTPException(
+            status_code=503,
+            detail="Failed to retrieve earthquake data.",
+        ) from exc
+
+    @staticmethod
+    def raise_response_error(exc):
+        """
+        Reports that the API answered a window of a catalog query with an error status.
+
+        Args:
+            exc (FdsnResponseError): The error.
+
+        Raises:
+            HTTPException: Always, with the status code of the API response.
+
+        """
+        logger.error("Failed to retrieve earthquake data. Status code: %s", exc.status_code)
+        raise HTTPException(
+            status_code=exc.status_code,
+            detail="Failed to retrieve earthquake data.",
+        ) from exc
+
+    @staticmethod
+    def parse_earthquake_response(response)-> dict:
+        """
+        Returns the GeoJSON body of a USGS API response.
+
+        Args:
+            response (requests.Response or httpx.Response): The API response.
+
+        Returns:
+            dict: The earthquake data in GeoJSON format.
+
+        Raises:
+            HTTPException: If the API request failed.
+
+        """
         if response.status_code == 200:
             return response.json()
         else:
             logger.error(
-                f"Failed to retrieve earthquake data. Status code: {response.status_code}"
+                "Failed to retrieve earthquake data. Status code: %s", response.status_code
             )
             raise HTTPException(
                 status_code=response.status_code,
                 detail="Failed to retrieve earthquake data.",
             )
 
-    def get_city_coordinates(self, city_name)-> tuple:
+    def fetch_earthquake_catalog(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE)-> EarthquakeCatalog:
         """
-        Retrieves the coordinates (latitude and longitude) of a city.
+        Fetches earthquake data from the API as a columnar catalog.
 
         Args:
-            city_name (str): The name of the city.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
 
         Returns:
-            tuple: The latitude and longitude of the city.
+            EarthquakeCatalog: The earthquakes of the range.
+
+        """
+        logger.info("Fetching earthquake catalog from %s to %s.", starttime, endtime)
+        try:
+            return self.fetcher.fetch(
+                date_to_timestamp_ms(starttime),
+                date_to_timestamp_ms(endtime),
+                self.earthquake_query_params(starttime, endtime, min_magnitude),
+            )
+        except (CircuitOpenError, requests.RequestException) as exc:
+            self.raise_unavailable(exc)
+        except FdsnResponseError as exc:
+            self.raise_response_error(exc)
+
+    async def fetch_earthquake_catalog_async(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE)-> EarthquakeCatalog:
+        """
+        Fetches earthquake data from the API as a columnar catalog over the shared async HTTP client.
+
+        Args:
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            EarthquakeCatalog: The earthquakes of the range.
+
+        """
+        logger.info("Fetching earthquake catalog from %s to %s.", starttime, endtime)
+        try:
+            return await self.fetcher.fetch_async(
+                date_to_timestamp_ms(starttime),
+                date_to_timestamp_ms(endtime),
+                self.earthquake_query_params(starttime, endtime, min_magnitude),
+            )
+        except (CircuitOpenError, httpx.TransportError) as exc:
+            self.raise_unavailable(exc)
+        except FdsnResponseError as exc:
+            self.raise_response_error(exc)
+
+    def fetch_ring(self, search, coordinates, k)-> EarthquakeCatalog:
+        """
+        Fetches the events of a ring search holding the k nearest to a point.
+
+        Args:
+            search (RingSearch): The deferred ring search.
+            coordinates (tuple): The latitude and longitude of the point.
+            k (int): The number of nearest events the catalog must hold.
+
+        Returns:
+            EarthquakeCatalog: The events of the last ring searched.
+
+        """
+        try:
+            catalog, _ = search.nearest_k(*coordinates, k)
+            return catalog
+        except (CircuitOpenError, requests.RequestException) as exc:
+            self.raise_unavailable(exc)
+        except FdsnResponseError as exc:
+            self.raise_response_error(exc)
+
+    async def fetch_ring_async(self, search, coordinates, k=1, radius_km=None)-> EarthquakeCatalog:
+        """
+        Fetches the events of a ring search around a point over the shared async HTTP client.
+
+        Args:
+            search (RingSearch): The deferred ring search.
+            coordinates (tuple): The latitude and longitude of the point.
+            k (int): The number of nearest events the catalog must hold.
+            radius_km (float): When given, fetches the events within this radius instead.
+
+        Returns:
+            EarthquakeCatalog: The events of the last ring searched.
+
+        """
+        try:
+            if radius_km is not None:
+                return await search.within_radius_async(*coordinates, radius_km)
+            catalog, _ = await search.nearest_k_async(*coordinates, k)
+            return catalog
+        except (CircuitOpenError, httpx.TransportError) as exc:
+            self.raise_unavailable(exc)
+        except FdsnResponseError as exc:
+            self.raise_response_error(exc)
+
+    def get_local_index(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE)-> Optional[EarthquakeSpatialIndex]:
+        """
+        Returns the spatial index of the local catalog when it can answer a date range.
+
+        With the "auto" source the local catalog is used whenever its last
+        synchronization covers the requested range, and the API otherwise.
+        The "local" source never calls the API and "usgs" always does.
+
+        Args:
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            EarthquakeSpatialIndex or None: The index, or None if the API must be used.
+
+        """
+        if self.catalog_source == "usgs":
+            return None
+        try:
+            index = self.catalog_service.get_spatial_index()
+        except SQLAlchemyError as exc:
+            if self.catalog_source == "local":
+                raise ValueError("The local earthquake catalog is unavailable.") from exc
+            logger.warning("Local earthquake catalog unavailable: %s", exc)
+            return None
+        if self.catalog_source == "local" or self.catalog_service.covers(
+            starttime, endtime, min_magnitude
+        ):
+            logger.info("Serving earthquake data from %s to %s from the local catalog.", starttime, endtime)
+            return index
+        return None
+
+    async def get_earthquakes_async(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE):
+        """
+        Returns the earthquakes of a date range without blocking the event loop.
+
+        Args:
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            EarthquakeSpatialIndex or EarthquakeCatalog: The local index, or the catalog fetched from the API.
+
+        """
+        # Refreshing the index reads the database, so it runs in a worker thread.
+        index = await asyncio.to_thread(self.get_local_index, starttime, endtime, min_magnitude)
+        if index is not None:
+            return index
+        return await self.fetch_earthquake_catalog_async(starttime, endtime, min_magnitude)
+
+    def get_nearest_source(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE):
+        """
+        Returns where the earthquakes near a single city are searched.
+
+        With the "ring" fetch strategy the API is not called yet: a
+        `RingSearch` fetches only the earthquakes around the city once its
+        coordinates are known.
+
+        Args:
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            EarthquakeSpatialIndex, RingSearch or EarthquakeCatalog: The local index, the deferred
+            ring search, or the catalog of the whole range fetched from the API.
+
+        """
+        index = self.get_local_index(starttime, endtime, min_magnitude)
+        if index is not None:
+            return index
+        if self.fetch_strategy == "ring":
+            return self.ring_search(starttime, endtime, min_magnitude)
+        return self.fetch_earthquake_catalog(starttime, endtime, min_magnitude)
+
+    async def get_nearest_source_async(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE):
+        """
+        Returns where the earthquakes near a single city are searched without blocking the event loop.
+
+        Args:
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            EarthquakeSpatialIndex, RingSearch or EarthquakeCatalog: The local index, the deferred
+            ring search, or the catalog of the whole range fetched from the API.
+
+        """
+        index = await asyncio.to_thread(self.get_local_index, starttime, endtime, min_magnitude)
+        if index is not None:
+            return index
+        if self.fetch_strategy == "ring":
+            return self.ring_search(starttime, endtime, min_magnitude)
+        return await self.fetch_earthquake_catalog_async(starttime, endtime, min_magnitude)
+
+    def ring_search(self, starttime, endtime, min_magnitude=MIN_MAGNITUDE)-> RingSearch:
+        """
+        Builds the deferred expanding-ring search of a date range.
+
+        Args:
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            RingSearch: The search, fetching nothing until it is given a point.
 
         Raises:
-            ValueError: If the city is not found.
+            ValueError: If the dates are invalid.
 
         """
-        logger.info(f"Getting coordinates for {city_name}.")
-        location = self.geolocator.geocode(city_name)
-        if location:
-            return (location.latitude, location.longitude)
+        return RingSearch(
+            self.fetcher,
+            date_to_timestamp_ms(starttime),
+            date_to_timestamp_ms(endtime),
+            self.earthquake_query_params(starttime, endtime, min_magnitude),
+        )
+
+    def find_closest_earthquake(self, city_coordinates, starttime, endtime, earthquakes=None)-> tuple:
+        """
+        Finds the earthquake closest to a city within a date range.
+
+        Args:
+            city_coordinates (tuple): The latitude and longitude of the city.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            earthquakes (EarthquakeSpatialIndex, RingSearch or EarthquakeCatalog): The earthquakes to
+                search, loaded with `get_nearest_source` when not given.
+
+        Returns:
+            tuple: The closest earthquake as a dict (or None) and its distance in kilometers.
+
+        """
+        if earthquakes is None:
+            earthquakes = self.get_nearest_source(starttime, endtime)
+        if isinstance(earthquakes, RingSearch):
+            earthquakes = self.fetch_ring(earthquakes, city_coordinates, 1)
+        if isinstance(earthquakes, EarthquakeSpatialIndex):
+            position, distance = earthquakes.nearest(
+                *city_coordinates,
+                date_to_timestamp_ms(starttime),
+                date_to_timestamp_ms(endtime),
+                MIN_MAGNITUDE,
+            )
         else:
-            logger.error(f"Coordinates not found for {city_name} city.")
-            raise ValueError(f"Coordinates not found for {city_name} city.")
+            position, distance = earthquakes.nearest(*city_coordinates)
+        return (earthquakes.event(position) if position is not None else None), distance
 
-    def reverse_geocode(self, latitude, longitude):
+    def find_nearby_earthquakes(
+        self, city_coordinates, starttime, endtime, earthquakes, k, radius_km=None, min_magnitude=MIN_MAGNITUDE
+    )-> list:
         """
-        Performs reverse geocoding to get the address of a location.
+        Finds the k earthquakes nearest to a city, or the earthquakes within a radius of it.
 
         Args:
-            latitude (float): The latitude of the location.
-            longitude (float): The longitude of the location.
+            city_coordinates (tuple): The latitude and longitude of the city.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            earthquakes (EarthquakeSpatialIndex or EarthquakeCatalog): The earthquakes to search.
+            k (int): The number of earthquakes to return; with a radius, the maximum number.
+            radius_km (float): The radius in kilometers, or None for a top-k query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
 
         Returns:
-            str: The address of the location.
+            list: Tuples of earthquake dict and distance in kilometers, nearest first.
+
+        """
+        if isinstance(earthquakes, EarthquakeSpatialIndex):
+            filters = (date_to_timestamp_ms(starttime), date_to_timestamp_ms(endtime), min_magnitude)
+            if radius_km is not None:
+                matches = earthquakes.within_radius(*city_coordinates, radius_km, *filters)[:k]
+            else:
+                matches = earthquakes.nearest_k(*city_coordinates, k, *filters)
+        elif radius_km is not None:
+            matches = earthquakes.within_radius(*city_coordinates, radius_km)[:k]
+        else:
+            matches = earthquakes.nearest_k(*city_coordinates, k)
+        return [(earthquakes.event(position), distance) for position, distance in matches]
+
+    async def find_closest_earthquake_async(self, city_coordinates, starttime, endtime, earthquakes)-> tuple:
+        """
+        Finds the earthquake closest to a city within a date range without blocking the event loop.
+
+        Args:
+            city_coordinates (tuple): The latitude and longitude of the city.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+            earthquakes (EarthquakeSpatialIndex, RingSearch or EarthquakeCatalog): The earthquakes to search.
+
+        Returns:
+            tuple: The closest earthquake as a dict (or None) and its distance in kilometers.
+
+        """
+        if isinstance(earthquakes, RingSearch):
+            earthquakes = await self.fetch_ring_async(earthquakes, city_coordinates, k=1)
+        return self.find_closest_earthquake(city_coordinates, starttime, endtime, earthquakes)
+
+    async def resolve_city_coordinates_async(self, query)-> tuple:
+        """
+        Returns the stored coordinates of the queried city, geocoding and storing them on first use.
+
+        Args:
+            query (EarthquakeModel): The earthquake query.
+
+        Returns:
+            tuple: The latitude and longitude of the city.
+
+        Raises:
+            ValueError: If the city is not found.
 
         """
-        logger.info(f"Getting reverse geocoding for coordinates: {latitude}, {longitude}.")
-        location = self.geolocator.reverse((latitude, longitude), exactly_one=True)
-        return location.address if location else "Unknown location"
+        if query.latitude is not None and query.longitude is not None:
+            return (query.latitude, query.longitude)
+        logger.info("Getting coordinates for %s.", query.city_name)
+        city_coordinates = await self.geocoding_service.geocode_async(query.city_name)
+        if not city_coordinates:
+            logger.error("Coordinates not found for %s city.", query.city_name)
+            raise ValueError(f"Coordinates not found for {query.city_name} city.")
+        try:
+            await run_with_session(self._record_city_query, query.city_id, None, city_coordinates)
+        except SQLAlchemyError as exc:
+            logger.error("Error storing coordinates of %s: %s", query.city_name, exc)
+        return city_coordinates
 
     def convert_date(self, date_str)-> str:
         """
@@ -134,72 +531,460 @@ class EarthquakeService:
             "%B %d"
         )
 
-    def process_earthquake_data(self, query)-> dict:
+    async def closest_earthquake_for_city_async(self, city_id, starttime, endtime)-> Optional[dict]:
         """
-        Processes earthquake data and returns the closest earthquake to a city.
+        Finds the closest earthquake to a stored city, reading and writing the database over one session.
+
+        The city, the abbreviation of its state, its stored coordinates and the
+        latest reusable recorded search of the date range are read with a
+        single query. When no search can be reused the result is computed, and
+        the new search, with the coordinates of a city that was stored without
+        them, is written back in one transaction on the same session. A miss
+        of the in-process reverse geocoding cache reads (and, after calling
+        the geocoder, writes) the `reverse_geocodes` table on that session
+        too; only its periodic pruning uses a session of its own.
 
         Args:
-            query (Query): An object containing the city name, start date, and end date.
+            city_id (int): The ID of the city.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
 
         Returns:
-            dict: A dictionary containing the result message.
+            dict: A dictionary containing the result message, or None when the city does not exist.
+
+        Raises:
+            ValueError: If the dates are invalid or the city cannot be located.
 
         """
-        logger.info(
-            f"Processing earthquake data for {query.city_name} between {query.start_date} and {query.end_date}."
-        )
-        try:
-            city_coordinates = self.get_city_coordinates(query.city_name)
-            earthquake_data = self.fetch_earthquake_data(query.start_date, query.end_date)
-            closest_earthquake = None
-            min_distance = float("inf")
-            for earthquake in earthquake_data.get("features", []):
-                eq_coordinates = earthquake["geometry"]["coordinates"]
-                eq_point = (eq_coordinates[1], eq_coordinates[0])
-                distance = geodesic(city_coordinates, eq_point).kilometers
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_earthquake = earthquake
-            start_date = self.convert_date(query.start_date)
-            end_date = self.convert_date(query.end_date)
+        async with session_runner() as run:
+            row = await run(self._load_city_query, city_id, starttime, endtime)
+            if row is None:
+                logger.warning("No city found with ID %s in database.", city_id)
+                return None
+            query = EarthquakeModel(
+                city_id=row.id,
+                city_name=row.name,
+                state_abbreviation=row.state_abbreviation or "",
+                start_date=starttime,
+                end_date=endtime,
+                latitude=row.latitude,
+                longitude=row.longitude,
+            )
+            logger.info(
+                "Processing earthquake data for %s between %s and %s.", query.city_name, starttime, endtime
+            )
+            if row.search_id is not None:
+                logger.info("Reusing recorded search %s.", row.search_id)
+                return self.build_stored_result_message(query, row)
+
+            geocoded = None
+            if query.latitude is None or query.longitude is None:
+                geocoded = await self.geocoding_service.geocode_async(query.city_name)
+                if not geocoded:
+                    logger.error("Coordinates not found for %s city.", query.city_name)
+                    raise ValueError(f"Coordinates not found for {query.city_name} city.")
+                query.latitude, query.longitude = geocoded
+            earthquakes = await self.get_nearest_source_async(starttime, endtime)
+            closest_earthquake, min_distance = await self.find_closest_earthquake_async(
+                (query.latitude, query.longitude), starttime, endtime, earthquakes
+            )
+            search = None
+            result = {"message": "No results found"}
             if closest_earthquake:
-                mag = closest_earthquake["properties"]["mag"]
-                eq_coordinates = closest_earthquake["geometry"]["coordinates"]
-                time_ms = closest_earthquake["properties"]["time"]
-                earthquake_date = self.convert_timestamp_to_readable_date(time_ms)
-                nearest_city = self.reverse_geocode(eq_coordinates[1], eq_coordinates[0])
-                state_abbreviation = (
-                    f"{query.state_abbreviation}" if query.state_abbreviation else ""
+                nearest_city = await self.geocoding_service.reverse_async(
+                    closest_earthquake["latitude"],
+                    closest_earthquake["longitude"],
+                    event_id=closest_earthquake["id"],
+                    place=closest_earthquake["place"],
+                    run=run,
                 )
-                result_message = {
-                    "message": f"Result for {query.city_name},{state_abbreviation} between {start_date} and {end_date}: The closest earthquake to {query.city_name} was an M {mag} - {nearest_city} on {earthquake_date}"
-                }
-
-                logger.info("Starting save search in database")
+                search = self.build_search(query, closest_earthquake, min_distance, nearest_city)
+                result = self.build_result_message(query, closest_earthquake, nearest_city)
+            if search is not None or geocoded is not None:
                 try:
-                    with session_scope() as db:
-                        # Create earthquake search entry
-                        earthquake_search = EarthquakeSearch(
-                        city_id=query.city_id,
-                        start_date=datetime.strptime(query.start_date, "%Y-%m-%d"),
-                        end_date=datetime.strptime(query.end_date, "%Y-%m-%d"),
-                        closest_earthquake_date=datetime.fromtimestamp(time_ms / 1000.0, tz=timezone.utc),
-                        closest_earthquake_magnitude=mag,
-                        closest_earthquake_distance=min_distance,
-                        closest_earthquake_location=nearest_city
-                        )
-                        db.add(earthquake_search)
-                        db.commit()
+                    await run(self._record_city_query, city_id, search, geocoded)
                     logger.info("Search saved successfully.")
                 except Exception as exc:
-                    logger.error(f"Error saving search: {exc}")
-                    
-            else:
-                result_message = {
-                    "message": "No results found"
-                }
+                    logger.error("Error saving search: %s", exc)
             logger.info("Earthquake data processed successfully.")
-            return result_message
-        except ValueError as exc:
-            logger.error(f"Error processing earthquake data: {exc}")
-            return {"message": str(exc)}
+            return result
+
+    @staticmethod
+    def _load_city_query(db, city_id, starttime, endtime):
+        conditions = SearchHistoryService.reusable_conditions(starttime, endtime)
+        # A range that has not ended yet joins no search, keeping the query shape the same.
+        search_join = and_(EarthquakeSearch.city_id == City.id, *conditions) if conditions else false()
+        row = db.execute(
+            select(
+                City.id,
+                City.name,
+                City.latitude,
+                City.longitude,
+                State.state_abbreviation,
+                EarthquakeSearch.id.label("search_id"),
+                EarthquakeSearch.closest_earthquake_date,
+                EarthquakeSearch.closest_earthquake_magnitude,
+                EarthquakeSearch.closest_earthquake_location,
+            )
+            .outerjoin(State, State.id == City.state_province_id)
+            .outerjoin(EarthquakeSearch, search_join)
+            .where(City.id == city_id)
+            .order_by(EarthquakeSearch.searched_at.desc())
+            .limit(1)
+        ).first()
+        # Ends the read transaction, so no connection is held while the earthquakes are fetched.
+        db.rollback()
+        if row is not None:
+            hit = row.search_id is not None
+            SearchHistoryService.record_lookups(int(hit), int(not hit))
+        return row
+
+    @staticmethod
+    def _record_city_query(db, city_id, search, coordinates):
+        if coordinates is not None:
+            db.execute(
+                update(City).where(City.id == city_id).values(latitude=coordinates[0], longitude=coordinates[1])
+            )
+        if search is not None:
+            db.add(search)
+        db.commit()
+
+    async def closest_earthquakes_batch_async(self, queries, starttime, endtime)-> list:
+        """
+        Finds the closest earthquake to each of many cities over one date range.
+
+        Args:
+            queries (List[EarthquakeModel]): One query per city, all over the same date range.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+
+        Returns:
+            list: One dictionary per query with the city ID, the city name and the result message.
+
+        Raises:
+            ValueError: If the dates are invalid.
+            HTTPException: If the earthquake data cannot be retrieved.
+
+        """
+
+        async def single_chunk():
+            yield queries
+
+        return [
+            result
+            async for result in self.iter_closest_earthquakes_async(single_chunk(), starttime, endtime)
+        ]
+
+    async def iter_closest_earthquakes_async(self, query_chunks, starttime, endtime):
+        """
+        Yields the closest earthquake to each city of a stream of query chunks over one date range.
+
+        Reusable recorded searches of a chunk are looked up in one query. The
+        earthquakes of the range are loaded once, on the first chunk that
+        needs them, and the nearest event of every remaining city of a chunk
+        comes from one vectorized cities × events distance matrix. Each
+        distinct event of a chunk is reverse geocoded once, and the new
+        searches of a chunk are recorded with a single bulk insert.
+
+        Args:
+            query_chunks (AsyncIterator[List[EarthquakeModel]]): Chunks of queries, one per city.
+            starttime (str): The start time of the earthquake data query.
+            endtime (str): The end time of the earthquake data query.
+
+        Yields:
+            dict: The city ID, the city name and the result message of each query, in order.
+
+        Raises:
+            ValueError: If the dates are invalid.
+            HTTPException: If the earthquake data cannot be retrieved.
+
+        """
+        self.convert_date(starttime)
+        self.convert_date(endtime)
+        earthquakes = None
+        async for queries in query_chunks:
+            logger.info(
+                "Processing earthquake data for %s cities between %s and %s.", len(queries), starttime, endtime
+            )
+            messages = await self._stored_batch_messages(queries, starttime, endtime)
+            pending = [query for query in queries if query.city_id not in messages]
+            if pending:
+                if earthquakes is None:
+                    earthquakes = await self.get_earthquakes_async(starttime, endtime)
+                    if isinstance(earthquakes, EarthquakeSpatialIndex):
+                        earthquakes = earthquakes.select(
+                            date_to_timestamp_ms(starttime), date_to_timestamp_ms(endtime), MIN_MAGNITUDE
+                        )
+                messages.update(await self._compute_batch_messages(pending, earthquakes))
+            for query in queries:
+                yield {
+                    "city_id": query.city_id,
+                    "city_name": query.city_name,
+                    "message": messages[query.city_id],
+                }
+        logger.info("Earthquake data processed successfully.")
+
+    async def _stored_batch_messages(self, queries, starttime, endtime)-> dict:
+        searches = await self.search_history.find_reusable_many_async(
+            [query.city_id for query in queries], starttime, endtime
+        )
+        return {
+            query.city_id: self.build_stored_result_message(query, searches[query.city_id])["message"]
+            for query in queries
+            if query.city_id in searches
+        }
+
+    async def _compute_batch_messages(self, queries, earthquakes)-> dict:
+        messages = {}
+        coordinates = await asyncio.gather(
+            *(self.resolve_city_coordinates_async(query) for query in queries),
+            return_exceptions=True,
+        )
+        located = []
+        for query, city_coordinates in zip(queries, coordinates):
+            if isinstance(city_coordinates, ValueError):
+                messages[query.city_id] = str(city_coordinates)
+            elif isinstance(city_coordinates, BaseException):
+                raise city_coordinates
+            else:
+                located.append((query, city_coordinates))
+        nearest = earthquakes.nearest_many(
+            [city_coordinates[0] for _, city_coordinates in located],
+            [city_coordinates[1] for _, city_coordinates in located],
+        )
+        positions = sorted({position for position, _ in nearest if position is not None})
+        events = {position: earthquakes.event(position) for position in positions}
+        addresses = await asyncio.gather(
+            *(
+                self.geocoding_service.reverse_async(
+                    event["latitude"], event["longitude"], event_id=event["id"], place=event["place"]
+                )
+                for event in events.values()
+            )
+        )
+        addresses = dict(zip(positions, addresses))
+        new_searches = []
+        for (query, _), (position, distance) in zip(located, nearest):
+            if position is None:
+                messages[query.city_id] = "No results found"
+                continue
+            messages[query.city_id] = self.build_result_message(
+                query, events[position], addresses[position]
+            )["message"]
+            new_searches.append(self.search_values(query, events[position], distance, addresses[position]))
+        if new_searches:
+            logger.info("Starting save %s searches in database", len(new_searches))
+            try:
+                await run_with_session(self._save_searches, new_searches)
+                logger.info("Searches saved successfully.")
+            except Exception as exc:
+                logger.error("Error saving searches: %s", exc)
+        return messages
+
+    async def nearby_earthquakes_result_async(
+        self, query, k, radius_km=None, min_magnitude=MIN_MAGNITUDE
+    )-> dict:
+        """
+        Finds the k earthquakes nearest to a city, or the earthquakes within a radius of it, ranked by distance.
+
+        Args:
+            query (EarthquakeModel): The earthquake query of the city.
+            k (int): The number of earthquakes to return; with a radius, the maximum number.
+            radius_km (float): The radius in kilometers, or None for a top-k query.
+            min_magnitude (float): The minimum magnitude of the earthquakes.
+
+        Returns:
+            dict: The query and the ranked earthquakes with their distance to the city.
+
+        Raises:
+            ValueError: If the dates are invalid or the city cannot be located.
+            HTTPException: If the earthquake data cannot be retrieved.
+
+        """
+        logger.info(
+            "Searching earthquakes near %s between %s and %s.", query.city_name, query.start_date, query.end_date
+        )
+        self.convert_date(query.start_date)
+        self.convert_date(query.end_date)
+        earthquakes, city_coordinates = await asyncio.gather(
+            self.get_nearest_source_async(query.start_date, query.end_date, min_magnitude),
+            self.resolve_city_coordinates_async(query),
+        )
+        if isinstance(earthquakes, RingSearch):
+            earthquakes = await self.fetch_ring_async(earthquakes, city_coordinates, k, radius_km)
+        matches = self.find_nearby_earthquakes(
+            city_coordinates, query.start_date, query.end_date, earthquakes, k, radius_km, min_magnitude
+        )
+        return {
+            "city_id": query.city_id,
+            "city_name": query.city_name,
+            "start_date": query.start_date,
+            "end_date": query.end_date,
+            "mode": "top_k" if radius_km is None else "radius",
+            "k": k,
+            "radius_km": radius_km,
+            "min_magnitude": min_magnitude,
+            "earthquakes": [
+                dict(earthquake, distance_km=round(distance, 3)) for earthquake, distance in matches
+            ],
+        }
+
+    @staticmethod
+    def nearby_cache_key(city_id, starttime, endtime, k, radius_km, min_magnitude)-> str:
+        """
+        Builds the result cache key of a top-k or radius earthquake query.
+
+        Args:
+            city_id (int): The ID of the city.
+            starttime (str): The start date of the query.
+            endtime (str): The end date of the query.
+            k (int): The number of earthquakes of the query.
+            radius_km (float): The radius of the query, or None for a top-k query.
+            min_magnitude (float): The minimum magnitude of the query.
+
+        Returns:
+            str: The cache key.
+
+        """
+        return f"nearby:{city_id}:{starttime}:{endtime}:{k}:{radius_km}:{float(min_magnitude)}"
+
+    @staticmethod
+    def result_cache_key(city_id, starttime, endtime)-> str:
+        """
+        Builds the result cache key of a closest earthquake query.
+
+        Args:
+            city_id (int): The ID of the city.
+            starttime (str): The start date of the query.
+            endtime (str): The end date of the query.
+
+        Returns:
+            str: The cache key.
+
+        """
+        return f"closest:{city_id}:{starttime}:{endtime}:{MIN_MAGNITUDE}"
+
+    @staticmethod
+    def result_ttl(endtime)-> float:
+        """
+        Returns how long the result of a query may be cached.
+
+        Ranges that ended before today are effectively immutable and are kept
+        for `RESULT_CACHE_TTL_PAST_SECONDS`; ranges that reach today can still
+        gain earthquakes and are kept for `RESULT_CACHE_TTL_RECENT_SECONDS`.
+
+        Args:
+            endtime (str): The end date of the query.
+
+        Returns:
+            float: The time to live in seconds.
+
+        Raises:
+            ValueError: If the end date is invalid.
+
+        """
+        end_date = datetime.strptime(endtime, "%Y-%m-%d").date()
+        if end_date < datetime.now(timezone.utc).date():
+            return float(os.getenv("RESULT_CACHE_TTL_PAST_SECONDS", "604800"))
+        return float(os.getenv("RESULT_CACHE_TTL_RECENT_SECONDS", "300"))
+
+    def build_result_message(self, query, closest_earthquake, nearest_city)-> dict:
+        """
+        Builds the result message of a search.
+
+        Args:
+            query (Query): An object containing the city name, start date, and end date.
+            closest_earthquake (dict): The closest earthquake.
+            nearest_city (str): The address of the closest earthquake.
+
+        Returns:
+            dict: A dictionary containing the result message.
+
+        """
+        start_date = self.convert_date(query.start_date)
+        end_date = self.convert_date(query.end_date)
+        mag = closest_earthquake["magnitude"]
+        earthquake_date = self.convert_timestamp_to_readable_date(closest_earthquake["time"])
+        state_abbreviation = (
+            f"{query.state_abbreviation}" if query.state_abbreviation else ""
+        )
+        return {
+            "message": f"Result for {query.city_name},{state_abbreviation} between {start_date} and {end_date}: The closest earthquake to {query.city_name} was an M {mag} - {nearest_city} on {earthquake_date}"
+        }
+
+    def build_stored_result_message(self, query, search)-> dict:
+        """
+        Builds the result message of a recorded search.
+
+        Args:
+            query (Query): An object containing the city name, start date, and end date.
+            search (EarthquakeSearch): The recorded search of the same city and date range.
+
+        Returns:
+            dict: A dictionary containing the result message.
+
+        """
+        earthquake_date = search.closest_earthquake_date.replace(tzinfo=timezone.utc)
+        closest_earthquake = {
+            "magnitude": search.closest_earthquake_magnitude,
+            "time": int(earthquake_date.timestamp() * 1000),
+        }
+        return self.build_result_message(
+            query, closest_earthquake, search.closest_earthquake_location
+        )
+
+    @staticmethod
+    def build_search(query, closest_earthquake, min_distance, nearest_city)-> EarthquakeSearch:
+        """
+        Builds the earthquake search entry recording a result.
+
+        Args:
+            query (Query): An object containing the city name, start date, and end date.
+            closest_earthquake (dict): The closest earthquake.
+            min_distance (float): The distance to the closest earthquake in kilometers.
+            nearest_city (str): The address of the closest earthquake.
+
+        Returns:
+            EarthquakeSearch: The unsaved search entry.
+
+        """
+        return EarthquakeSearch(
+            **EarthquakeService.search_values(query, closest_earthquake, min_distance, nearest_city)
+        )
+
+    @staticmethod
+    def search_values(query, closest_earthquake, min_distance, nearest_city)-> dict:
+        """
+        Builds the column values of the earthquake search entry recording a result.
+
+        Args:
+            query (Query): An object containing the city name, start date, and end date.
+            closest_earthquake (dict): The closest earthquake.
+            min_distance (float): The distance to the closest earthquake in kilometers.
+            nearest_city (str): The address of the closest earthquake.
+
+        Returns:
+            dict: The column values.
+
+        """
+        return dict(
+            city_id=query.city_id,
+            start_date=datetime.strptime(query.start_date, "%Y-%m-%d"),
+            end_date=datetime.strptime(query.end_date, "%Y-%m-%d"),
+            closest_earthquake_date=datetime.fromtimestamp(
+                closest_earthquake["time"] / 1000.0, tz=timezone.utc
+            ),
+            closest_earthquake_magnitude=closest_earthquake["magnitude"],
+            closest_earthquake_distance=min_distance,
+            closest_earthquake_location=nearest_city,
+            searched_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            is_current=True,
+        )
+
+    @staticmethod
+    def _save_searches(db, rows):
+        db.execute(insert(EarthquakeSearch), rows)
+        db.commit()
+
+
+register_metrics("result_cache", EarthquakeService.result_cache.statistics)
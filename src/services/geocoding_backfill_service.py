@@ -0,0 +1,273 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from geopy.exc import GeopyError
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from helper.database import session_scope
+from helper.metrics import register_metrics
+from helper.rate_limiter import TokenBucket
+from models.db.city_model import City
+from services.geocoding_service import GeocodingService
+from utils.logger import Logger
+
+logger = Logger(name="geocoding_backfill_service")
+
+
+class GeocodingBackfillService:
+    """
+    Service class for geocoding the cities stored without coordinates.
+
+    Scans `cities` by ID for rows missing a latitude or longitude, batch by
+    batch. The cities of a batch are geocoded by `GEOCODE_BACKFILL_CONCURRENCY`
+    threads sharing a token bucket of `GEOCODE_BACKFILL_RATE` requests per
+    second (Nominatim allows one), transient geocoder errors are retried with
+    exponential backoff, and the coordinates found are written back with one
+    bulk update per batch. After every batch the ID of its last city, and the
+    IDs of the cities still failing after every retry, are saved to the
+    checkpoint file, so an interrupted backfill resumes where it stopped and
+    the next run retries the failures first; cities that are not found are
+    left for the lazy geocoding of the queries.
+
+    Attributes:
+        geocoding_service (GeocodingService): The geocoder, shared by the threads.
+        limiter (TokenBucket): The limiter of the geocoding requests.
+        concurrency (int): The number of geocoding threads.
+        batch_size (int): The number of cities geocoded and updated together.
+        max_retries (int): The number of retries of a failed geocoding request.
+        retry_delay (float): The delay before the first retry, doubled for every other one.
+        checkpoint_path (str): The checkpoint file, or None to always start from the first city.
+    """
+
+    progress = {}
+    _progress_lock = threading.Lock()
+
+    def __init__(
+        self,
+        geocoding_service=None,
+        rate=None,
+        concurrency=None,
+        batch_size=None,
+        max_retries=None,
+        retry_delay=None,
+        checkpoint_path=None,
+    ):
+        self.geocoding_service = geocoding_service or GeocodingService()
+        self.limiter = TokenBucket(rate or float(os.getenv("GEOCODE_BACKFILL_RATE", "1")))
+        self.concurrency = concurrency or int(os.getenv("GEOCODE_BACKFILL_CONCURRENCY", "2"))
+        self.batch_size = batch_size or int(os.getenv("GEOCODE_BACKFILL_BATCH_SIZE", "100"))
+        self.max_retries = int(os.getenv("GEOCODE_BACKFILL_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.retry_delay = float(os.getenv("GEOCODE_BACKFILL_RETRY_DELAY", "2")) if retry_delay is None else retry_delay
+        self.checkpoint_path = checkpoint_path or os.getenv("GEOCODE_BACKFILL_CHECKPOINT_PATH") or None
+        self._stop_event = threading.Event()
+
+    def run(self, max_cities=None) -> dict:
+        """
+        Geocodes the cities without coordinates, from the checkpoint on.
+
+        The cities whose geocoding failed after every retry in a previous run
+        are retried first, then the scan resumes after the last city handled.
+
+        Args:
+            max_cities (int): Stops after this number of cities, e.g. to backfill in slices.
+
+        Returns:
+            dict: The progress of the backfill.
+
+        Raises:
+            ValueError: If an unexpected database error occurs.
+        """
+        self._stop_event.clear()
+        after_id, failed_ids = self.load_checkpoint()
+        retry_ids = sorted(failed_ids)
+        self._start_progress(self._count_missing(after_id) + len(retry_ids), after_id)
+        logger.info(
+            "Backfilling coordinates of %s cities after ID %s, retrying %s failed cities.",
+            self.progress["total"], after_id, len(retry_ids),
+        )
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="geocoding-backfill") as executor:
+            while not self._stop_event.is_set():
+                limit = self.batch_size
+                if max_cities is not None:
+                    limit = min(limit, max_cities - self.progress["processed"])
+                    if limit <= 0:
+                        break
+                if retry_ids:
+                    chunk, retry_ids = retry_ids[:limit], retry_ids[limit:]
+                    batch = self._missing_cities_by_id(chunk)
+                    # Cities geocoded or deleted since they failed are no longer retried.
+                    failed_ids.difference_update(set(chunk) - {city_id for city_id, _ in batch})
+                    if not batch:
+                        continue
+                else:
+                    batch = self._missing_cities(after_id, limit)
+                    if not batch:
+                        break
+                    after_id = batch[-1][0]
+                results = list(executor.map(lambda city: self._geocode(city[1]), batch))
+                found = [
+                    {"id": city_id, "latitude": coordinates[0], "longitude": coordinates[1]}
+                    for (city_id, _), coordinates in zip(batch, results)
+                    if coordinates
+                ]
+                self._store_coordinates(found)
+                for (city_id, _), coordinates in zip(batch, results):
+                    if coordinates is False:
+                        failed_ids.add(city_id)
+                    else:
+                        failed_ids.discard(city_id)
+                self.save_checkpoint(after_id, failed_ids)
+                self._record_batch(batch, results, after_id)
+                logger.info(
+                    "Backfilled %s of %s cities, %.2f cities/s.",
+                    self.progress["processed"], self.progress["total"], self.progress["cities_per_second"],
+                )
+        with self._progress_lock:
+            self.progress["running"] = False
+        return self.statistics()
+
+    def stop(self):
+        """Asks a running backfill to stop after its current batch."""
+        self._stop_event.set()
+
+    def load_checkpoint(self) -> tuple:
+        """
+        Reads the progress of a previous backfill.
+
+        Returns:
+            tuple: The ID of the last city handled (None without a checkpoint) and the set of
+            IDs of the cities whose geocoding failed after every retry.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None, set()
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            checkpoint = json.load(file)
+        return checkpoint.get("last_city_id"), set(checkpoint.get("failed_city_ids", []))
+
+    def save_checkpoint(self, city_id, failed_ids=()):
+        """
+        Records the progress of the backfill, replacing the checkpoint file atomically.
+
+        Args:
+            city_id (int): The ID of the last city handled.
+            failed_ids (Iterable[int]): The IDs of the cities to retry on the next run.
+        """
+        if not self.checkpoint_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump({"last_city_id": city_id, "failed_city_ids": sorted(failed_ids)}, file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def _geocode(self, name):
+        # The coordinates, None when the city is not found, or False when every attempt failed.
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                return self.geocoding_service.geocode(name)
+            except GeopyError as exc:
+                if attempt == self.max_retries:
+                    logger.warning("Geocoding %s failed after %s attempts. Error: %s", name, attempt + 1, exc)
+                    return False
+                delay = getattr(exc, "retry_after", None) or self.retry_delay * 2**attempt
+                logger.info("Geocoding %s failed, retrying in %s s. Error: %s", name, delay, exc)
+                with self._progress_lock:
+                    self.progress["retries"] += 1
+                time.sleep(delay)
+
+    @staticmethod
+    def _missing_filter():
+        return or_(City.latitude.is_(None), City.longitude.is_(None))
+
+    def _count_missing(self, after_id) -> int:
+        statement = select(func.count()).select_from(City).where(self._missing_filter())
+        if after_id is not None:
+            statement = statement.where(City.id > after_id)
+        with session_scope() as db:
+            try:
+                return db.scalar(statement)
+            except SQLAlchemyError as exc:
+                raise ValueError(f"An unexpected error occurred while counting cities. Error: {exc}") from exc
+
+    def _missing_cities(self, after_id, limit) -> list:
+        statement = select(City.id, City.name).where(self._missing_filter())
+        if after_id is not None:
+            statement = statement.where(City.id > after_id)
+        with session_scope() as db:
+            try:
+                return [tuple(row) for row in db.execute(statement.order_by(City.id).limit(limit))]
+            except SQLAlchemyError as exc:
+                raise ValueError(f"An unexpected error occurred while fetching cities. Error: {exc}") from exc
+
+    def _missing_cities_by_id(self, city_ids) -> list:
+        statement = select(City.id, City.name).where(self._missing_filter(), City.id.in_(city_ids))
+        with session_scope() as db:
+            try:
+                return [tuple(row) for row in db.execute(statement.order_by(City.id))]
+            except SQLAlchemyError as exc:
+                raise ValueError(f"An unexpected error occurred while fetching cities. Error: {exc}") from exc
+
+    @staticmethod
+    def _store_coordinates(found):
+        if not found:
+            return
+        with session_scope() as db:
+            try:
+                # Bulk UPDATE by primary key: one executemany for the batch.
+                db.execute(update(City), found)
+                db.commit()
+            except SQLAlchemyError as exc:
+                db.rollback()
+                logger.error("An unexpected error occurred while storing coordinates. Error: %s", exc)
+                raise ValueError(
+                    f"An unexpected error occurred while storing coordinates. Error: {exc}"
+                ) from exc
+
+    @classmethod
+    def _start_progress(cls, total, after_id):
+        with cls._progress_lock:
+            cls.progress = {
+                "running": True,
+                "total": total,
+                "processed": 0,
+                "geocoded": 0,
+                "not_found": 0,
+                "failed": 0,
+                "retries": 0,
+                "last_city_id": after_id,
+                "started_at": time.time(),
+                "cities_per_second": 0.0,
+            }
+
+    @classmethod
+    def _record_batch(cls, batch, results, after_id):
+        with cls._progress_lock:
+            progress = cls.progress
+            progress["processed"] += len(batch)
+            progress["geocoded"] += sum(1 for coordinates in results if coordinates)
+            progress["not_found"] += sum(1 for coordinates in results if coordinates is None)
+            progress["failed"] += sum(1 for coordinates in results if coordinates is False)
+            progress["last_city_id"] = after_id
+            elapsed = time.time() - progress["started_at"]
+            progress["cities_per_second"] = round(progress["processed"] / elapsed, 2) if elapsed > 0 else 0.0
+
+    @classmethod
+    def statistics(cls) -> dict:
+        """
+        Returns the progress and throughput of the last backfill of this process.
+
+        Returns:
+            dict: The backfill statistics.
+        """
+        with cls._progress_lock:
+            return {key: value for key, value in cls.progress.items() if key != "started_at"}
+
+
+register_metrics("geocoding_backfill", GeocodingBackfillService.statistics)
@@ -0,0 +1,357 @@
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from geopy.geocoders import Nominatim
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from helper.cache import TTLCache
+from helper.database import session_scope
+from helper.gazetteer import GazetteerGeocoder
+from helper.metrics import register_metrics
+from models.db.reverse_geocode_model import ReverseGeocode
+from utils.logger import Logger
+
+logger = Logger(name="geocoding_service")
+
+UNKNOWN_LOCATION = "Unknown location"
+
+
+def create_geolocator():
+    """
+    Builds the geocoder selected by `GEOCODER`.
+
+    `nominatim` (the default) calls the OpenStreetMap Nominatim API;
+    `gazetteer` answers offline from the GeoNames dump at `GAZETTEER_PATH`,
+    loaded once per process.
+
+    Returns:
+        The geocoder, with the `geocode` and `reverse` methods of the geopy geocoders.
+    """
+    if os.getenv("GEOCODER", "nominatim").lower() == "gazetteer":
+        path = os.getenv("GAZETTEER_PATH")
+        if not path:
+            raise RuntimeError("GEOCODER=gazetteer requires GAZETTEER_PATH")
+        return GazetteerGeocoder.shared(path)
+    return Nominatim(user_agent="my_unique_geocoder")
+
+
+class GeocodingService:
+    """
+    Service class for geocoding place names and reverse geocoding coordinates.
+
+    Forward lookups go through an in-process cache shared by every instance
+    of the service, so a name is only sent to the (rate-limited) geocoder
+    once per `GEOCODE_CACHE_TTL_SECONDS`.
+
+    Reverse lookups use two cache tiers, an in-process LRU cache and the
+    `reverse_geocodes` table, keyed both by USGS event id and by coordinates
+    rounded to `REVERSE_GEOCODE_PRECISION` decimals. With
+    `REVERSE_GEOCODE_MODE=place` no reverse lookup is made: the USGS `place`
+    description of the event is returned without calling the geocoder or
+    reading the `reverse_geocodes` table.
+
+    The geocoder is chosen by `GEOCODER` (see `create_geolocator`). geopy
+    geocoders are blocking, so the async variants answer in-memory cache hits
+    directly and run everything else in a worker thread; an offline
+    gazetteer geocoder is called directly and bypasses the database tier.
+    Given the session runner of a request, the async variant reads and
+    writes the database tier on that session.
+    """
+
+    geocode_cache = TTLCache(
+        maxsize=int(os.getenv("GEOCODE_CACHE_SIZE", "4096")),
+        ttl=float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", "86400")),
+    )
+    reverse_cache = TTLCache(
+        maxsize=int(os.getenv("REVERSE_GEOCODE_CACHE_SIZE", "4096")),
+        ttl=float(os.getenv("REVERSE_GEOCODE_CACHE_TTL_SECONDS", "2592000")),
+    )
+    _reverse_writes = 0
+    _reverse_writes_lock = threading.Lock()
+
+    def __init__(self, geolocator=None):
+        self.geolocator = geolocator or create_geolocator()
+        self.reverse_mode = os.getenv("REVERSE_GEOCODE_MODE", "geocoder").lower()
+        self.reverse_precision = int(os.getenv("REVERSE_GEOCODE_PRECISION", "3"))
+        self.reverse_max_rows = int(os.getenv("REVERSE_GEOCODE_CACHE_MAX_ROWS", "100000"))
+
+    def geocode(self, name) -> Optional[tuple]:
+        """
+        Retrieves the coordinates (latitude and longitude) of a place.
+
+        Args:
+            name (str): The name of the place.
+
+        Returns:
+            tuple or None: The latitude and longitude of the place, or None if it is not found.
+        """
+        key = name.strip().lower()
+        coordinates = self.geocode_cache.get(key)
+        if coordinates is not None:
+            return coordinates
+        return self._geocode_uncached(key, name)
+
+    def _geocode_uncached(self, key, name) -> Optional[tuple]:
+        logger.info("Geocoding %s.", name)
+        location = self.geolocator.geocode(name)
+        if not location:
+            return None
+        coordinates = (location.latitude, location.longitude)
+        self.geocode_cache.set(key, coordinates)
+        return coordinates
+
+    async def geocode_async(self, name) -> Optional[tuple]:
+        """
+        Retrieves the coordinates of a place without blocking the event loop.
+
+        Args:
+            name (str): The name of the place.
+
+        Returns:
+            tuple or None: The latitude and longitude of the place, or None if it is not found.
+        """
+        key = name.strip().lower()
+        coordinates = self.geocode_cache.get(key)
+        if coordinates is not None:
+            return coordinates
+        if self.offline:
+            return self._geocode_uncached(key, name)
+        return await asyncio.to_thread(self._geocode_uncached, key, name)
+
+    def reverse(self, latitude, longitude, event_id=None, place=None) -> str:
+        """
+        Retrieves the address of a location, using the cache tiers before the geocoder.
+
+        Args:
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            event_id (str): The USGS id of the earthquake at the location, if any.
+            place (str): The USGS description of the location, used when the geocoder is skipped.
+
+        Returns:
+            str: The address of the location.
+        """
+        keys = self.reverse_keys(latitude, longitude, event_id)
+        address = self._reverse_from_memory(keys)
+        if address is not None:
+            return address
+        return self._reverse_uncached(keys, latitude, longitude, place)
+
+    def _reverse_from_memory(self, keys) -> Optional[str]:
+        for key in keys:
+            address = self.reverse_cache.get(key)
+            if address is not None:
+                return address
+        return None
+
+    @property
+    def offline(self) -> bool:
+        """Whether the geocoder answers in-process, without network or database round trips."""
+        return getattr(self.geolocator, "offline", False) is True
+
+    def _reverse_uncached(self, keys, latitude, longitude, place) -> str:
+        # Without a reverse lookup there is nothing to cache, so the database tier is skipped.
+        if self.reverse_mode == "place":
+            return place or UNKNOWN_LOCATION
+        # An offline geocoder is faster than the database cache tier, so it skips it.
+        if self.offline:
+            return self._remember_reverse(keys, self._geocode_reverse(latitude, longitude), place)
+        with session_scope() as db:
+            rows = self._load_reverse(db, keys)
+            address = self._cached_address(keys, rows)
+            if address is None:
+                address = self._geocode_reverse(latitude, longitude)
+                if address is not None and self._store_reverse(db, keys, address, rows):
+                    self.prune_reverse_cache()
+        return self._remember_reverse(keys, address, place)
+
+    async def reverse_async(self, latitude, longitude, event_id=None, place=None, run=None) -> str:
+        """
+        Retrieves the address of a location without blocking the event loop.
+
+        Args:
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            event_id (str): The USGS id of the earthquake at the location, if any.
+            place (str): The USGS description of the location, used when the geocoder is skipped.
+            run (Callable): The runner of the session of the request (see `session_runner`), used
+                by the database cache tier instead of a session of its own.
+
+        Returns:
+            str: The address of the location.
+        """
+        keys = self.reverse_keys(latitude, longitude, event_id)
+        address = self._reverse_from_memory(keys)
+        if address is not None:
+            return address
+        if self.offline or self.reverse_mode == "place":
+            return self._reverse_uncached(keys, latitude, longitude, place)
+        if run is None:
+            return await asyncio.to_thread(self._reverse_uncached, keys, latitude, longitude, place)
+        rows = await run(self._load_reverse, keys)
+        address = self._cached_address(keys, rows)
+        if address is None:
+            address = await asyncio.to_thread(self._geocode_reverse, latitude, longitude)
+            if address is not None and await run(self._store_reverse, keys, address, rows):
+                await asyncio.to_thread(self.prune_reverse_cache)
+        return self._remember_reverse(keys, address, place)
+
+    def _geocode_reverse(self, latitude, longitude) -> Optional[str]:
+        logger.info("Reverse geocoding coordinates: %s, %s.", latitude, longitude)
+        location = self.geolocator.reverse((latitude, longitude), exactly_one=True)
+        return location.address if location else None
+
+    def _remember_reverse(self, keys, address, place) -> str:
+        if address is None:
+            return place or UNKNOWN_LOCATION
+        for key in keys:
+            self.reverse_cache.set(key, address)
+        return address
+
+    def reverse_keys(self, latitude, longitude, event_id=None) -> list:
+        """
+        Builds the reverse geocoding cache keys of a location, most specific first.
+
+        Args:
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            event_id (str): The USGS id of the earthquake at the location, if any.
+
+        Returns:
+            list: The cache keys.
+        """
+        precision = self.reverse_precision
+        # Adding 0.0 turns a rounded -0.0 into 0.0 so both map to the same key.
+        latitude = round(latitude, precision) + 0.0
+        longitude = round(longitude, precision) + 0.0
+        keys = [f"coord:{latitude:.{precision}f},{longitude:.{precision}f}"]
+        if event_id:
+            keys.insert(0, f"event:{event_id}"[:64])
+        return keys
+
+    @staticmethod
+    def _load_reverse(db, keys) -> dict:
+        # Every row of the keys, expired ones included, so storing knows which rows to update.
+        try:
+            rows = {
+                row.key: (row.address, row.created_at)
+                for row in db.execute(
+                    select(ReverseGeocode.key, ReverseGeocode.address, ReverseGeocode.created_at).where(
+                        ReverseGeocode.key.in_(keys)
+                    )
+                )
+            }
+        except SQLAlchemyError as exc:
+            logger.warning("Reverse geocode cache unavailable: %s", exc)
+            rows = {}
+        # Ends the read transaction, so no connection is held while the geocoder is called.
+        db.rollback()
+        return rows
+
+    def _cached_address(self, keys, rows) -> Optional[str]:
+        not_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=self.reverse_cache.ttl
+        )
+        for key in keys:
+            if key in rows and rows[key][1] >= not_before:
+                return rows[key][0]
+        return None
+
+    @staticmethod
+    def _store_reverse(db, keys, address, rows) -> bool:
+        # Returns whether the table is due for pruning, which runs on a session of its own.
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        address = address[:255]
+        stale = [key for key in keys if key in rows]
+        missing = [key for key in keys if key not in rows]
+        try:
+            if stale:
+                db.execute(
+                    update(ReverseGeocode)
+                    .where(ReverseGeocode.key.in_(stale))
+                    .values(address=address, created_at=created_at)
+                )
+            if missing:
+                db.execute(
+                    insert(ReverseGeocode),
+                    [{"key": key, "address": address, "created_at": created_at} for key in missing],
+                )
+            db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            logger.warning("Error saving reverse geocode: %s", exc)
+            return False
+        with GeocodingService._reverse_writes_lock:
+            GeocodingService._reverse_writes += 1
+            return GeocodingService._reverse_writes % 100 == 0
+
+    def preload_reverse_cache(self) -> int:
+        """
+        Fills the in-process reverse geocoding cache with the most recent rows of the reverse geocode table.
+
+        Called once per worker process at startup, so the first requests of
+        a new worker do not each go to the database.
+
+        Returns:
+            int: The number of preloaded addresses.
+        """
+        not_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=self.reverse_cache.ttl
+        )
+        try:
+            with session_scope() as db:
+                rows = db.execute(
+                    select(ReverseGeocode.key, ReverseGeocode.address)
+                    .where(ReverseGeocode.created_at >= not_before)
+                    .order_by(ReverseGeocode.created_at.desc())
+                    .limit(self.reverse_cache.maxsize)
+                ).all()
+        except SQLAlchemyError as exc:
+            logger.warning("Reverse geocode cache unavailable: %s", exc)
+            return 0
+        # Oldest first, so the most recent addresses end up most recently used.
+        for key, address in reversed(rows):
+            self.reverse_cache.set(key, address)
+        logger.info("Preloaded %s reverse geocodes.", len(rows))
+        return len(rows)
+
+    def prune_reverse_cache(self) -> int:
+        """
+        Deletes expired rows of the reverse geocode table and the oldest rows above the size limit.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        not_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=self.reverse_cache.ttl
+        )
+        try:
+            with session_scope() as db:
+                deleted = db.execute(
+                    delete(ReverseGeocode).where(ReverseGeocode.created_at < not_before)
+                ).rowcount
+                excess = db.scalar(select(func.count()).select_from(ReverseGeocode)) - self.reverse_max_rows
+                if excess > 0:
+                    cutoff = db.scalar(
+                        select(ReverseGeocode.created_at)
+                        .order_by(ReverseGeocode.created_at)
+                        .offset(excess - 1)
+                        .limit(1)
+                    )
+                    deleted += db.execute(
+                        delete(ReverseGeocode).where(ReverseGeocode.created_at <= cutoff)
+                    ).rowcount
+                db.commit()
+        except SQLAlchemyError as exc:
+            logger.warning("Error pruning reverse geocode cache: %s", exc)
+            return 0
+        logger.info("Pruned %s reverse geocode cache rows.", deleted)
+        return deleted
+
+
+register_metrics("geocode_cache", GeocodingService.geocode_cache.statistics)
+register_metrics("reverse_geocode_cache", GeocodingService.reverse_cache.statistics)
@@ -0,0 +1,269 @@
+import csv
+import json
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from helper.database import session_scope
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.state_model import State
+from models.schemas.city_schema import CityCreate
+from models.schemas.country_schema import CountryCreate
+from models.schemas.import_schema import ImportRowError, ImportSummary
+from models.schemas.state_schema import StateCreate
+from utils.logger import Logger
+
+logger = Logger(name="import_service")
+
+# File formats accepted by the import, keyed by content type.
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json": "json",
+}
+# Number of rows validated, inserted and committed together.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Number of rejected rows listed in the summary; the others are only counted.
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_rows(file, file_format):
+    """
+    Reads the rows of an import file one at a time.
+
+    Args:
+        file (TextIO): The file, opened in text mode.
+        file_format (str): `csv` (with a header line), `jsonl` (one JSON object per line) or `json` (an array).
+
+    Returns:
+        Iterator[dict]: The rows; a malformed JSON line is yielded as None.
+
+    Raises:
+        ValueError: If the format is unknown or a `json` file is not an array.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(file)
+    elif file_format == "jsonl":
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+    elif file_format == "json":
+        rows = json.load(file)
+        if not isinstance(rows, list):
+            raise ValueError("A JSON import must be an array of rows.")
+        yield from rows
+    else:
+        raise ValueError(f"Unknown import format: {file_format}.")
+
+
+class ImportService:
+    """
+    Service class for importing countries, states and cities in bulk.
+
+    Every row describes a city with the names of its state and country
+    (`country`, `state`, `state_abbreviation`, `city`, `latitude`,
+    `longitude`); rows without a city or a state only create the missing
+    country and state. Rows are read as a stream and handled in batches:
+    each batch is validated with the creation schemas, resolves country and
+    state names to IDs with in-memory maps, inserts the new rows with one
+    `executemany` per table and is committed once. Cities imported without
+    coordinates are geocoded the first time they are queried.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+
+    def import_file(self, file, file_format) -> ImportSummary:
+        """
+        Imports the rows of a file.
+
+        Args:
+            file (TextIO): The file, opened in text mode.
+            file_format (str): `csv`, `jsonl` or `json`.
+
+        Returns:
+            ImportSummary: The number of rows read and created, and the rejected rows.
+
+        Raises:
+            ValueError: If the file cannot be read or an unexpected database error occurs.
+        """
+        try:
+            return self.import_rows(read_rows(file, file_format))
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ValueError(f"Cannot read the import file: {exc}") from exc
+
+    def import_rows(self, rows) -> ImportSummary:
+        """
+        Imports rows in batches.
+
+        Args:
+            rows (Iterable[dict]): The rows.
+
+        Returns:
+            ImportSummary: The number of rows read and created, and the rejected rows.
+
+        Raises:
+            ValueError: If an unexpected database error occurs.
+        """
+        summary = ImportSummary()
+        with session_scope() as db:
+            try:
+                countries = dict(db.execute(select(Country.name, Country.id)).all())
+                states = {
+                    (country_id, name): state_id
+                    for state_id, name, country_id in db.execute(select(State.id, State.name, State.country_id))
+                }
+                batch = []
+                for number, row in enumerate(rows, start=1):
+                    summary.rows += 1
+                    batch.append((number, row))
+                    if len(batch) >= self.batch_size:
+                        self._import_batch(db, batch, countries, states, summary)
+                        batch = []
+                if batch:
+                    self._import_batch(db, batch, countries, states, summary)
+            except SQLAlchemyError as exc:
+                db.rollback()
+                logger.error("Import failed after %s rows. Error: %s", summary.rows, exc)
+                raise ValueError(f"An unexpected error occurred while importing. Error: {exc}") from exc
+        logger.info(
+            "Imported %s rows: %s countries, %s states and %s cities created, %s rows rejected.",
+            summary.rows, summary.countries, summary.states, summary.cities, summary.failed,
+        )
+        return summary
+
+    def _import_batch(self, db, batch, countries, states, summary):
+        errors = {}
+        new_countries, new_states = {}, {}
+        try:
+            created = self._insert_batch(db, batch, countries, states, new_countries, new_states, errors)
+            db.commit()
+        except IntegrityError:
+            # Another writer created some of the rows meanwhile: retry row by row to reject only those.
+            db.rollback()
+            if len(batch) > 1:
+                for item in batch:
+                    self._import_batch(db, [item], countries, states, summary)
+                return
+            errors[batch[0][0]] = "The row conflicts with existing data."
+            created = (0, 0, 0)
+        countries.update(new_countries)
+        states.update(new_states)
+        summary.countries += created[0]
+        summary.states += created[1]
+        summary.cities += created[2]
+        for number, error in sorted(errors.items()):
+            summary.failed += 1
+            if len(summary.errors) < MAX_REPORTED_ERRORS:
+                summary.errors.append(ImportRowError(row=number, error=error))
+
+    @staticmethod
+    def _insert_batch(db, batch, countries, states, new_countries, new_states, errors) -> tuple:
+        rows = []
+        for number, row in batch:
+            if not isinstance(row, dict):
+                errors[number] = "The row is not a JSON object."
+                continue
+            try:
+                country = CountryCreate(name=_text(row, "country") or "")
+            except ValidationError as exc:
+                errors[number] = _validation_message(exc)
+                continue
+            rows.append((number, row, country.name))
+
+        missing = sorted({name for _, _, name in rows if name not in countries})
+        if missing:
+            db.execute(insert(Country), [{"name": name} for name in missing])
+            new_countries.update(db.execute(select(Country.name, Country.id).where(Country.name.in_(missing))).all())
+
+        city_rows = []
+        pending_states = {}
+        for number, row, country_name in rows:
+            state_name = _text(row, "state")
+            if state_name is None:
+                if _text(row, "city") is not None:
+                    errors[number] = "A city needs the name of its state."
+                continue
+            country_id = countries.get(country_name) or new_countries[country_name]
+            try:
+                state = StateCreate(
+                    name=state_name,
+                    state_abbreviation=_text(row, "state_abbreviation") or "",
+                    country_id=country_id,
+                )
+            except ValidationError as exc:
+                errors[number] = _validation_message(exc)
+                continue
+            key = (country_id, state.name)
+            if key not in states:
+                pending_states.setdefault(key, state)
+            city_rows.append((number, row, key))
+
+        if pending_states:
+            db.execute(
+                insert(State),
+                [
+                    {"name": state.name, "state_abbreviation": state.state_abbreviation, "country_id": state.country_id}
+                    for state in pending_states.values()
+                ],
+            )
+            for country_id in {key[0] for key in pending_states}:
+                names = [name for key_country, name in pending_states if key_country == country_id]
+                new_states.update(
+                    ((country_id, name), state_id)
+                    for state_id, name in db.execute(
+                        select(State.id, State.name).where(State.country_id == country_id, State.name.in_(names))
+                    )
+                )
+
+        cities = []
+        for number, row, key in city_rows:
+            city_name = _text(row, "city")
+            if city_name is None:
+                continue
+            try:
+                city = CityCreate(
+                    name=city_name,
+                    state_province_id=states.get(key) or new_states[key],
+                    latitude=_text(row, "latitude"),
+                    longitude=_text(row, "longitude"),
+                )
+            except ValidationError as exc:
+                errors[number] = _validation_message(exc)
+                continue
+            cities.append((number, city))
+
+        names = {city.name for _, city in cities}
+        existing = set(db.scalars(select(City.name).where(City.name.in_(names)))) if names else set()
+        values = []
+        for number, city in cities:
+            if city.name in existing:
+                errors[number] = f"Already exists city with name: {city.name}"
+                continue
+            existing.add(city.name)
+            values.append(city.model_dump())
+        if values:
+            db.execute(insert(City), values)
+        return len(missing), len(pending_states), len(values)
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _validation_message(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    field = ".".join(str(location) for location in error["loc"])
+    return f"{field}: {error['msg']}" if field else error["msg"]
@@ -0,0 +1,187 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from helper.database import run_with_session
+from helper.metrics import register_metrics
+from models.db.earthquake_search_model import EarthquakeSearch
+from utils.logger import Logger
+
+logger = Logger(name="search_history_service")
+
+LOOKUP_CHUNK_SIZE = 1000
+
+
+class SearchHistoryService:
+    """
+    Service class that reuses recorded earthquake searches as persisted answers.
+
+    A recorded search is reused for the same city and date range when the
+    range ended before the search was made, so no later event could have
+    changed its answer, and the entry has not been invalidated since.
+    Entries are invalidated when a catalog synchronization adds, revises or
+    deletes an event inside their date range.
+    """
+
+    _stats_lock = threading.Lock()
+    hits = 0
+    misses = 0
+    invalidated = 0
+
+    async def find_reusable_async(self, city_id, start_date, end_date) -> Optional[EarthquakeSearch]:
+        """
+        Returns the latest reusable search of a city and date range without blocking the event loop.
+
+        Args:
+            city_id (int): The ID of the city.
+            start_date (str): The start date in the format "YYYY-MM-DD".
+            end_date (str): The end date in the format "YYYY-MM-DD".
+
+        Returns:
+            EarthquakeSearch or None: The recorded search, or None if the query must be computed.
+        """
+        try:
+            return await run_with_session(self._find_reusable, city_id, start_date, end_date)
+        except SQLAlchemyError as exc:
+            logger.warning("Search history unavailable: %s", exc)
+            return None
+
+    async def find_reusable_many_async(self, city_ids, start_date, end_date) -> Dict[int, EarthquakeSearch]:
+        """
+        Returns the latest reusable search of several cities over one date range.
+
+        Args:
+            city_ids (List[int]): The IDs of the cities.
+            start_date (str): The start date in the format "YYYY-MM-DD".
+            end_date (str): The end date in the format "YYYY-MM-DD".
+
+        Returns:
+            Dict[int, EarthquakeSearch]: The recorded searches by city ID; cities without one are missing.
+        """
+        try:
+            return await run_with_session(self._find_reusable_many, city_ids, start_date, end_date)
+        except SQLAlchemyError as exc:
+            logger.warning("Search history unavailable: %s", exc)
+            return {}
+
+    @classmethod
+    def _find_reusable(cls, db, city_id, start_date, end_date) -> Optional[EarthquakeSearch]:
+        return cls._find_reusable_many(db, [city_id], start_date, end_date).get(city_id)
+
+    @classmethod
+    def _find_reusable_many(cls, db, city_ids, start_date, end_date) -> Dict[int, EarthquakeSearch]:
+        conditions = cls.reusable_conditions(start_date, end_date)
+        city_ids = list(city_ids)
+        searches = {}
+        if conditions is not None:
+            # Bounded IN lists stay below the SQL Server limit of 2100 parameters.
+            for offset in range(0, len(city_ids), LOOKUP_CHUNK_SIZE):
+                rows = db.scalars(
+                    select(EarthquakeSearch)
+                    .where(
+                        EarthquakeSearch.city_id.in_(city_ids[offset : offset + LOOKUP_CHUNK_SIZE]),
+                        *conditions,
+                    )
+                    .order_by(EarthquakeSearch.searched_at.desc())
+                )
+                for search in rows:
+                    searches.setdefault(search.city_id, search)
+        cls.record_lookups(len(searches), len(set(city_ids)) - len(searches))
+        return searches
+
+    @staticmethod
+    def reusable_conditions(start_date, end_date) -> Optional[list]:
+        """
+        Returns the conditions a recorded search of a date range must meet to be reused.
+
+        Args:
+            start_date (str): The start date in the format "YYYY-MM-DD".
+            end_date (str): The end date in the format "YYYY-MM-DD".
+
+        Returns:
+            list or None: The conditions on `EarthquakeSearch`, or None when the range has
+            not ended yet and no search can be reused.
+
+        Raises:
+            ValueError: If the dates are invalid.
+        """
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        today = datetime.now(timezone.utc).replace(tzinfo=None)
+        if end.date() >= today.date():
+            return None
+        return [
+            EarthquakeSearch.start_date == start,
+            EarthquakeSearch.end_date == end,
+            EarthquakeSearch.is_current.is_(True),
+            EarthquakeSearch.searched_at >= end + timedelta(days=1),
+        ]
+
+    @classmethod
+    def record_lookups(cls, hits, misses):
+        """
+        Counts reuse lookups made outside this service, e.g. joined to the city query.
+
+        Args:
+            hits (int): The number of queries answered by a recorded search.
+            misses (int): The number of queries that must be computed.
+        """
+        with cls._stats_lock:
+            cls.hits += hits
+            cls.misses += misses
+
+    @classmethod
+    def invalidate_range(cls, db, start_ms, end_ms) -> int:
+        """
+        Invalidates the recorded searches whose date range overlaps a time span.
+
+        Called with each span of events changed by a catalog
+        synchronization, inside its transaction.
+
+        Args:
+            db (Session): The database session.
+            start_ms (int): The start of the span in milliseconds since the epoch.
+            end_ms (int): The end of the span in milliseconds since the epoch.
+
+        Returns:
+            int: The number of invalidated searches.
+        """
+        start = datetime.fromtimestamp(start_ms / 1000.0, tz=timezone.utc).replace(tzinfo=None)
+        end = datetime.fromtimestamp(end_ms / 1000.0, tz=timezone.utc).replace(tzinfo=None)
+        invalidated = db.execute(
+            update(EarthquakeSearch)
+            .where(
+                EarthquakeSearch.is_current.is_(True),
+                EarthquakeSearch.start_date <= end,
+                EarthquakeSearch.end_date >= start,
+            )
+            .values(is_current=False)
+        ).rowcount
+        with cls._stats_lock:
+            cls.invalidated += invalidated
+        if invalidated:
+            logger.info("Invalidated %s recorded searches between %s and %s.", invalidated, start, end)
+        return invalidated
+
+    @classmethod
+    def statistics(cls) -> dict:
+        """
+        Returns the reuse hit rate and the number of invalidated searches.
+
+        Returns:
+            dict: The search history statistics.
+        """
+        with cls._stats_lock:
+            lookups = cls.hits + cls.misses
+            return {
+                "hits": cls.hits,
+                "misses": cls.misses,
+                "hit_rate": round(cls.hits / lookups, 4) if lookups else 0.0,
+                "invalidated": cls.invalidated,
+            }
+
+
+register_metrics("search_history", SearchHistoryService.statistics)
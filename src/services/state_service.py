@@ -1,8 +1,10 @@
 import re
 
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from helper.database import session_scope
+from helper.pagination import DEFAULT_PAGE_SIZE, keyset_page
 from models.db.state_model import State
 from models.schemas.state_schema import StateCreate
 from utils.logger import Logger
@@ -28,7 +30,7 @@ class StateService:
         Raises:
             ValueError: If the specified country ID does not exist or an unexpected error occurs.
         """
-        logger.info(f"Starting creating state: {state_create}")
+        logger.info("Starting creating state: %s", state_create)
         with session_scope() as db:
             try:
                 state = State(
@@ -37,12 +39,12 @@ class StateService:
                 db.add(state)
                 db.commit()
                 db.refresh(state)
-                logger.info(f"State: {state_create.name} created successfully.")
+                logger.info("State: %s created successfully.", state_create.name)
                 return state
             except IntegrityError as exc:
                 db.rollback()
                 error_message = self.extract_error_message(str(exc))
-                logger.error(f"State: {state_create.name} creation failed. Error: {exc}")
+                logger.error("State: %s creation failed. Error: %s", state_create.name, exc)
                 raise ValueError(f"Cannot create state: {error_message}") from exc
             except SQLAlchemyError as exc:
                 db.rollback()
@@ -62,7 +64,7 @@ class StateService:
             str: The extracted error message.
 
         """
-        logger.debug(f"Extracting error message from: {exc_message}")
+        logger.debug("Extracting error message from: %s", exc_message)
         unique_violation_pattern = re.compile(
             r"Violation of UNIQUE KEY constraint.*?The duplicate key value is \((.*?)\).",
             re.IGNORECASE,
@@ -78,20 +80,31 @@ class StateService:
         else:
             return "Data validation error. Please check the input data."
 
-    def get_states(self):
+    def get_states(self, limit=DEFAULT_PAGE_SIZE, after_id=None, country_id=None):
         """
-        Retrieve all states from the database.
+        Retrieve one page of states from the database, ordered by ID.
+
+        Args:
+            limit (int): The maximum number of states of the page.
+            after_id (int): The ID of the last state of the previous page.
+            country_id (int): The ID of the country whose states are retrieved.
 
         Returns:
-            List[State]: A list of State objects representing the states in the database.
+            List[State]: The State objects of the page.
 
         Raises:
             ValueError: If an unexpected database error occurs.
         """
-        logger.info("Retrieving all states.")
+        logger.info("Retrieving states after ID %s.", after_id)
+        statement = select(State)
+        if country_id is not None:
+            statement = statement.where(State.country_id == country_id)
+        statement = keyset_page(
+            statement, State, (State.id, State.name, State.state_abbreviation, State.country_id), limit, after_id
+        )
         with session_scope() as db:
             try:
-                return db.query(State).all()
+                return db.scalars(statement).all()
             except SQLAlchemyError as exc:
-                logger.error(f"An unexpected error occurred while fetching states. Error: {exc}")
+                logger.error("An unexpected error occurred while fetching states. Error: %s", exc)
                 raise ValueError(f"An unexpected error occurred while fetching states. Error: {exc}") from exc
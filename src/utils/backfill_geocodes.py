@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+sys.path.append(src_dir)
+
+load_dotenv()
+
+from services.geocoding_backfill_service import GeocodingBackfillService
+
+
+def backfill_geocodes(max_cities=None, restart=False):
+    """
+    Geocodes the cities stored without coordinates.
+
+    Args:
+        max_cities (int): Stops after this number of cities.
+        restart (bool): Whether to ignore the checkpoint and start from the first city.
+    """
+    backfill_service = GeocodingBackfillService()
+    if restart and backfill_service.checkpoint_path and os.path.exists(backfill_service.checkpoint_path):
+        os.remove(backfill_service.checkpoint_path)
+    try:
+        progress = backfill_service.run(max_cities)
+    except KeyboardInterrupt:
+        progress = backfill_service.statistics()
+    print(
+        f"Backfilled {progress['processed']} of {progress['total']} cities: {progress['geocoded']} geocoded, "
+        f"{progress['not_found']} not found, {progress['failed']} failed, "
+        f"{progress['cities_per_second']} cities/s. Last city ID: {progress['last_city_id']}."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocode the cities stored without coordinates.")
+    parser.add_argument("--max-cities", type=int, default=None, help="Stop after MAX_CITIES cities.")
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and start from the first city."
+    )
+    args = parser.parse_args()
+    backfill_geocodes(args.max_cities, args.restart)
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+sys.path.append(src_dir)
+
+load_dotenv()
+
+from services.import_service import ImportService
+
+# File formats inferred from the file extension.
+EXTENSION_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}
+
+
+def import_places(path, file_format=None, batch_size=None):
+    """
+    Imports countries, states and cities in bulk from a file.
+
+    Args:
+        path (str): The path of a CSV, JSON Lines or JSON file.
+        file_format (str): `csv`, `jsonl` or `json`; inferred from the extension when omitted.
+        batch_size (int): The number of rows committed together.
+    """
+    file_format = file_format or EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        summary = ImportService(batch_size).import_file(file, file_format)
+    print(
+        f"Imported {summary.rows} rows: {summary.countries} countries, {summary.states} states "
+        f"and {summary.cities} cities created, {summary.failed} rows rejected."
+    )
+    for error in summary.errors:
+        print(f"Row {error.row}: {error.error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import countries, states and cities in bulk.")
+    parser.add_argument("path", help="CSV (with a header line), JSON Lines or JSON array file.")
+    parser.add_argument("--format", choices=sorted(set(EXTENSION_FORMATS.values())), default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    import_places(args.path, args.format, args.batch_size)
@@ -1,42 +1,226 @@
+import atexit
+import itertools
+import json
 import logging
 import logging.config
-import sys
+import logging.handlers
 import os
+import queue
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
 
-class Logger:
-    def __init__(self, name="custom"):
+# The id of the request being served, added to every record logged while serving it.
+request_id = ContextVar("request_id", default=None)
+
+_configured = False
+_configure_lock = threading.Lock()
+_listeners = []
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the id of the current request to the records, in the thread that logs them."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one record out of every `1 / rate` below WARNING, and every record
+    from WARNING up, so hot paths can log without flooding the output.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats every record as a single JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every request an id, taken from the `X-Request-ID`
+    header or generated, that is logged with its records and returned in the
+    response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        current = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        token = request_id.set(current)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", current.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
+
+
+def parse_sampling(value) -> dict:
+    """
+    Parses `LOG_SAMPLING`, a comma-separated list of `logger=rate` pairs.
+
+    Args:
+        value (str): The setting, e.g. `earthquake_service=0.1,fdsn_fetcher=0.5`.
+
+    Returns:
+        dict: The sampling rate of each logger name.
+    """
+    rates = {}
+    for pair in (value or "").split(","):
+        name, _, rate = pair.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(force=False):
+    """
+    Configures logging once per process.
+
+    Handlers come from `logging.ini` when it exists (a stdout handler
+    otherwise) and are moved behind a `QueueHandler`: request threads only
+    enqueue their records, and a `QueueListener` thread formats and writes
+    them. The level comes from `LOG_LEVEL`, `LOG_FORMAT=json` switches the
+    output to one JSON object per line and `LOG_SAMPLING` samples the records
+    of the given loggers below WARNING.
+
+    Args:
+        force (bool): Whether to configure again, e.g. after changing the environment.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured and not force:
+            return
+        _stop_listeners()
+        level = os.getenv("LOG_LEVEL", "INFO").upper()
         config_path = "logging.ini"
+        configured_loggers = [logging.getLogger()]
         if os.path.exists(config_path):
             try:
-                logging.config.fileConfig(config_path)
+                logging.config.fileConfig(config_path, disable_existing_loggers=False)
+                configured_loggers.append(logging.getLogger("custom"))
             except KeyError as e:
-                logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-                logging.getLogger(name).error("Failed to load logging configuration: %s", e)
+                _basic_config()
+                logging.getLogger(__name__).error("Failed to load logging configuration: %s", e)
         else:
-            logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+            _basic_config()
+
+        json_output = os.getenv("LOG_FORMAT", "text").lower() == "json"
+        for configured in configured_loggers:
+            configured.setLevel(level)
+            handlers = configured.handlers[:]
+            if not handlers:
+                continue
+            if json_output:
+                for handler in handlers:
+                    handler.setFormatter(JsonFormatter())
+            records = queue.SimpleQueue()
+            queue_handler = logging.handlers.QueueHandler(records)
+            queue_handler.addFilter(RequestIdFilter())
+            configured.handlers = [queue_handler]
+            listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+
+        for name in logging.Logger.manager.loggerDict:
+            existing = logging.getLogger(name)
+            for sampling in [f for f in existing.filters if isinstance(f, SamplingFilter)]:
+                existing.removeFilter(sampling)
+        for name, rate in parse_sampling(os.getenv("LOG_SAMPLING")).items():
+            logging.getLogger(name).addFilter(SamplingFilter(rate))
+        _configured = True
+
+
+def shutdown_logging():
+    """Writes the queued records and stops the listener threads."""
+    global _configured
+    with _configure_lock:
+        _stop_listeners()
+        _configured = False
 
+
+def _basic_config():
+    logging.basicConfig(
+        stream=sys.stdout,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        force=True,
+    )
+
+
+def _stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(shutdown_logging)
+
+
+class Logger:
+    """
+    Logger of a module. Messages take `%`-style arguments, only formatted when
+    the level is enabled, e.g. `logger.info("Fetched %s events.", count)`.
+    """
+
+    def __init__(self, name="custom"):
+        configure_logging()
         self._logger = logging.getLogger(name)
 
     def info(self, message, *args):
         """Log an info message."""
-        self._logger.info(message, *args)
+        self._logger.info(message, *args, stacklevel=2)
 
     def error(self, message, *args):
         """Log an error message."""
-        self._logger.error(message, *args)
+        self._logger.error(message, *args, stacklevel=2)
 
     def debug(self, message, *args):
         """Log a debug message."""
-        self._logger.debug(message, *args)
+        self._logger.debug(message, *args, stacklevel=2)
 
     def warning(self, message, *args):
         """Log a warning message."""
-        self._logger.warning(message, *args)
+        self._logger.warning(message, *args, stacklevel=2)
 
     def critical(self, message, *args):
         """Log a critical message."""
-        self._logger.critical(message, *args)
+        self._logger.critical(message, *args, stacklevel=2)
 
     def exception(self, message, *args):
         """Log an exception message."""
-        self._logger.exception(message, *args)
+        self._logger.exception(message, *args, stacklevel=2)
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+sys.path.append(src_dir)
+
+load_dotenv()
+
+from services.earthquake_catalog_service import EarthquakeCatalogService
+
+
+def sync_earthquakes(interval=None):
+    """
+    Synchronizes the local earthquake catalog with the USGS API.
+
+    Args:
+        interval (float): When set, keeps synchronizing every `interval` seconds.
+    """
+    catalog_service = EarthquakeCatalogService()
+    while True:
+        summary = catalog_service.sync()
+        print(
+            f"Synchronized earthquake catalog: {summary['upserted']} upserted, "
+            f"{summary['deleted']} deleted."
+        )
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronize the local earthquake catalog.")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Keep running and synchronize every INTERVAL seconds.",
+    )
+    args = parser.parse_args()
+    sync_earthquakes(args.interval)
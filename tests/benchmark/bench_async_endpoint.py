@@ -0,0 +1,252 @@
+"""
+Load test of the async earthquake endpoint against a blocking endpoint.
+
+Serves the application with uvicorn on a temporary SQLite database, with a
+local stub of the USGS API and a stub geocoder that both answer after a
+fixed latency. A blocking endpoint built from the sync building blocks of
+the services (without recording the search) is mounted next to the async
+one at `/sync/v1/earthquakes/{city_id}`, and both are hammered with the
+same number of concurrent clients.
+
+Run with:
+
+    python tests/benchmark/bench_async_endpoint.py
+
+The catalog source is forced to `usgs` so every request waits on the stub
+API; reverse geocoding is cached after the first request, as in production.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import uvicorn
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src"))
+
+# Kept when already set, so processes spawned by another benchmark share its database.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault("EARTHQUAKE_CATALOG_SOURCE", "usgs")
+# The stub answers every query with the whole GeoJSON catalog.
+os.environ.setdefault("EARTHQUAKE_FETCH_FORMAT", "geojson")
+os.environ.setdefault("EARTHQUAKE_FETCH_STRATEGY", "global")
+
+from fastapi import Depends, Path, Query
+
+import services.geocoding_service as geocoding_service_module
+from helper.database import Base, dispose_engines, get_engine, session_scope
+from main import app
+from models.db.city_model import City
+# Imported so every mapped class is registered before the tables are created.
+from models.db.country_model import Country
+from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.reverse_geocode_model import ReverseGeocode
+from models.db.state_model import State
+from models.schemas.earthquake_schema import EarthquakeModel, EarthquakeResponse
+from services.city_service import CityService
+from services.earthquake_service import EarthquakeService
+
+
+def serve_stub_usgs(port, latency, events):
+    rng = np.random.default_rng(42)
+    features = [
+        {
+            "type": "Feature",
+            "id": f"ev{i}",
+            "properties": {
+                "mag": float(rng.uniform(5, 8)),
+                "place": "",
+                "time": int(rng.integers(1_609_459_200_000, 1_625_097_600_000)),
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [float(rng.uniform(-180, 180)), float(rng.uniform(-90, 90)), 10.0],
+            },
+        }
+        for i in range(events)
+    ]
+    body = json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    Server(("127.0.0.1", port), Handler).serve_forever()
+
+
+class StubGeocoder:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def reverse(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return type("Location", (), {"address": "Stub address"})()
+
+    def geocode(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return type("Location", (), {"latitude": 34.05, "longitude": -118.24})()
+
+
+def get_closest_earthquake_sync(
+    city_id: int = Path(...),
+    start_date: str = Query(...),
+    end_date: str = Query(...),
+    city_service: CityService = Depends(),
+    earthquake_service: EarthquakeService = Depends(),
+) -> EarthquakeResponse:
+    """A blocking equivalent of the endpoint, run by Starlette in its threadpool."""
+    city = city_service.get_city_by_id(city_id)
+    query = EarthquakeModel(
+        city_id=city_id,
+        city_name=city.name,
+        state_abbreviation=city.state.state_abbreviation if city.state else "",
+        start_date=start_date,
+        end_date=end_date,
+        latitude=city.latitude,
+        longitude=city.longitude,
+    )
+    closest_earthquake, _ = earthquake_service.find_closest_earthquake(
+        (query.latitude, query.longitude), start_date, end_date
+    )
+    if closest_earthquake is None:
+        return EarthquakeResponse(message="No results found")
+    nearest_city = earthquake_service.geocoding_service.reverse(
+        closest_earthquake["latitude"],
+        closest_earthquake["longitude"],
+        event_id=closest_earthquake["id"],
+        place=closest_earthquake["place"],
+    )
+    return EarthquakeResponse(
+        message=earthquake_service.build_result_message(query, closest_earthquake, nearest_city)["message"]
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_app(port, usgs_port, geocoder_latency):
+    logging.disable(logging.WARNING)
+    os.environ["USGS_API_URL"] = f"http://127.0.0.1:{usgs_port}/fdsnws/event/1/query"
+    geocoding_service_module.Nominatim = StubGeocoder(geocoder_latency)
+    app.add_api_route(
+        "/sync/v1/earthquakes/{city_id}",
+        get_closest_earthquake_sync,
+        methods=["POST"],
+        response_model=EarthquakeResponse,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
+
+
+def wait_for_port(port):
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port)):
+                return
+        except OSError:
+            time.sleep(0.05)
+
+
+async def load(url, requests, concurrency):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(url)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        await client.post(url)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return np.array(latencies) * 1000, requests / elapsed
+
+
+def run(requests, concurrencies, usgs_latency, geocoder_latency, events):
+    Base.metadata.create_all(get_engine())
+    with session_scope() as db:
+        db.add(City(id=1, name="Los Angeles", state_province_id=1, latitude=34.05, longitude=-118.24))
+        db.commit()
+    dispose_engines()
+
+    # The stub API and the application run in their own processes so the
+    # load generator does not compete with them for the GIL.
+    usgs_port, port = free_port(), free_port()
+    processes = [
+        multiprocessing.Process(target=serve_stub_usgs, args=(usgs_port, usgs_latency, events)),
+        multiprocessing.Process(target=serve_app, args=(port, usgs_port, geocoder_latency)),
+    ]
+    for process in processes:
+        process.start()
+    wait_for_port(usgs_port)
+    wait_for_port(port)
+
+    query = "start_date=2021-01-01&end_date=2021-07-01"
+    endpoints = {
+        "sync": f"http://127.0.0.1:{port}/sync/v1/earthquakes/1?{query}",
+        "async": f"http://127.0.0.1:{port}/v1/earthquakes/1?{query}",
+    }
+    print(
+        f"{requests} requests per run, USGS stub latency {usgs_latency * 1000:.0f} ms, "
+        f"{events} events per response"
+    )
+    print(f"{'endpoint':>8} {'clients':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'RPS':>8}")
+    for concurrency in concurrencies:
+        for name, url in endpoints.items():
+            latencies, rps = asyncio.run(load(url, requests, concurrency))
+            print(
+                f"{name:>8} {concurrency:>8} {np.percentile(latencies, 50):>10.1f}"
+                f" {np.percentile(latencies, 99):>10.1f} {rps:>8.0f}"
+            )
+
+    for process in processes:
+        process.terminate()
+        process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--usgs-latency", type=float, default=0.1)
+    parser.add_argument("--geocoder-latency", type=float, default=0.05)
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.usgs_latency, args.geocoder_latency, args.events)
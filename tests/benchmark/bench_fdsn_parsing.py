@@ -0,0 +1,112 @@
+"""
+Memory benchmark of parsing USGS responses into an earthquake catalog.
+
+Compares the GeoJSON path (`json.loads` of the whole FeatureCollection,
+then `EarthquakeCatalog.from_features`) with the incremental parsing of the
+FDSN `format=text` output (`EarthquakeCatalog.from_fdsn_text`) on the same
+synthetic events. Reports the peak memory allocated while parsing, measured
+with tracemalloc, the size of the response body and the parse time.
+
+Run with:
+
+    python tests/benchmark/bench_fdsn_parsing.py
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src"))
+sys.path.append(current_dir)
+
+from bench_nearest_earthquake import synthetic_catalog
+from helper.earthquake_catalog import EarthquakeCatalog
+
+
+def geojson_body(catalog) -> bytes:
+    features = [
+        {
+            "type": "Feature",
+            "properties": {
+                "mag": float(catalog.magnitudes[i]),
+                "place": f"{i % 100} km NNE of Somewhere, CA",
+                "time": int(catalog.times[i]),
+                "updated": int(catalog.times[i]),
+                "status": "reviewed",
+                "magType": "mww",
+                "type": "earthquake",
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [
+                    float(catalog.longitudes[i]),
+                    float(catalog.latitudes[i]),
+                    float(catalog.depths[i]),
+                ],
+            },
+            "id": catalog.ids[i],
+        }
+        for i in range(len(catalog))
+    ]
+    return json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+
+def text_body(catalog) -> bytes:
+    lines = [
+        "#EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|Contributor"
+        "|ContributorID|MagType|Magnitude|MagAuthor|EventLocationName"
+    ]
+    for i in range(len(catalog)):
+        origin = datetime.fromtimestamp(catalog.times[i] / 1000.0, tz=timezone.utc)
+        lines.append(
+            f"{catalog.ids[i]}|{origin.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}"
+            f"|{catalog.latitudes[i]}|{catalog.longitudes[i]}|{catalog.depths[i]}"
+            f"|us|us|us|{catalog.ids[i]}|mww|{catalog.magnitudes[i]}|us"
+            f"|{i % 100} km NNE of Somewhere, CA"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def parse_geojson(body) -> EarthquakeCatalog:
+    return EarthquakeCatalog.from_features(json.loads(body).get("features", []))
+
+
+def parse_text(body) -> EarthquakeCatalog:
+    # A BytesIO yields the lines one at a time, like `response.iter_lines()`.
+    return EarthquakeCatalog.from_fdsn_text(io.BytesIO(body))
+
+
+def measure(parse, body) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog = parse(body)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return catalog, peak / 1024 / 1024, elapsed_ms
+
+
+def run(sizes):
+    print(f"{'events':>10} {'format':>8} {'body (MB)':>10} {'peak (MB)':>10} {'parse (ms)':>11}")
+    for size in sizes:
+        catalog = synthetic_catalog(size)
+        for name, body, parse in (
+            ("geojson", geojson_body(catalog), parse_geojson),
+            ("text", text_body(catalog), parse_text),
+        ):
+            parsed, peak_mb, elapsed_ms = measure(parse, body)
+            assert len(parsed) == size
+            body_mb = len(body) / 1024 / 1024
+            print(f"{size:>10} {name:>8} {body_mb:>10.1f} {peak_mb:>10.1f} {elapsed_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+    run(args.sizes)
@@ -0,0 +1,61 @@
+"""
+Benchmark of the offline gazetteer geocoder.
+
+Builds a `Gazetteer` over synthetic places spread uniformly over the
+sphere and reports its build time, memory footprint and the latency of
+forward (name to coordinates) and reverse (nearest place) lookups through
+`GazetteerGeocoder`, the geocoder used with `GEOCODER=gazetteer`.
+
+Run with:
+
+    python tests/benchmark/bench_gazetteer.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src"))
+
+from helper.gazetteer import Gazetteer, GazetteerGeocoder
+
+
+def run(sizes, queries):
+    rng = np.random.default_rng(1)
+    print(
+        f"{'places':>10} {'build (s)':>10} {'memory (MB)':>12}"
+        f" {'geocode (ms)':>13} {'reverse (ms)':>13}"
+    )
+    for size in sizes:
+        latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, size)))
+        longitudes = rng.uniform(-180, 180, size)
+        names = [f"Place {position}" for position in range(size)]
+        start = time.perf_counter()
+        geocoder = GazetteerGeocoder(Gazetteer(names, latitudes, longitudes), max_reverse_km=float("inf"))
+        build_s = time.perf_counter() - start
+
+        lookups = [names[position] for position in rng.integers(0, size, queries)]
+        start = time.perf_counter()
+        for name in lookups:
+            geocoder.geocode(name)
+        geocode_ms = (time.perf_counter() - start) * 1000 / queries
+
+        points = list(zip(np.degrees(np.arcsin(rng.uniform(-1, 1, queries))), rng.uniform(-180, 180, queries)))
+        start = time.perf_counter()
+        for point in points:
+            geocoder.reverse(point)
+        reverse_ms = (time.perf_counter() - start) * 1000 / queries
+
+        memory_mb = geocoder.gazetteer.statistics()["memory_bytes"] / 1024 / 1024
+        print(f"{size:>10} {build_s:>10.2f} {memory_mb:>12.1f} {geocode_ms:>13.3f} {reverse_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 200_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.sizes, args.queries)
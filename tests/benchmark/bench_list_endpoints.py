@@ -0,0 +1,95 @@
+"""
+Benchmark of listing cities from a seeded local database.
+
+Seeds a temporary SQLite database with synthetic cities and compares, for
+each size, loading the whole table as the list endpoints used to
+(`db.query(City).all()`) with one keyset page of `CityService.get_cities`
+(near the start and at the end of the table) and with the same deep page
+selected by OFFSET. Reports the latency and the peak memory allocated,
+measured with tracemalloc.
+
+Run with:
+
+    python tests/benchmark/bench_list_endpoints.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src"))
+
+
+def measure(query, repeat) -> tuple:
+    query()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024 / 1024
+
+
+def run(sizes, limit, repeat):
+    from sqlalchemy import insert, select
+
+    from helper.database import Base, dispose_engines, get_engine, session_scope
+    from models.db.city_model import City
+    from models.db.country_model import Country  # noqa: F401, registers the tables City refers to
+    from models.db.earthquake_search_model import EarthquakeSearch  # noqa: F401
+    from models.db.state_model import State  # noqa: F401
+    from services.city_service import CityService
+
+    print(f"{'cities':>10} {'method':>16} {'latency (ms)':>13} {'peak (MB)':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'cities.db')}"
+            dispose_engines()
+            Base.metadata.create_all(get_engine())
+            with get_engine().begin() as connection:
+                connection.execute(
+                    insert(City),
+                    [
+                        {
+                            "id": city_id,
+                            "name": f"City {city_id}",
+                            "state_province_id": city_id % 50,
+                            "latitude": 0.0,
+                            "longitude": 0.0,
+                        }
+                        for city_id in range(1, size + 1)
+                    ],
+                )
+            city_service = CityService()
+
+            def full_table():
+                with session_scope() as db:
+                    return db.query(City).all()
+
+            def offset_page():
+                with session_scope() as db:
+                    return db.scalars(select(City).order_by(City.id).offset(size - limit).limit(limit)).all()
+
+            for name, query in (
+                ("full table", full_table),
+                ("keyset first", lambda: city_service.get_cities(limit)),
+                ("keyset last", lambda: city_service.get_cities(limit, after_id=size - limit)),
+                ("offset last", offset_page),
+            ):
+                elapsed_ms, peak_mb = measure(query, repeat)
+                print(f"{size:>10} {name:>16} {elapsed_ms:>13.2f} {peak_mb:>10.2f}")
+            dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.limit, args.repeat)
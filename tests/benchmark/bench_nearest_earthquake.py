@@ -0,0 +1,82 @@
+"""
+Benchmark of the nearest earthquake search.
+
+Compares the per-event geodesic loop previously used by the earthquake
+service with the vectorized search of `EarthquakeCatalog.nearest` on
+synthetic catalogs.
+
+Run with:
+
+    python tests/benchmark/bench_nearest_earthquake.py
+
+The geodesic loop takes minutes on the largest catalogs, so above
+`--max-loop-events` it is timed on a sample and extrapolated linearly.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src"))
+
+from helper.earthquake_catalog import EarthquakeCatalog
+
+CITY = (34.0522, -118.2437)
+
+
+def synthetic_catalog(size, seed=42) -> EarthquakeCatalog:
+    rng = np.random.default_rng(seed)
+    return EarthquakeCatalog(
+        ids=[f"ev{i}" for i in range(size)],
+        times=rng.integers(1_600_000_000_000, 1_700_000_000_000, size),
+        latitudes=np.degrees(np.arcsin(rng.uniform(-1, 1, size))),
+        longitudes=rng.uniform(-180, 180, size),
+        depths=rng.uniform(0, 700, size),
+        magnitudes=rng.uniform(5, 9, size),
+        places=[""] * size,
+    )
+
+
+def geodesic_loop(catalog, count):
+    min_distance, closest = float("inf"), None
+    for index in range(count):
+        distance = geodesic(CITY, (catalog.latitudes[index], catalog.longitudes[index])).kilometers
+        if distance < min_distance:
+            min_distance, closest = distance, index
+    return closest, min_distance
+
+
+def run(sizes, max_loop_events):
+    print(f"{'events':>10} {'geodesic loop (s)':>20} {'vectorized (s)':>16} {'speedup':>10}")
+    for size in sizes:
+        catalog = synthetic_catalog(size)
+
+        loop_count = min(size, max_loop_events)
+        start = time.perf_counter()
+        geodesic_loop(catalog, loop_count)
+        loop_seconds = (time.perf_counter() - start) * size / loop_count
+        estimated = " (est.)" if loop_count < size else ""
+
+        catalog.nearest(*CITY)
+        repeats = 5
+        start = time.perf_counter()
+        for _ in range(repeats):
+            catalog.nearest(*CITY)
+        vectorized_seconds = (time.perf_counter() - start) / repeats
+
+        print(
+            f"{size:>10} {loop_seconds:>13.4f}{estimated:>7} {vectorized_seconds:>16.5f}"
+            f" {loop_seconds / vectorized_seconds:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--max-loop-events", type=int, default=20_000)
+    args = parser.parse_args()
+    run(args.sizes, args.max_loop_events)
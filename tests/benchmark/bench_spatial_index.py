@@ -0,0 +1,62 @@
+"""
+Benchmark of the earthquake spatial index.
+
+Reports the build time, memory footprint and nearest-neighbour query
+latency of `EarthquakeSpatialIndex` against a full vectorized scan of the
+same synthetic catalog.
+
+Run with:
+
+    python tests/benchmark/bench_spatial_index.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src"))
+sys.path.append(current_dir)
+
+from bench_nearest_earthquake import synthetic_catalog
+from helper.spatial_index import EarthquakeSpatialIndex
+
+
+def run(sizes, queries):
+    rng = np.random.default_rng(1)
+    origins = list(
+        zip(np.degrees(np.arcsin(rng.uniform(-1, 1, queries))), rng.uniform(-180, 180, queries))
+    )
+    print(
+        f"{'events':>10} {'build (ms)':>11} {'memory (MB)':>12}"
+        f" {'index query (ms)':>17} {'full scan (ms)':>15}"
+    )
+    for size in sizes:
+        catalog = synthetic_catalog(size)
+        index = EarthquakeSpatialIndex()
+        start = time.perf_counter()
+        index.build(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for latitude, longitude in origins:
+            index.nearest(latitude, longitude)
+        index_ms = (time.perf_counter() - start) * 1000 / queries
+
+        start = time.perf_counter()
+        for latitude, longitude in origins:
+            catalog.nearest(latitude, longitude)
+        scan_ms = (time.perf_counter() - start) * 1000 / queries
+
+        memory_mb = index.statistics()["memory_bytes"] / 1024 / 1024
+        print(f"{size:>10} {build_ms:>11.1f} {memory_mb:>12.1f} {index_ms:>17.3f} {scan_ms:>15.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    run(args.sizes, args.queries)
@@ -0,0 +1,123 @@
+"""
+Throughput of the earthquake endpoint with one to several uvicorn workers.
+
+Serves the application with `uvicorn --workers N` on a temporary SQLite
+database, with the local stubs of the USGS API and of the geocoder from
+`bench_async_endpoint.py`, and hammers `POST /v1/earthquakes/{city_id}` for
+each worker count. The result cache is disabled and the date range ends
+today, so every request fetches and scans the stub catalog.
+
+Run with:
+
+    python tests/benchmark/bench_workers.py
+
+Each worker preloads its data in the application lifespan before the load
+starts; the reported numbers only include requests served afterwards.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)), "src")
+sys.path.append(src_dir)
+sys.path.append(current_dir)
+
+
+def create_app():
+    """Application factory imported by every worker process."""
+    import services.geocoding_service as geocoding_service_module
+    from bench_async_endpoint import StubGeocoder
+    from main import app
+
+    geocoding_service_module.Nominatim = StubGeocoder(float(os.environ["BENCH_GEOCODER_LATENCY"]))
+    return app
+
+
+def serve_workers(port, workers):
+    import uvicorn
+
+    uvicorn.run(
+        "bench_workers:create_app",
+        factory=True,
+        app_dir=current_dir,
+        host="127.0.0.1",
+        port=port,
+        workers=workers,
+        log_level="error",
+    )
+
+
+def run(workers_list, requests, concurrency, usgs_latency, geocoder_latency, events):
+    # Set before the application is imported, since the result cache is created at import.
+    os.environ.update(
+        BENCH_GEOCODER_LATENCY=str(geocoder_latency),
+        RESULT_CACHE_BACKEND="none",
+        EARTHQUAKE_FETCH_WINDOW_DAYS="3650",
+    )
+    # Imported here so worker processes, which only need `create_app`, keep the parent's database.
+    from bench_async_endpoint import free_port, load, serve_stub_usgs, wait_for_port
+
+    import numpy as np
+
+    from helper.database import Base, dispose_engines, get_engine, session_scope
+    from models.db.city_model import City
+
+    Base.metadata.create_all(get_engine())
+    with get_engine().connect() as connection:
+        # Lets the workers read while one of them records a search.
+        connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+    with session_scope() as db:
+        db.add(City(id=1, name="Los Angeles", state_province_id=1, latitude=34.05, longitude=-118.24))
+        db.commit()
+    dispose_engines()
+
+    usgs_port = free_port()
+    stub = multiprocessing.Process(target=serve_stub_usgs, args=(usgs_port, usgs_latency, events))
+    stub.start()
+    wait_for_port(usgs_port)
+    os.environ["USGS_API_URL"] = f"http://127.0.0.1:{usgs_port}/fdsnws/event/1/query"
+
+    today = datetime.now(timezone.utc).date()
+    query = f"start_date={today - timedelta(days=180)}&end_date={today}"
+    print(
+        f"{requests} requests per run, {concurrency} clients, USGS stub latency "
+        f"{usgs_latency * 1000:.0f} ms, {events} events per response"
+    )
+    print(f"{'workers':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'RPS':>8} {'speedup':>8}")
+    baseline = None
+    for workers in workers_list:
+        port = free_port()
+        server = multiprocessing.Process(target=serve_workers, args=(port, workers))
+        server.start()
+        wait_for_port(port)
+        # Lets every worker finish its lifespan before the load starts.
+        time.sleep(3 * workers)
+        url = f"http://127.0.0.1:{port}/v1/earthquakes/1?{query}"
+        latencies, rps = asyncio.run(load(url, requests, concurrency))
+        baseline = baseline or rps
+        print(
+            f"{workers:>8} {np.percentile(latencies, 50):>10.1f} {np.percentile(latencies, 99):>10.1f}"
+            f" {rps:>8.0f} {rps / baseline:>7.2f}x"
+        )
+        server.terminate()
+        server.join()
+
+    stub.terminate()
+    stub.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--usgs-latency", type=float, default=0.0)
+    parser.add_argument("--geocoder-latency", type=float, default=0.0)
+    parser.add_argument("--events", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.workers, args.requests, args.concurrency, args.usgs_latency, args.geocoder_latency, args.events)
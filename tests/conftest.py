@@ -0,0 +1,234 @@
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from helper.database import Base, dispose_engines, get_engine
+from helper.distance import haversine_km
+from helper.http_client import CircuitBreaker, get_http_client
+from helper.result_cache import MemoryCacheBackend, ResultCache
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.earthquake_event_model import EarthquakeCatalogSync, EarthquakeEvent
+from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.reverse_geocode_model import ReverseGeocode
+from models.db.state_model import State
+from services.container import container
+from services.earthquake_catalog_service import CATALOG_SOURCE, EarthquakeCatalogService
+from services.earthquake_service import EarthquakeService
+from services.geocoding_service import GeocodingService
+
+
+def fdsn_text(events) -> str:
+    """Formats GeoJSON features as the pipe-separated `format=text` output of an FDSN service."""
+    lines = [
+        "#EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|Contributor"
+        "|ContributorID|MagType|Magnitude|MagAuthor|EventLocationName"
+    ]
+    for event in events:
+        longitude, latitude, depth = event["geometry"]["coordinates"]
+        properties = event["properties"]
+        time = datetime.fromtimestamp(properties["time"] / 1000.0, tz=timezone.utc)
+        magnitude = "" if properties["mag"] is None else properties["mag"]
+        depth = "" if depth is None else depth
+        lines.append(
+            f"{event['id']}|{time.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}|{latitude}|{longitude}|{depth}"
+            f"|us|us|us|{event['id']}|mww|{magnitude}|us|{properties['place'] or ''}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def parse_fdsn_time(value) -> int:
+    """Parses an FDSN time parameter into milliseconds since the epoch."""
+    date = datetime.fromisoformat(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+class FakeFdsnServer:
+    """
+    A local stand-in for the USGS FDSN event web service.
+
+    Events are kept in memory and filtered with the same query parameters
+    the real service supports, so tests never reach the network.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.requests = []
+        self.status_code = 200
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/fdsnws/event/1/query"
+
+    def add_event(
+        self,
+        event_id,
+        time,
+        latitude,
+        longitude,
+        magnitude,
+        depth=10.0,
+        place="",
+        updated=None,
+        status="reviewed",
+    ):
+        """Adds or replaces an event; `time` and `updated` accept ISO strings or milliseconds."""
+        if isinstance(time, str):
+            time = parse_fdsn_time(time)
+        if isinstance(updated, str):
+            updated = parse_fdsn_time(updated)
+        self.events = [event for event in self.events if event["id"] != event_id]
+        self.events.append(
+            {
+                "type": "Feature",
+                "id": event_id,
+                "properties": {
+                    "mag": magnitude,
+                    "place": place,
+                    "time": time,
+                    "updated": updated if updated is not None else time,
+                    "status": status,
+                },
+                "geometry": {"type": "Point", "coordinates": [longitude, latitude, depth]},
+            }
+        )
+
+    def query(self, params) -> list:
+        """Returns the events matching the FDSN query parameters."""
+        events = list(self.events)
+        if params.get("includedeleted") != "true":
+            events = [e for e in events if e["properties"]["status"] != "deleted"]
+        if "starttime" in params:
+            start = parse_fdsn_time(params["starttime"])
+            events = [e for e in events if e["properties"]["time"] >= start]
+        if "endtime" in params:
+            end = parse_fdsn_time(params["endtime"])
+            events = [e for e in events if e["properties"]["time"] <= end]
+        if "updatedafter" in params:
+            updated_after = parse_fdsn_time(params["updatedafter"])
+            events = [e for e in events if e["properties"]["updated"] > updated_after]
+        if "minmagnitude" in params:
+            min_magnitude = float(params["minmagnitude"])
+            events = [e for e in events if (e["properties"]["mag"] or 0) >= min_magnitude]
+        if "maxradiuskm" in params:
+            latitude, longitude = float(params["latitude"]), float(params["longitude"])
+            max_radius = float(params["maxradiuskm"])
+            events = [
+                e
+                for e in events
+                if haversine_km(
+                    latitude, longitude, e["geometry"]["coordinates"][1], e["geometry"]["coordinates"][0]
+                )
+                <= max_radius
+            ]
+
+        orderby = params.get("orderby", "time")
+        if orderby == "time-asc":
+            events.sort(key=lambda e: e["properties"]["time"])
+        elif orderby == "magnitude":
+            events.sort(key=lambda e: e["properties"]["mag"] or 0, reverse=True)
+        else:
+            events.sort(key=lambda e: e["properties"]["time"], reverse=True)
+
+        offset = int(params.get("offset", 1)) - 1
+        events = events[offset:]
+        if "limit" in params:
+            events = events[: int(params["limit"])]
+        return events
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {
+                    key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()
+                }
+                server.requests.append(params)
+                if server.status_code != 200:
+                    self.send_response(server.status_code)
+                    self.end_headers()
+                    return
+                events = server.query(params)
+                if params.get("format") == "text":
+                    content_type = "text/plain"
+                    body = fdsn_text(events).encode()
+                else:
+                    content_type = "application/json"
+                    body = json.dumps({"type": "FeatureCollection", "features": events}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def fake_fdsn_server(monkeypatch):
+    """Runs a fake FDSN event service and points `USGS_API_URL` at it."""
+    server = FakeFdsnServer()
+    server.start()
+    monkeypatch.setenv("USGS_API_URL", server.url)
+    # Retry immediately and start every test with a closed circuit breaker.
+    http_client = get_http_client(CATALOG_SOURCE)
+    monkeypatch.setattr(http_client, "backoff", 0.0)
+    monkeypatch.setattr(http_client, "breaker", CircuitBreaker())
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def sqlite_database(monkeypatch, tmp_path):
+    """Points `DATABASE_URL` at a fresh SQLite database with every table created."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'earthquake.db'}")
+    dispose_engines()
+    EarthquakeCatalogService.reset_spatial_index()
+    Base.metadata.create_all(get_engine())
+    yield get_engine()
+    dispose_engines()
+    EarthquakeCatalogService.reset_spatial_index()
+
+
+@pytest.fixture(autouse=True)
+def clear_geocoding_caches():
+    """Empties the process-wide geocoding caches around every test."""
+    GeocodingService.geocode_cache.clear()
+    GeocodingService.reverse_cache.clear()
+    yield
+    GeocodingService.geocode_cache.clear()
+    GeocodingService.reverse_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_result_cache(monkeypatch):
+    """Gives every test an empty in-memory result cache."""
+    monkeypatch.setattr(EarthquakeService, "result_cache", ResultCache(MemoryCacheBackend()))
+
+
+@pytest.fixture(autouse=True)
+def reset_service_container():
+    """Discards the shared services around every test, so each test builds them from its own environment."""
+    container.reset()
+    yield
+    container.reset()
@@ -0,0 +1,71 @@
+from helper.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_and_miss_counters():
+    """
+    Scenario: Lookups are counted as hits or misses.
+    """
+
+    # Arrange
+    cache = TTLCache(maxsize=10)
+    cache.set("a", 1)
+
+    # Act
+    hit = cache.get("a")
+    miss = cache.get("b")
+
+    # Assert
+    assert (hit, miss) == (1, None)
+    stats = cache.statistics()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Scenario: A full cache evicts the least recently used entry.
+    """
+
+    # Arrange
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    # Act
+    cache.set("c", 3)
+
+    # Assert
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.statistics()["evictions"] == 1
+
+
+def test_cache_entries_expire():
+    """
+    Scenario: Entries are dropped once their time to live has passed.
+    """
+
+    # Arrange
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=None)
+
+    # Act
+    timer.now = 61
+
+    # Assert
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.statistics()["expirations"] == 1
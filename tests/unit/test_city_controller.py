@@ -122,3 +122,27 @@ def test_add_city_invalid_state_id():
         assert response.json() == {"detail": "Cannot create city: State does not exist. Please provide a valid state_province_id."}
 
         mock_create_city.assert_called_once()      
+
+
+def test_list_cities_returns_next_page_cursor():
+    """
+    Scenario: A full page of cities carries the after_id of the next page in a header, and the limit is bounded
+    """
+    page = [MagicMock(id=4, state_province_id=1), MagicMock(id=7, state_province_id=1)]
+    for city, name in zip(page, ("City Four", "City Seven")):
+        city.name = name
+
+    with patch("services.city_service.CityService.get_cities") as mock_get_cities:
+        # Arrange
+        mock_get_cities.return_value = page
+
+        # Act
+        response = client.get("/v1/cities/?limit=2&after_id=3&state_id=1")
+        too_large = client.get("/v1/cities/?limit=100000")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["x-next-after-id"] == "7"
+        assert [city["id"] for city in response.json()] == [4, 7]
+        mock_get_cities.assert_called_once_with(2, 3, 1, None)
+        assert too_large.status_code == 422
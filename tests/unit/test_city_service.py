@@ -0,0 +1,136 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import inspect
+
+from helper.database import session_scope
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.state_model import State
+from models.schemas.city_schema import CityCreate
+from models.schemas.earthquake_schema import EarthquakeModel
+from services.city_service import CityService
+from services.earthquake_service import EarthquakeService
+from services.geocoding_service import GeocodingService
+
+
+def stored_city(city_id):
+    with session_scope() as db:
+        return db.get(City, city_id)
+
+
+@patch("services.geocoding_service.Nominatim")
+def test_create_city_stores_geocoded_coordinates(mock_nominatim, sqlite_database):
+    """
+    Scenario: A new city is geocoded once and its coordinates are stored on the row.
+    """
+
+    # Arrange
+    mock_nominatim.return_value.geocode.return_value = MagicMock(latitude=34.05, longitude=-118.24)
+
+    # Act
+    city = CityService().create_city(CityCreate(name="Los Angeles", state_province_id=1))
+
+    # Assert
+    stored = stored_city(city.id)
+    assert (stored.latitude, stored.longitude) == (34.05, -118.24)
+    mock_nominatim.return_value.geocode.assert_called_once_with("Los Angeles")
+
+
+@patch("services.geocoding_service.Nominatim")
+def test_create_city_with_coordinates_skips_geocoding(mock_nominatim, sqlite_database):
+    """
+    Scenario: Coordinates provided on creation are stored without calling the geocoder.
+    """
+
+    # Act
+    city = CityService().create_city(
+        CityCreate(name="Lisbon", state_province_id=1, latitude=38.72, longitude=-9.14)
+    )
+
+    # Assert
+    assert (stored_city(city.id).latitude, stored_city(city.id).longitude) == (38.72, -9.14)
+    mock_nominatim.return_value.geocode.assert_not_called()
+
+
+@patch("services.geocoding_service.Nominatim")
+def test_create_city_when_geocoding_fails(mock_nominatim, sqlite_database):
+    """
+    Scenario: A city that cannot be geocoded is created without coordinates.
+    """
+
+    # Arrange
+    mock_nominatim.return_value.geocode.return_value = None
+
+    # Act
+    city = CityService().create_city(CityCreate(name="Atlantis", state_province_id=1))
+
+    # Assert
+    assert stored_city(city.id).latitude is None
+
+
+def test_city_coordinates_are_geocoded_lazily_and_cached(sqlite_database):
+    """
+    Scenario: A city without coordinates is geocoded on first use, stored, and later served from the cache.
+    """
+
+    # Arrange
+    with session_scope() as db:
+        db.add(City(id=1, name="Los Angeles", state_province_id=1))
+        db.commit()
+    earthquake_service = EarthquakeService()
+    geolocator = MagicMock()
+    geolocator.geocode.return_value = MagicMock(latitude=34.05, longitude=-118.24)
+    earthquake_service.geocoding_service = GeocodingService(geolocator)
+    query = EarthquakeModel(
+        city_id=1,
+        city_name="Los Angeles",
+        state_abbreviation="CA",
+        start_date="2021-01-01",
+        end_date="2021-02-01",
+    )
+
+    # Act
+    first = asyncio.run(earthquake_service.resolve_city_coordinates_async(query))
+    second = asyncio.run(earthquake_service.resolve_city_coordinates_async(query))
+
+    # Assert
+    assert first == second == (34.05, -118.24)
+    assert (stored_city(1).latitude, stored_city(1).longitude) == (34.05, -118.24)
+    geolocator.geocode.assert_called_once()
+    assert GeocodingService.geocode_cache.statistics()["hits"] == 1
+
+
+def test_get_cities_pages_by_keyset_with_filters(sqlite_database):
+    """
+    Scenario: Cities are listed page by page after the last ID seen, filtered by state or country, with only their response columns loaded.
+    """
+
+    # Arrange
+    with session_scope() as db:
+        db.add_all([Country(id=1, name="USA"), Country(id=2, name="Japan")])
+        db.add_all(
+            [
+                State(id=1, name="California", state_abbreviation="CA", country_id=1),
+                State(id=2, name="Tokyo", state_abbreviation="TK", country_id=2),
+            ]
+        )
+        db.add_all(
+            City(id=city_id, name=f"City {city_id}", state_province_id=1 + city_id % 2, latitude=1.0, longitude=2.0)
+            for city_id in range(1, 8)
+        )
+        db.commit()
+    city_service = CityService()
+
+    # Act
+    first_page = city_service.get_cities(limit=3)
+    second_page = city_service.get_cities(limit=3, after_id=first_page[-1].id)
+    by_state = city_service.get_cities(state_id=1)
+    by_country = city_service.get_cities(limit=2, after_id=2, country_id=2)
+
+    # Assert
+    assert [city.id for city in first_page] == [1, 2, 3]
+    assert [city.id for city in second_page] == [4, 5, 6]
+    assert [city.id for city in by_state] == [2, 4, 6]
+    assert [city.id for city in by_country] == [3, 5]
+    assert {"latitude", "longitude"} <= inspect(first_page[0]).unloaded
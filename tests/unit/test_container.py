@@ -0,0 +1,52 @@
+import time
+import tracemalloc
+
+from services.city_service import CityService
+from services.container import container, get_city_service, get_earthquake_service
+from services.earthquake_service import EarthquakeService
+
+
+def test_container_returns_the_same_instance():
+    """
+    Scenario: Every dependency resolution returns the same service until the container is reset.
+    """
+
+    # Act
+    first = get_earthquake_service()
+    second = get_earthquake_service()
+    container.reset()
+    rebuilt = get_earthquake_service()
+
+    # Assert
+    assert first is second
+    assert isinstance(first, EarthquakeService)
+    assert rebuilt is not first
+    assert get_city_service() is container.get(CityService)
+
+
+def test_container_resolution_allocates_less_than_building_services():
+    """
+    Scenario: Resolving the shared service 100 times allocates and takes a fraction of building it 100 times.
+    """
+
+    # Arrange
+    get_earthquake_service()
+
+    def measure(factory):
+        tracemalloc.start()
+        start = time.perf_counter()
+        services = [factory() for _ in range(100)]
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return services, peak, elapsed
+
+    # Act
+    shared, shared_peak, shared_elapsed = measure(get_earthquake_service)
+    built, built_peak, built_elapsed = measure(EarthquakeService)
+
+    # Assert
+    assert len({id(service) for service in shared}) == 1
+    assert len({id(service) for service in built}) == 100
+    assert shared_peak * 10 < built_peak
+    assert shared_elapsed < built_elapsed
@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from helper.distance import (
+    haversine_km,
+    nearest_k_points,
+    nearest_point,
+    nearest_points,
+    points_within_radius,
+)
+from helper.earthquake_catalog import EarthquakeCatalog
+
+
+def test_haversine_matches_geodesic_within_error_bound():
+    """
+    Scenario: The vectorized spherical distance stays close to the geodesic distance.
+    """
+
+    # Arrange
+    rng = np.random.default_rng(7)
+    latitudes = rng.uniform(-89, 89, 200)
+    longitudes = rng.uniform(-180, 180, 200)
+
+    # Act
+    distances = haversine_km(34.05, -118.24, latitudes, longitudes)
+
+    # Assert
+    expected = np.array(
+        [geodesic((34.05, -118.24), (lat, lon)).kilometers for lat, lon in zip(latitudes, longitudes)]
+    )
+    assert np.all(np.abs(distances - expected) <= expected * 0.006 + 1e-6)
+
+
+def test_nearest_point_matches_geodesic_loop():
+    """
+    Scenario: The vectorized search returns the same event and distance as the per-event geodesic loop.
+    """
+
+    # Arrange
+    rng = np.random.default_rng(11)
+    latitudes = rng.uniform(-89, 89, 2000)
+    longitudes = rng.uniform(-180, 180, 2000)
+    origin = (-23.55, -46.63)
+
+    # Act
+    index, distance = nearest_point(*origin, latitudes, longitudes)
+
+    # Assert
+    loop_distances = [
+        geodesic(origin, (lat, lon)).kilometers for lat, lon in zip(latitudes, longitudes)
+    ]
+    assert index == int(np.argmin(loop_distances))
+    assert distance == pytest.approx(min(loop_distances))
+
+
+def test_nearest_point_without_points():
+    """
+    Scenario: Searching an empty set of points returns no result.
+    """
+
+    # Act
+    index, distance = nearest_point(0.0, 0.0, np.array([]), np.array([]))
+
+    # Assert
+    assert index is None
+    assert distance == float("inf")
+
+
+def test_catalog_from_features():
+    """
+    Scenario: GeoJSON features are packed into contiguous arrays.
+    """
+
+    # Arrange
+    features = [
+        {
+            "id": "us1",
+            "properties": {"mag": 5.5, "time": 1614592800000, "place": "Near LA"},
+            "geometry": {"coordinates": [-118.0, 34.0, 10.0]},
+        },
+        {
+            "id": "us2",
+            "properties": {"mag": None, "time": 1617271200000, "place": None},
+            "geometry": {"coordinates": [139.0, 35.0, 30.0]},
+        },
+    ]
+
+    # Act
+    catalog = EarthquakeCatalog.from_features(features)
+
+    # Assert
+    assert len(catalog) == 2
+    assert catalog.latitudes.dtype == np.float64
+    assert catalog.latitudes.flags["C_CONTIGUOUS"]
+    assert catalog.nearest(34.05, -118.24)[0] == 0
+    assert catalog.event(1) == {
+        "id": "us2",
+        "time": 1617271200000,
+        "latitude": 35.0,
+        "longitude": 139.0,
+        "depth": 30.0,
+        "magnitude": None,
+        "place": "",
+    }
+
+
+def test_nearest_points_matches_per_origin_search():
+    """
+    Scenario: The blocked origins × events matrix finds the same nearest events as one search per origin.
+    """
+
+    # Arrange
+    rng = np.random.default_rng(13)
+    latitudes = rng.uniform(-89, 89, 500)
+    longitudes = rng.uniform(-180, 180, 500)
+    origin_latitudes = rng.uniform(-89, 89, 25)
+    origin_longitudes = rng.uniform(-180, 180, 25)
+
+    # Act
+    results = nearest_points(origin_latitudes, origin_longitudes, latitudes, longitudes, max_cells=2000)
+
+    # Assert
+    assert results == [
+        nearest_point(latitude, longitude, latitudes, longitudes)
+        for latitude, longitude in zip(origin_latitudes, origin_longitudes)
+    ]
+    assert nearest_points([1.0], [2.0], np.array([]), np.array([])) == [(None, float("inf"))]
+
+
+def test_nearest_k_and_radius_match_geodesic_ranking():
+    """
+    Scenario: The top-k and radius selections rank points like a sort of every geodesic distance.
+    """
+
+    # Arrange
+    rng = np.random.default_rng(17)
+    latitudes = rng.uniform(-89, 89, 2000)
+    longitudes = rng.uniform(-180, 180, 2000)
+    origin = (48.85, 2.35)
+    ranking = sorted(
+        (geodesic(origin, (lat, lon)).kilometers, index)
+        for index, (lat, lon) in enumerate(zip(latitudes, longitudes))
+    )
+
+    # Act
+    top_k = nearest_k_points(*origin, latitudes, longitudes, 10)
+    within = points_within_radius(*origin, latitudes, longitudes, 1500)
+
+    # Assert
+    assert [index for index, _ in top_k] == [index for _, index in ranking[:10]]
+    assert [index for index, _ in within] == [index for distance, index in ranking if distance <= 1500]
+    assert nearest_k_points(*origin, latitudes[:3], longitudes[:3], 10) == nearest_k_points(
+        *origin, latitudes[:3], longitudes[:3], 3
+    )
@@ -0,0 +1,306 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from helper.database import session_scope
+from helper.event_store import EventStore
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.earthquake_event_model import EarthquakeCatalogSync, EarthquakeEvent
+from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.state_model import State
+from services.earthquake_catalog_service import (
+    CATALOG_SOURCE,
+    EarthquakeCatalogService,
+    EarthquakeSyncScheduler,
+    date_to_timestamp_ms,
+)
+from services.earthquake_service import EarthquakeService
+
+
+@pytest.fixture
+def catalog_service(fake_fdsn_server, sqlite_database):
+    return EarthquakeCatalogService(
+        api_url=fake_fdsn_server.url, start_time=datetime(2021, 1, 1), min_magnitude=5
+    )
+
+
+def stored_events():
+    with session_scope() as db:
+        return {event.id: event for event in db.query(EarthquakeEvent).all()}
+
+
+def add_los_angeles():
+    with session_scope() as db:
+        db.add(Country(id=1, name="United States"))
+        db.add(State(id=1, name="California", state_abbreviation="CA", country_id=1))
+        db.add(City(id=1, name="Los Angeles", state_province_id=1, latitude=34.05, longitude=-118.24))
+        db.commit()
+
+
+def test_initial_sync_downloads_catalog(fake_fdsn_server, catalog_service):
+    """
+    Scenario: The first synchronization downloads every event since the catalog start.
+    """
+
+    # Arrange
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5, place="Near LA")
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 35.0, 139.0, 6.1, place="Japan")
+    fake_fdsn_server.add_event("us3", "2020-12-01T10:00:00", 35.0, 139.0, 6.1)
+    fake_fdsn_server.add_event("us4", "2021-05-01T10:00:00", 35.0, 139.0, 4.0)
+
+    # Act
+    summary = catalog_service.sync()
+
+    # Assert
+    assert summary["upserted"] == 2
+    assert set(stored_events()) == {"us1", "us2"}
+    assert "updatedafter" not in fake_fdsn_server.requests[0]
+    with session_scope() as db:
+        state = db.get(EarthquakeCatalogSync, CATALOG_SOURCE)
+        assert state.updated_cursor == summary["updated_cursor"]
+        assert state.last_synced_at is not None
+
+
+def test_incremental_sync_applies_updates_and_deletions(fake_fdsn_server, catalog_service):
+    """
+    Scenario: Later synchronizations only fetch events updated after the cursor.
+    """
+
+    # Arrange
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5)
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 35.0, 139.0, 6.1)
+    catalog_service.sync()
+    fake_fdsn_server.add_event(
+        "us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.8, updated="2021-06-01T00:00:00"
+    )
+    fake_fdsn_server.add_event(
+        "us2", "2021-04-01T10:00:00", 35.0, 139.0, 6.1, updated="2021-06-01T00:00:00", status="deleted"
+    )
+    fake_fdsn_server.add_event(
+        "us5", "2021-05-01T10:00:00", -33.0, -70.0, 7.0, updated="2021-06-01T00:00:00"
+    )
+
+    # Act
+    summary = catalog_service.sync()
+
+    # Assert
+    assert fake_fdsn_server.requests[-1]["updatedafter"] == "2021-04-01T10:00:00.000"
+    assert summary == {"upserted": 2, "deleted": 1, "updated_cursor": summary["updated_cursor"]}
+    events = stored_events()
+    assert set(events) == {"us1", "us5"}
+    assert events["us1"].magnitude == 5.8
+
+
+def test_sync_evicts_cached_results_of_changed_events(fake_fdsn_server, catalog_service):
+    """
+    Scenario: A revised event evicts the cached results whose range contains it once the sync commits.
+    """
+
+    # Arrange
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5)
+    catalog_service.sync()
+    result_cache = EarthquakeService.result_cache
+    keys = [
+        EarthquakeService.result_cache_key(1, "2021-02-01", "2021-04-01"),
+        EarthquakeService.result_cache_key(1, "2021-05-01", "2021-06-01"),
+    ]
+
+    async def compute():
+        return {"message": "result"}
+
+    async def lookup():
+        return [(await result_cache.get_or_compute(key, compute, 60))[1] for key in keys]
+
+    asyncio.run(lookup())
+    fake_fdsn_server.add_event(
+        "us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.8, updated="2021-06-01T00:00:00"
+    )
+
+    # Act
+    catalog_service.sync()
+
+    # Assert
+    assert asyncio.run(lookup()) == [False, True]
+
+
+def test_sync_pages_through_large_results(fake_fdsn_server, catalog_service):
+    """
+    Scenario: Results larger than the page size are fetched with offsets.
+    """
+
+    # Arrange
+    catalog_service.page_size = 2
+    for day in range(1, 6):
+        fake_fdsn_server.add_event(f"us{day}", f"2021-03-0{day}T10:00:00", 34.0, -118.0, 5.5)
+
+    # Act
+    summary = catalog_service.sync()
+
+    # Assert
+    assert summary["upserted"] == 5
+    assert [request["offset"] for request in fake_fdsn_server.requests] == ["1", "3", "5"]
+    assert len(stored_events()) == 5
+
+
+def test_closest_earthquake_served_from_local_catalog(fake_fdsn_server, catalog_service):
+    """
+    Scenario: A synchronized range is answered without calling the USGS API.
+    """
+
+    # Arrange
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5)
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 35.0, 139.0, 6.1)
+    catalog_service.sync()
+    requests_after_sync = len(fake_fdsn_server.requests)
+    add_los_angeles()
+
+    earthquake_service = EarthquakeService()
+    earthquake_service.catalog_service = catalog_service
+    earthquake_service.geolocator = MagicMock()
+    earthquake_service.geolocator.reverse.return_value = MagicMock(address="Los Angeles, California")
+
+    # Act
+    result = asyncio.run(
+        earthquake_service.closest_earthquake_for_city_async(1, "2021-02-01", "2021-05-01")
+    )
+
+    # Assert
+    assert "M 5.5 - Los Angeles, California on March 01" in result["message"]
+    assert len(fake_fdsn_server.requests) == requests_after_sync
+
+
+def test_uncovered_range_falls_back_to_api(fake_fdsn_server, catalog_service):
+    """
+    Scenario: A range ending after the last synchronization is fetched from the API.
+    """
+
+    # Arrange
+    catalog_service.sync()
+    earthquake_service = EarthquakeService()
+    earthquake_service.catalog_service = catalog_service
+    requests_after_sync = len(fake_fdsn_server.requests)
+
+    # Act
+    asyncio.run(earthquake_service.get_earthquakes_async("2021-01-01", "2999-01-01"))
+
+    # Assert
+    windows = earthquake_service.fetcher.windows(
+        date_to_timestamp_ms("2021-01-01"), date_to_timestamp_ms("2999-01-01")
+    )
+    assert len(fake_fdsn_server.requests) == requests_after_sync + len(windows)
+    assert windows[-1][1] == date_to_timestamp_ms("2999-01-01")
+
+
+def test_closest_earthquake_for_city_fetches_api_and_saves_search(
+    fake_fdsn_server, sqlite_database
+):
+    """
+    Scenario: The async path fetches the catalog over the async client and records the search.
+    """
+
+    # Arrange
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5)
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 35.0, 139.0, 6.1)
+    add_los_angeles()
+    earthquake_service = EarthquakeService()
+    earthquake_service.catalog_source = "usgs"
+    earthquake_service.geolocator = MagicMock()
+    earthquake_service.geolocator.reverse.return_value = MagicMock(address="Los Angeles, California")
+
+    # Act
+    result = asyncio.run(
+        earthquake_service.closest_earthquake_for_city_async(1, "2021-02-01", "2021-05-01")
+    )
+
+    # Assert
+    assert "M 5.5 - Los Angeles, California on March 01" in result["message"]
+    assert len(fake_fdsn_server.requests) == 1
+    with session_scope() as db:
+        search = db.query(EarthquakeSearch).one()
+        assert search.closest_earthquake_location == "Los Angeles, California"
+
+
+def test_workers_map_the_snapshot_written_by_sync(fake_fdsn_server, sqlite_database, tmp_path):
+    """
+    Scenario: A synchronization writes a snapshot that a fresh index maps instead of reading the database.
+    """
+
+    # Arrange
+    snapshot_path = str(tmp_path / "events.snapshot")
+    catalog_service = EarthquakeCatalogService(
+        api_url=fake_fdsn_server.url,
+        start_time=datetime(2021, 1, 1),
+        min_magnitude=5,
+        snapshot_path=snapshot_path,
+    )
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 35.0, 139.0, 6.1)
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5)
+    catalog_service.sync()
+    EarthquakeCatalogService.reset_spatial_index()
+
+    # Act
+    index = catalog_service.get_spatial_index()
+    selected = index.select(date_to_timestamp_ms("2021-03-15"), date_to_timestamp_ms("2021-05-01"))
+
+    # Assert
+    assert EarthquakeCatalogService._store.statistics()["mapped"] is True
+    assert EarthquakeCatalogService._store.catalog.ids[0] == "us1"
+    assert selected.ids == ["us2"]
+    assert index.event(index.nearest(34.05, -118.24)[0])["id"] == "us1"
+
+
+def test_stale_snapshot_is_rebuilt_from_database(fake_fdsn_server, sqlite_database, tmp_path):
+    """
+    Scenario: A snapshot older than the last synchronization is replaced by one built from the database.
+    """
+
+    # Arrange
+    snapshot_path = str(tmp_path / "events.snapshot")
+    writer = EarthquakeCatalogService(
+        api_url=fake_fdsn_server.url,
+        start_time=datetime(2021, 1, 1),
+        min_magnitude=5,
+        snapshot_path=snapshot_path,
+    )
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5)
+    writer.sync()
+    writer.snapshot_path = None
+    fake_fdsn_server.add_event(
+        "us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5, updated="2021-06-01T00:00:00", status="deleted"
+    )
+    fake_fdsn_server.add_event("us5", "2021-05-01T10:00:00", -33.0, -70.0, 7.0, updated="2021-06-01T00:00:00")
+    writer.sync()
+    EarthquakeCatalogService.reset_spatial_index()
+    reader = EarthquakeCatalogService(api_url=fake_fdsn_server.url, snapshot_path=snapshot_path)
+
+    # Act
+    index = reader.get_spatial_index()
+
+    # Assert
+    assert len(index) == 1
+    assert index.event(0)["id"] == "us5"
+    assert list(EventStore.load(snapshot_path).catalog.ids) == ["us5"]
+
+
+def test_only_one_worker_scheduler_synchronizes(catalog_service, tmp_path):
+    """
+    Scenario: Schedulers of several workers sharing a lock file elect a single one to synchronize.
+    """
+
+    # Arrange
+    lock_path = str(tmp_path / "sync.lock")
+    first = EarthquakeSyncScheduler(catalog_service, 60, lock_path)
+    second = EarthquakeSyncScheduler(catalog_service, 60, lock_path)
+
+    # Act
+    leaders = [first.is_leader(), second.is_leader()]
+    first.stop()
+    takeover = second.is_leader()
+    second.stop()
+
+    # Assert
+    assert leaders == [True, False]
+    assert takeover is True
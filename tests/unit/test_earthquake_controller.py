@@ -1,63 +1,51 @@
-from unittest.mock import MagicMock, patch
+import json
+import re
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
-import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
+import services.geocoding_service as geocoding_service_module
+from helper.database import session_scope
 from main import app
-from models.schemas.earthquake_schema import EarthquakeModel
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.state_model import State
+from services.geocoding_service import GeocodingService
 
 client = TestClient(app)
 
 
-@patch("services.city_service.CityService.get_city_by_id")
-@patch("services.earthquake_service.EarthquakeService.process_earthquake_data")
-def test_get_closest_earthquake_success(mock_process_earthquake, mock_get_city_by_id):
+@patch("services.earthquake_service.EarthquakeService.closest_earthquake_for_city_async", new_callable=AsyncMock)
+def test_get_closest_earthquake_success(mock_closest_earthquake):
     """
     Scenario: Successfully getting the closest earthquake to a city within a specified date range.
     """
 
     # Arrange
-    mock_state = MagicMock()
-    mock_state.state_abbreviation = "CA"
-
-    mock_city = MagicMock()
-    mock_city.id = 1
-    mock_city.name = 'Los Angeles'
-    mock_city.state = mock_state
-    mock_get_city_by_id.return_value = mock_city
-
     expected_message = "Result for Los Angeles, CA between January 01, 2021 and July 07, 2021: The closest earthquake to Los Angeles was an M 5.25 - Severe Road, Fondo, Imperial County, California, United States on June 05"
-    mock_process_earthquake.return_value = {"message": expected_message}
+    mock_closest_earthquake.return_value = {"message": expected_message}
 
     # Act
     response = client.post("/v1/earthquakes/1?start_date=2021-01-01&end_date=2021-07-02")
-    print(response.text)
 
     # Assert
     assert response.status_code == 200
     assert response.json() == {"message": expected_message}
-
-    mock_get_city_by_id.assert_called_once_with(1)
-
-    mock_process_earthquake.assert_called_once_with(
-        EarthquakeModel(
-            city_id=1,
-            city_name="Los Angeles",
-            state_abbreviation="CA",
-            start_date="2021-01-01",
-            end_date="2021-07-02",
-        )
-    )
+    mock_closest_earthquake.assert_awaited_once_with(1, "2021-01-01", "2021-07-02")
 
 
-@patch("services.city_service.CityService.get_city_by_id")
-def test_get_closest_earthquake_city_not_found(mock_get_city_by_id):
+@patch("services.earthquake_service.EarthquakeService.closest_earthquake_for_city_async", new_callable=AsyncMock)
+def test_get_closest_earthquake_city_not_found(mock_closest_earthquake):
     """
     Scenario: The city is not found.
     """
 
     # Arrange
-    mock_get_city_by_id.return_value = None
+    mock_closest_earthquake.return_value = None
 
     # Act
     response = client.post(
@@ -73,25 +61,17 @@ def test_get_closest_earthquake_city_not_found(mock_get_city_by_id):
         "detail": "City not found"
     }, "The error message for a not found city is incorrect."
 
-    mock_get_city_by_id.assert_called_once_with(999)
+    mock_closest_earthquake.assert_awaited_once_with(999, "2021-01-01", "2021-01-02")
 
 
-@patch("services.city_service.CityService.get_city_by_id")
-@patch("services.earthquake_service.EarthquakeService.process_earthquake_data")
-def test_get_closest_earthquake_unexpected_error(
-    mock_process_earthquake, mock_get_city_by_id
-):
+@patch("services.earthquake_service.EarthquakeService.closest_earthquake_for_city_async", new_callable=AsyncMock)
+def test_get_closest_earthquake_unexpected_error(mock_closest_earthquake):
     """
     Scenario: An unexpected error occurs while processing the earthquake data.
     """
 
     # Arrange
-    mock_city = MagicMock()
-    mock_city.name = "Los Angeles"
-    mock_city.state.state_abbreviation = "CA"
-    mock_get_city_by_id.return_value = mock_city
-
-    mock_process_earthquake.side_effect = Exception("Unexpected error")
+    mock_closest_earthquake.side_effect = Exception("Unexpected error")
 
     # Act
     response = client.post("/v1/earthquakes/1?start_date=2021-01-01&end_date=2021-01-02")
@@ -104,5 +84,314 @@ def test_get_closest_earthquake_unexpected_error(
         "detail": "Unexpected error"
     }, "The error message in the response is incorrect."
 
-    mock_get_city_by_id.assert_called_once_with(1)
-    mock_process_earthquake.assert_called_once()
\ No newline at end of file
+    mock_closest_earthquake.assert_awaited_once()
+
+
+@patch("services.earthquake_service.EarthquakeService.closest_earthquake_for_city_async", new_callable=AsyncMock)
+def test_get_closest_earthquake_served_from_result_cache(mock_closest_earthquake):
+    """
+    Scenario: A repeated historical query is served from the cache and revalidated with its ETag.
+    """
+
+    # Arrange
+    mock_closest_earthquake.return_value = {"message": "M 6.0 - Somewhere"}
+    url = "/v1/earthquakes/1?start_date=2021-01-01&end_date=2021-07-02"
+
+    # Act
+    first = client.post(url)
+    second = client.post(url)
+    revalidated = client.post(url, headers={"If-None-Match": first.headers["ETag"]})
+
+    # Assert
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json() == {"message": "M 6.0 - Somewhere"}
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "max-age=604800"
+    assert revalidated.status_code == 304
+    mock_closest_earthquake.assert_awaited_once()
+
+
+@patch("services.earthquake_service.EarthquakeService.closest_earthquake_for_city_async", new_callable=AsyncMock)
+def test_get_closest_earthquake_errors_are_not_cached(mock_closest_earthquake):
+    """
+    Scenario: A processing error is returned as a message and computed again on the next request.
+    """
+
+    # Arrange
+    mock_closest_earthquake.side_effect = ValueError("Coordinates not found for Los Angeles city.")
+    url = "/v1/earthquakes/1?start_date=2021-01-01&end_date=2999-01-01"
+
+    # Act
+    client.post(url)
+    response = client.post(url)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json() == {"message": "Coordinates not found for Los Angeles city."}
+    assert mock_closest_earthquake.await_count == 2
+
+
+def add_cities():
+    with session_scope() as db:
+        db.add(Country(id=1, name="United States"))
+        db.add(State(id=1, name="California", state_abbreviation="CA", country_id=1))
+        db.add(State(id=2, name="Nevada", state_abbreviation="NV", country_id=1))
+        db.add(City(id=1, name="Los Angeles", state_province_id=1, latitude=34.05, longitude=-118.24))
+        db.add(City(id=2, name="San Francisco", state_province_id=1, latitude=37.77, longitude=-122.42))
+        db.add(City(id=3, name="Oakland", state_province_id=1, latitude=37.80, longitude=-122.27))
+        db.add(City(id=4, name="Las Vegas", state_province_id=2, latitude=36.17, longitude=-115.14))
+        db.commit()
+
+
+def test_batch_query_of_a_state_loads_catalog_once_and_bulk_records_searches(
+    fake_fdsn_server, sqlite_database, monkeypatch
+):
+    """
+    Scenario: Every city of a state is answered from one catalog fetch, and the searches are recorded.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_CATALOG_SOURCE", "usgs")
+    monkeypatch.setenv("REVERSE_GEOCODE_MODE", "place")
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5, place="Near LA")
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 38.0, -122.5, 6.1, place="Near SF")
+    add_cities()
+
+    # Act
+    response = client.post(
+        "/v1/earthquakes/batch",
+        json={"state_id": 1, "start_date": "2021-01-01", "end_date": "2021-05-01"},
+    )
+
+    # Assert
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["city_id"] for result in results] == [1, 2, 3]
+    assert results[0]["message"].endswith("was an M 5.5 - Near LA on March 01")
+    assert results[1]["message"].endswith("was an M 6.1 - Near SF on April 01")
+    assert results[2]["message"].endswith("was an M 6.1 - Near SF on April 01")
+    assert len(fake_fdsn_server.requests) == 1
+    with session_scope() as db:
+        searches = db.query(EarthquakeSearch).order_by(EarthquakeSearch.city_id).all()
+        assert [search.city_id for search in searches] == [1, 2, 3]
+        assert searches[0].closest_earthquake_location == "Near LA"
+
+
+def test_closest_earthquake_reads_with_one_query_and_records_on_the_same_session(
+    fake_fdsn_server, sqlite_database, monkeypatch
+):
+    """
+    Scenario: Each request runs only its own statements, on one session, whatever the reverse geocoding cache holds.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_CATALOG_SOURCE", "usgs")
+    geolocator = MagicMock()
+    geolocator.reverse.return_value = MagicMock(address="Near LA")
+    monkeypatch.setattr(geocoding_service_module, "Nominatim", lambda **kwargs: geolocator)
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5, place="Near LA")
+    add_cities()
+    with session_scope() as db:
+        db.add(
+            EarthquakeSearch(
+                city_id=2,
+                start_date=datetime(2021, 1, 1),
+                end_date=datetime(2021, 5, 1),
+                closest_earthquake_date=datetime(2021, 4, 1, 10, 0),
+                closest_earthquake_magnitude=6.1,
+                closest_earthquake_distance=10.0,
+                closest_earthquake_location="Near SF",
+                searched_at=datetime(2022, 1, 1),
+                is_current=True,
+            )
+        )
+        db.commit()
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args):
+        # The statement kind and the first table it reads or writes, e.g. "SELECT cities".
+        table = re.search(r"(?:FROM|INTO)\s+(\w+)", statement).group(1)
+        statements.append(f"{statement.split()[0]} {table}")
+
+    event.listen(sqlite_database, "before_cursor_execute", record_statement)
+    sessions = []
+    event.listen(Session, "after_begin", lambda session, *args: sessions.append(session))
+
+    def post(city_id):
+        statements.clear()
+        sessions.clear()
+        response = client.post(f"/v1/earthquakes/{city_id}?start_date=2021-01-01&end_date=2021-05-01")
+        return response, list(statements), len(set(map(id, sessions)))
+
+    # Act
+    cold, cold_statements, cold_sessions = post(1)
+    warm, warm_statements, warm_sessions = post(3)
+    GeocodingService.reverse_cache.clear()
+    stored, stored_statements, stored_sessions = post(4)
+    requests_before_reuse = len(fake_fdsn_server.requests)
+    reused, reused_statements, reused_sessions = post(2)
+    missing, missing_statements, missing_sessions = post(999)
+
+    # Assert
+    assert cold.json()["message"].endswith("was an M 5.5 - Near LA on March 01")
+    assert cold_statements == [
+        "SELECT cities",
+        "SELECT reverse_geocodes",
+        "INSERT reverse_geocodes",
+        "INSERT earthquake_searches",
+    ]
+    assert warm.json()["message"].endswith("was an M 5.5 - Near LA on March 01")
+    assert warm_statements == ["SELECT cities", "INSERT earthquake_searches"]
+    assert stored.json()["message"].endswith("was an M 5.5 - Near LA on March 01")
+    assert stored_statements == [
+        "SELECT cities",
+        "SELECT reverse_geocodes",
+        "INSERT earthquake_searches",
+    ]
+    assert reused.json()["message"].endswith("was an M 6.1 - Near SF on April 01")
+    assert reused_statements == ["SELECT cities"]
+    assert missing.status_code == 404
+    assert missing_statements == ["SELECT cities"]
+    assert (cold_sessions, warm_sessions, stored_sessions, reused_sessions, missing_sessions) == (1, 1, 1, 1, 1)
+    geolocator.reverse.assert_called_once()
+    assert len(fake_fdsn_server.requests) == requests_before_reuse
+
+
+@patch("services.city_service.CityService.find_cities_async", new_callable=AsyncMock)
+def test_batch_query_rejects_unknown_cities_and_ambiguous_selection(mock_find_cities):
+    """
+    Scenario: Unknown city IDs are reported, and the cities must be selected in exactly one way.
+    """
+
+    # Arrange
+    mock_city = MagicMock()
+    mock_city.id = 1
+    mock_find_cities.return_value = [mock_city]
+
+    # Act
+    not_found = client.post(
+        "/v1/earthquakes/batch",
+        json={"city_ids": [1, 7], "start_date": "2021-01-01", "end_date": "2021-05-01"},
+    )
+    ambiguous = client.post(
+        "/v1/earthquakes/batch",
+        json={"city_ids": [1], "state_id": 1, "start_date": "2021-01-01", "end_date": "2021-05-01"},
+    )
+
+    # Assert
+    assert not_found.status_code == 404
+    assert not_found.json() == {"detail": "Cities not found: [7]"}
+    assert ambiguous.status_code == 422
+
+
+def test_stream_of_a_country_yields_ndjson_lines_per_chunk(
+    fake_fdsn_server, sqlite_database, monkeypatch
+):
+    """
+    Scenario: Every city of a country is streamed as one JSON line, reading the cities in chunks.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_CATALOG_SOURCE", "usgs")
+    monkeypatch.setenv("REVERSE_GEOCODE_MODE", "place")
+    monkeypatch.setenv("EARTHQUAKE_STREAM_CHUNK_SIZE", "3")
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 5.5, place="Near LA")
+    add_cities()
+
+    # Act
+    response = client.post(
+        "/v1/earthquakes/batch/stream",
+        json={"country_id": 1, "start_date": "2021-01-01", "end_date": "2021-05-01"},
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["city_id"] for line in lines] == [1, 2, 3, 4]
+    assert lines[3]["city_name"] == "Las Vegas"
+    assert lines[3]["message"].endswith("was an M 5.5 - Near LA on March 01")
+    assert len(fake_fdsn_server.requests) == 1
+
+
+def test_stream_reports_errors_as_a_last_server_sent_event(
+    fake_fdsn_server, sqlite_database, monkeypatch
+):
+    """
+    Scenario: A USGS failure after the stream started ends it with an error event.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_CATALOG_SOURCE", "usgs")
+    fake_fdsn_server.status_code = 400
+    add_cities()
+
+    # Act
+    response = client.post(
+        "/v1/earthquakes/batch/stream?format=sse",
+        json={"state_id": 2, "start_date": "2021-01-01", "end_date": "2021-05-01"},
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == 'event: error\ndata: {"error": "Failed to retrieve earthquake data."}\n\n'
+
+
+def test_nearby_top_k_and_radius_queries_return_ranked_earthquakes(
+    fake_fdsn_server, sqlite_database, monkeypatch
+):
+    """
+    Scenario: Top-k and radius queries return structured earthquakes ranked by distance, at the requested magnitude.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_CATALOG_SOURCE", "usgs")
+    fake_fdsn_server.add_event("us1", "2021-03-01T10:00:00", 34.0, -118.0, 4.5, place="Near LA")
+    fake_fdsn_server.add_event("us2", "2021-04-01T10:00:00", 38.0, -122.5, 6.1, place="Near SF")
+    fake_fdsn_server.add_event("us3", "2021-04-02T10:00:00", 35.0, 139.0, 7.0, place="Japan")
+    add_cities()
+    url = "/v1/earthquakes/1/nearby?start_date=2021-01-01&end_date=2021-05-01"
+
+    # Act
+    top_k = client.post(url + "&k=2&min_magnitude=4")
+    radius = client.post(url + "&mode=radius&radius_km=1000")
+    missing_radius = client.post(url + "&mode=radius")
+
+    # Assert
+    assert top_k.status_code == 200
+    body = top_k.json()
+    assert body["mode"] == "top_k"
+    assert body["min_magnitude"] == 4
+    assert [earthquake["id"] for earthquake in body["earthquakes"]] == ["us1", "us2"]
+    assert body["earthquakes"][0]["distance_km"] < body["earthquakes"][1]["distance_km"]
+    assert body["earthquakes"][0]["place"] == "Near LA"
+    assert top_k.headers["X-Cache"] == "MISS"
+    assert radius.status_code == 200
+    assert [earthquake["id"] for earthquake in radius.json()["earthquakes"]] == ["us2"]
+    assert [
+        (request["minmagnitude"], request["maxradiuskm"]) for request in fake_fdsn_server.requests
+    ] == [("4.0", "250.0"), ("4.0", "1000.0"), ("5", "1006.0")]
+    assert missing_radius.status_code == 400
+
+
+def test_nearby_queries_of_an_unknown_city_return_404(fake_fdsn_server, sqlite_database):
+    """
+    Scenario: Top-k and radius queries of a city that does not exist are rejected as not found.
+    """
+
+    # Arrange
+    add_cities()
+    url = "/v1/earthquakes/999/nearby?start_date=2021-01-01&end_date=2021-05-01"
+
+    # Act
+    top_k = client.post(url + "&k=2")
+    radius = client.post(url + "&mode=radius&radius_km=1000")
+
+    # Assert
+    assert top_k.status_code == 404
+    assert top_k.json() == {"detail": "City not found"}
+    assert radius.status_code == 404
+    assert radius.json() == {"detail": "City not found"}
+    assert fake_fdsn_server.requests == []
@@ -0,0 +1,71 @@
+import numpy as np
+
+from helper.earthquake_catalog import EarthquakeCatalog
+from helper.event_store import EventStore
+
+
+def unsorted_catalog() -> EarthquakeCatalog:
+    return EarthquakeCatalog(
+        ids=["us3", "us1", "us2", "us4"],
+        times=[3000, 1000, 2000, 4000],
+        latitudes=[3.0, 1.0, 2.0, 4.0],
+        longitudes=[-3.0, -1.0, -2.0, -4.0],
+        depths=[30.0, np.nan, 20.0, 40.0],
+        magnitudes=[5.5, 6.0, np.nan, 7.5],
+        places=["Región 3", "Place 1", "", "Place 4"],
+    )
+
+
+def test_slice_finds_time_range_by_binary_search():
+    """
+    Scenario: Events are sorted by time, and a range slice includes both bounds and shares the columns.
+    """
+
+    # Arrange
+    store = EventStore.from_catalog(unsorted_catalog())
+
+    # Act
+    sliced = store.slice(2000, 3000)
+    strong = store.slice(min_magnitude=6)
+
+    # Assert
+    assert list(store.catalog.ids) == ["us1", "us2", "us3", "us4"]
+    assert store.bounds(2000, 3000) == (1, 3)
+    assert store.bounds(5000, 6000) == (4, 4)
+    assert sliced.ids == ["us2", "us3"]
+    assert sliced.places == ["", "Región 3"]
+    assert np.shares_memory(sliced.latitudes, store.catalog.latitudes)
+    assert strong.ids == ["us1", "us4"]
+
+
+def test_snapshot_is_memory_mapped_back(tmp_path):
+    """
+    Scenario: A saved snapshot loads back memory-mapped with the same events and cursors.
+    """
+
+    # Arrange
+    path = str(tmp_path / "events.snapshot")
+    empty_path = str(tmp_path / "empty.snapshot")
+    EventStore.from_catalog(unsorted_catalog(), cursor=4000, sync_cursor=5000).save(path)
+    EventStore.empty().save(empty_path)
+
+    # Act
+    store = EventStore.load(path)
+    empty = EventStore.load(empty_path)
+
+    # Assert
+    assert store.mapped
+    assert (store.cursor, store.sync_cursor) == (4000, 5000)
+    assert isinstance(store.catalog.times.base, np.memmap)
+    assert store.catalog.times.tolist() == [1000, 2000, 3000, 4000]
+    assert np.array_equal(store.catalog.depths, [np.nan, 20.0, 30.0, 40.0], equal_nan=True)
+    assert store.catalog.event(2) == {
+        "id": "us3",
+        "time": 3000,
+        "latitude": 3.0,
+        "longitude": -3.0,
+        "depth": 30.0,
+        "magnitude": 5.5,
+        "place": "Región 3",
+    }
+    assert len(empty) == 0
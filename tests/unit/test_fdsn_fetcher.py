@@ -0,0 +1,153 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from helper.fdsn_fetcher import FdsnFetcher, FdsnResponseError
+from helper.http_client import get_http_client
+from services.earthquake_catalog_service import CATALOG_SOURCE, date_to_timestamp_ms
+
+
+def make_fetcher(server, **kwargs):
+    return FdsnFetcher(get_http_client(CATALOG_SOURCE), server.url, **kwargs)
+
+
+def add_daily_events(server, days):
+    for day in range(1, days + 1):
+        server.add_event(f"us{day}", f"2021-03-{day:02d}T00:00:00", 34.0, -118.0, 5.5)
+
+
+def test_saturated_windows_are_split_until_every_event_is_fetched(fake_fdsn_server):
+    """
+    Scenario: A window hitting the event limit is halved, and boundary events are kept once.
+    """
+
+    # Arrange
+    add_daily_events(fake_fdsn_server, 20)
+    fetcher = make_fetcher(fake_fdsn_server, window_days=365, max_events=4)
+
+    # Act
+    catalog = fetcher.fetch(
+        date_to_timestamp_ms("2021-03-01"), date_to_timestamp_ms("2021-03-21"), {"format": "geojson"}
+    )
+
+    # Assert
+    assert sorted(catalog.ids) == sorted(f"us{day}" for day in range(1, 21))
+    assert len(fake_fdsn_server.requests) > 1
+    assert all(request["limit"] == "4" for request in fake_fdsn_server.requests)
+
+
+def test_async_fetch_runs_windows_concurrently_and_merges_them(fake_fdsn_server):
+    """
+    Scenario: The async fetch splits the range into windows and returns the same events as the sync fetch.
+    """
+
+    # Arrange
+    add_daily_events(fake_fdsn_server, 20)
+    fetcher = make_fetcher(fake_fdsn_server, window_days=2, max_events=100, concurrency=3)
+    start_ms, end_ms = date_to_timestamp_ms("2021-03-01"), date_to_timestamp_ms("2021-03-21")
+
+    async def run():
+        try:
+            return await fetcher.fetch_async(start_ms, end_ms, {"format": "geojson"})
+        finally:
+            await get_http_client(CATALOG_SOURCE).aclose()
+
+    # Act
+    catalog = asyncio.run(run())
+
+    # Assert
+    assert sorted(catalog.ids) == sorted(f"us{day}" for day in range(1, 21))
+    assert len(fake_fdsn_server.requests) == len(fetcher.windows(start_ms, end_ms)) == 10
+
+
+def test_error_status_of_a_window_is_raised(fake_fdsn_server):
+    """
+    Scenario: A window answered with an error status fails the whole fetch.
+    """
+
+    # Arrange
+    fake_fdsn_server.status_code = 400
+    fetcher = make_fetcher(fake_fdsn_server, window_days=1)
+
+    # Act
+    with pytest.raises(FdsnResponseError) as exc_info:
+        fetcher.fetch(
+            date_to_timestamp_ms("2021-03-01"), date_to_timestamp_ms("2021-03-05"), {"format": "geojson"}
+        )
+
+    # Assert
+    assert exc_info.value.status_code == 400
+
+
+def test_ring_search_widens_until_the_nearest_events_are_conclusive(fake_fdsn_server, monkeypatch):
+    """
+    Scenario: Rings around a point widen until they hold k events nearer than anything outside them.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_RING_START_KM", "100")
+    monkeypatch.setenv("EARTHQUAKE_RING_FACTOR", "10")
+    fake_fdsn_server.add_event("near", "2021-03-01T00:00:00", 34.5, -118.0, 5.0)
+    fake_fdsn_server.add_event("far", "2021-03-02T00:00:00", 40.0, -118.0, 5.0)
+    fake_fdsn_server.add_event("farther", "2021-03-03T00:00:00", 35.0, 139.0, 5.0)
+    fetcher = make_fetcher(fake_fdsn_server)
+    start_ms, end_ms = date_to_timestamp_ms("2021-03-01"), date_to_timestamp_ms("2021-03-21")
+
+    # Act
+    catalog, matches = fetcher.fetch_nearest(34.0, -118.0, 2, start_ms, end_ms, {"format": "geojson"})
+
+    # Assert
+    assert [catalog.ids[index] for index, _ in matches] == ["near", "far"]
+    assert "farther" not in catalog.ids
+    assert [request["maxradiuskm"] for request in fake_fdsn_server.requests] == ["100.0", "1000.0"]
+
+
+def test_last_ring_queries_without_radius(fake_fdsn_server, monkeypatch):
+    """
+    Scenario: When no ring holds enough events, the last query has no radius and is always conclusive.
+    """
+
+    # Arrange
+    monkeypatch.setenv("EARTHQUAKE_RING_START_KM", "5000")
+    monkeypatch.setenv("EARTHQUAKE_RING_FACTOR", "2")
+    fake_fdsn_server.add_event("near", "2021-03-01T00:00:00", 34.5, -118.0, 5.0)
+    fetcher = make_fetcher(fake_fdsn_server)
+    start_ms, end_ms = date_to_timestamp_ms("2021-03-01"), date_to_timestamp_ms("2021-03-21")
+
+    async def run():
+        try:
+            return await fetcher.fetch_nearest_async(34.0, -118.0, 2, start_ms, end_ms, {"format": "geojson"})
+        finally:
+            await get_http_client(CATALOG_SOURCE).aclose()
+
+    # Act
+    catalog, matches = asyncio.run(run())
+
+    # Assert
+    assert fetcher.ring_radii() == [5000.0, 10000.0, 20000.0, None]
+    assert [catalog.ids[index] for index, _ in matches] == ["near"]
+    assert [request.get("maxradiuskm") for request in fake_fdsn_server.requests] == ["5000.0", "10000.0", "20000.0", None]
+
+
+def test_text_and_geojson_responses_give_the_same_catalog(fake_fdsn_server):
+    """
+    Scenario: Windows fetched as FDSN text are parsed into the same columns as GeoJSON windows.
+    """
+
+    # Arrange
+    add_daily_events(fake_fdsn_server, 5)
+    fake_fdsn_server.add_event("us9", "2021-03-02T12:30:00.250", 35.5, -117.25, None, depth=None, place="A|B, CA")
+    start_ms, end_ms = date_to_timestamp_ms("2021-03-01"), date_to_timestamp_ms("2021-03-21")
+
+    # Act
+    text = make_fetcher(fake_fdsn_server, response_format="text").fetch(start_ms, end_ms, {"format": "geojson"})
+    geojson = make_fetcher(fake_fdsn_server, response_format="geojson").fetch(start_ms, end_ms, {})
+
+    # Assert
+    assert [request["format"] for request in fake_fdsn_server.requests] == ["text", "geojson"]
+    assert text.ids == geojson.ids
+    assert text.places == geojson.places
+    assert text.times.tolist() == geojson.times.tolist()
+    for column in ("latitudes", "longitudes", "depths", "magnitudes"):
+        assert np.array_equal(getattr(text, column), getattr(geojson, column), equal_nan=True)
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+
+from helper.gazetteer import Gazetteer, GazetteerGeocoder
+from services.geocoding_service import GeocodingService, create_geolocator
+
+GEONAMES_ROWS = [
+    # geonameid, name, asciiname, latitude, longitude, country, admin1, population
+    ("1", "Los Angeles", "Los Angeles", 34.05223, -118.24368, "US", "CA", 3971883),
+    ("2", "Springfield", "Springfield", 39.80172, -89.64371, "US", "IL", 116565),
+    ("3", "Springfield", "Springfield", 37.21533, -93.29824, "US", "MO", 166810),
+    ("4", "São Paulo", "Sao Paulo", -23.5475, -46.63611, "BR", "27", 10021295),
+    ("5", "Tromsø", "Tromso", 69.6489, 18.95508, "NO", "18", 52436),
+]
+
+
+def write_geonames(path):
+    with open(path, "w", encoding="utf-8") as file:
+        for geonameid, name, ascii_name, latitude, longitude, country, admin1, population in GEONAMES_ROWS:
+            columns = [geonameid, name, ascii_name, "", str(latitude), str(longitude), "P", "PPL", country, "", admin1]
+            columns += ["", "", "", str(population), "", "", "America/Los_Angeles", "2024-01-01"]
+            file.write("\t".join(columns) + "\n")
+
+
+def test_gazetteer_geocodes_names_and_nearest_places(tmp_path):
+    """
+    Scenario: Names resolve through the hash index (accents, ASCII spellings and qualifiers included) and points to their nearest place.
+    """
+
+    # Arrange
+    path = tmp_path / "cities.txt"
+    write_geonames(path)
+    geocoder = GazetteerGeocoder(Gazetteer.from_geonames(str(path)), max_reverse_km=50)
+
+    # Act
+    los_angeles = geocoder.geocode("los angeles")
+    springfield = geocoder.geocode("Springfield")
+    springfield_illinois = geocoder.geocode("Springfield, IL")
+    sao_paulo = geocoder.geocode("sao paulo")
+    tromso = geocoder.geocode("Tromso")
+    near_los_angeles = geocoder.reverse((34.1, -118.3))
+    offshore = geocoder.reverse((30.0, -130.0))
+
+    # Assert
+    assert (los_angeles.latitude, los_angeles.longitude) == (34.05223, -118.24368)
+    assert springfield.address == "Springfield, MO, US"
+    assert springfield_illinois.address == "Springfield, IL, US"
+    assert sao_paulo.address == "São Paulo, 27, BR"
+    assert tromso.address == "Tromsø, 18, NO"
+    assert geocoder.geocode("Atlantis") is None
+    assert near_los_angeles.address == "Los Angeles, CA, US"
+    assert offshore is None
+
+
+def test_offline_geocoding_is_sub_millisecond(monkeypatch, tmp_path):
+    """
+    Scenario: With GEOCODER=gazetteer, cache misses of the geocoding service are answered in-process in under a millisecond.
+    """
+
+    # Arrange
+    rng = np.random.default_rng(1)
+    count = 50_000
+    path = tmp_path / "synthetic.txt"
+    with open(path, "w", encoding="utf-8") as file:
+        latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+        longitudes = rng.uniform(-180, 180, count)
+        for position in range(count):
+            columns = [str(position), f"Place {position}", f"Place {position}", "", f"{latitudes[position]:.5f}"]
+            columns += [f"{longitudes[position]:.5f}", "P", "PPL", "XX", "", "01", "", "", "", "100"]
+            file.write("\t".join(columns) + "\n")
+    monkeypatch.setenv("GEOCODER", "gazetteer")
+    monkeypatch.setenv("GAZETTEER_PATH", str(path))
+    geocoding_service = GeocodingService(create_geolocator())
+    names = [f"Place {position}" for position in rng.integers(0, count, 200)]
+    points = list(zip(rng.uniform(-60, 60, 200), rng.uniform(-180, 180, 200)))
+
+    # Act
+    start = time.perf_counter()
+    coordinates = [geocoding_service.geocode(name) for name in names]
+    geocode_ms = (time.perf_counter() - start) * 1000 / len(names)
+    start = time.perf_counter()
+    addresses = [geocoding_service.reverse(latitude, longitude) for latitude, longitude in points]
+    reverse_ms = (time.perf_counter() - start) * 1000 / len(points)
+
+    # Assert
+    assert geocoding_service.offline
+    assert all(coordinates)
+    assert any(address.startswith("Place ") for address in addresses)
+    assert geocode_ms < 1
+    assert reverse_ms < 1
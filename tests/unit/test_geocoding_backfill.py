@@ -0,0 +1,118 @@
+import threading
+from types import SimpleNamespace
+
+from geopy.exc import GeocoderUnavailable
+from sqlalchemy import select
+
+from helper.database import session_scope
+from helper.metrics import collect_metrics
+from helper.rate_limiter import TokenBucket
+from models.db.city_model import City
+from services.geocoding_backfill_service import GeocodingBackfillService
+from services.geocoding_service import GeocodingService
+
+
+class FakeGeocoder:
+    """Local geocoder placing every city on the equator, failing once for the names in `flaky`."""
+
+    def __init__(self, unknown=(), flaky=()):
+        self.unknown = set(unknown)
+        self.flaky = set(flaky)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def geocode(self, name):
+        with self._lock:
+            self.calls.append(name)
+            if name in self.flaky:
+                self.flaky.discard(name)
+                raise GeocoderUnavailable("Service unavailable")
+        if name in self.unknown:
+            return None
+        return SimpleNamespace(latitude=0.0, longitude=float(name.split()[-1]))
+
+
+def seed_cities(count):
+    with session_scope() as db:
+        db.add_all(City(id=city_id, name=f"City {city_id}", state_province_id=1) for city_id in range(1, count + 1))
+        db.add(City(id=count + 1, name="Stored", state_province_id=1, latitude=1.0, longitude=1.0))
+        db.commit()
+
+
+def stored_longitudes():
+    with session_scope() as db:
+        return dict(db.execute(select(City.id, City.longitude).order_by(City.id)).all())
+
+
+def test_backfill_geocodes_missing_cities_and_resumes_from_checkpoint(sqlite_database, tmp_path):
+    """
+    Scenario: Missing coordinates are geocoded in batches with retries, and a second run resumes after the checkpoint.
+    """
+
+    # Arrange
+    seed_cities(7)
+    geocoder = FakeGeocoder(unknown={"City 3"}, flaky={"City 2"})
+    checkpoint = str(tmp_path / "backfill.json")
+
+    def backfill_service():
+        return GeocodingBackfillService(
+            GeocodingService(geocoder), rate=1000, concurrency=3, batch_size=2, retry_delay=0, checkpoint_path=checkpoint
+        )
+
+    # Act
+    first = backfill_service().run(max_cities=4)
+    second = backfill_service().run()
+
+    # Assert
+    assert (first["processed"], first["geocoded"], first["not_found"], first["retries"]) == (4, 3, 1, 1)
+    assert first["last_city_id"] == 4
+    assert (second["total"], second["processed"], second["geocoded"]) == (3, 3, 3)
+    assert sorted(geocoder.calls) == sorted(["City 1", "City 2", "City 2", "City 3", "City 4", "City 5", "City 6", "City 7"])
+    assert stored_longitudes() == {1: 1.0, 2: 2.0, 3: None, 4: 4.0, 5: 5.0, 6: 6.0, 7: 7.0, 8: 1.0}
+    assert collect_metrics()["geocoding_backfill"]["last_city_id"] == 7
+
+
+def test_cities_failing_every_retry_are_retried_by_the_next_run(sqlite_database, tmp_path):
+    """
+    Scenario: A city whose retries are exhausted is recorded in the checkpoint and geocoded first by the next run.
+    """
+
+    # Arrange
+    seed_cities(4)
+    geocoder = FakeGeocoder(flaky={"City 2"})
+    checkpoint = str(tmp_path / "backfill.json")
+
+    def backfill_service():
+        return GeocodingBackfillService(
+            GeocodingService(geocoder), rate=1000, batch_size=2, max_retries=0, retry_delay=0, checkpoint_path=checkpoint
+        )
+
+    # Act
+    first = backfill_service().run()
+    failed_after_first = backfill_service().load_checkpoint()
+    second = backfill_service().run()
+
+    # Assert
+    assert (first["processed"], first["geocoded"], first["failed"]) == (4, 3, 1)
+    assert failed_after_first == (4, {2})
+    assert (second["total"], second["processed"], second["geocoded"]) == (1, 1, 1)
+    assert backfill_service().load_checkpoint() == (4, set())
+    assert stored_longitudes()[2] == 2.0
+
+
+def test_token_bucket_spaces_calls_at_its_rate():
+    """
+    Scenario: A bucket of 4 tokens per second lets a burst of its capacity through, then one call every 0.25 s.
+    """
+
+    # Arrange
+    now = [0.0]
+    bucket = TokenBucket(rate=4, capacity=2, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+
+    # Act
+    waits = [bucket.acquire() for _ in range(6)]
+
+    # Assert
+    assert waits[:2] == [0.0, 0.0]
+    assert all(abs(wait - 0.25) < 1e-9 for wait in waits[2:])
+    assert abs(now[0] - 1.0) < 1e-9
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from sqlalchemy import event
+
+from helper.database import session_scope
+from models.db.reverse_geocode_model import ReverseGeocode
+from services.geocoding_service import UNKNOWN_LOCATION, GeocodingService
+
+
+def make_service():
+    geolocator = MagicMock()
+    geolocator.reverse.return_value = MagicMock(address="Los Angeles, California")
+    return GeocodingService(geolocator)
+
+
+def test_reverse_uses_memory_cache(sqlite_database):
+    """
+    Scenario: A second lookup of the same coordinates does not call the geocoder.
+    """
+
+    # Arrange
+    service = make_service()
+
+    # Act
+    first = service.reverse(34.05, -118.24)
+    second = service.reverse(34.0501, -118.2401)
+
+    # Assert
+    assert first == second == "Los Angeles, California"
+    service.geolocator.reverse.assert_called_once()
+
+
+def test_reverse_falls_back_to_database_cache(sqlite_database):
+    """
+    Scenario: After a restart the address is read from the database instead of the geocoder.
+    """
+
+    # Arrange
+    make_service().reverse(34.05, -118.24, event_id="us1")
+    GeocodingService.reverse_cache.clear()
+    service = make_service()
+
+    # Act
+    address = service.reverse(10.0, 10.0, event_id="us1")
+
+    # Assert
+    assert address == "Los Angeles, California"
+    service.geolocator.reverse.assert_not_called()
+
+
+def test_reverse_place_mode_skips_geocoder_and_database(sqlite_database, monkeypatch):
+    """
+    Scenario: In place mode a cache miss returns the USGS place description without any database round trip.
+    """
+
+    # Arrange
+    monkeypatch.setenv("REVERSE_GEOCODE_MODE", "place")
+    service = make_service()
+    statements = []
+    event.listen(sqlite_database, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    run = MagicMock()
+
+    # Act
+    with_place = service.reverse(34.05, -118.24, event_id="us1", place="5 km N of Los Angeles")
+    without_place = service.reverse(0.0, 0.0)
+    with_run = asyncio.run(service.reverse_async(1.0, 1.0, place="10 km S of Tokyo", run=run))
+
+    # Assert
+    assert with_place == "5 km N of Los Angeles"
+    assert without_place == UNKNOWN_LOCATION
+    assert with_run == "10 km S of Tokyo"
+    assert statements == []
+    run.assert_not_called()
+    service.geolocator.reverse.assert_not_called()
+
+
+def test_prune_reverse_cache_deletes_expired_and_oldest_rows(sqlite_database, monkeypatch):
+    """
+    Scenario: Pruning drops expired rows and keeps the table under its size limit.
+    """
+
+    # Arrange
+    monkeypatch.setenv("REVERSE_GEOCODE_CACHE_MAX_ROWS", "2")
+    service = make_service()
+    now = datetime.utcnow()
+    with session_scope() as db:
+        db.add(ReverseGeocode(key="expired", address="a", created_at=now - timedelta(days=365)))
+        for minutes, key in enumerate(["old", "newer", "newest"]):
+            db.add(ReverseGeocode(key=key, address="a", created_at=now + timedelta(minutes=minutes)))
+        db.commit()
+
+    # Act
+    deleted = service.prune_reverse_cache()
+
+    # Assert
+    assert deleted == 2
+    with session_scope() as db:
+        assert {row.key for row in db.query(ReverseGeocode).all()} == {"newer", "newest"}
@@ -0,0 +1,179 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+import requests
+from fastapi import HTTPException
+
+from helper.http_client import CircuitBreaker, CircuitOpenError, HttpClient
+from services.earthquake_service import EarthquakeService
+
+
+def make_response(status_code, headers=None):
+    response = MagicMock(status_code=status_code)
+    response.headers = headers or {}
+    return response
+
+
+def make_client(responses, **kwargs):
+    sleeps = []
+    client = HttpClient("test", backoff=0.5, backoff_max=10, sleep=sleeps.append, **kwargs)
+    client._session = MagicMock()
+    client._session.get.side_effect = responses
+    return client, sleeps
+
+
+def test_get_retries_server_errors_with_backoff():
+    """
+    Scenario: A 503 response is retried after a jittered backoff and the next success is returned.
+    """
+
+    # Arrange
+    client, sleeps = make_client([make_response(503), make_response(200)])
+
+    # Act
+    response = client.get("http://usgs.test")
+
+    # Assert
+    assert response.status_code == 200
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 0.5
+    stats = client.statistics()
+    assert stats["requests"] == 1
+    assert stats["retries"] == 1
+    assert stats["failures"] == 0
+
+
+def test_get_honours_retry_after_and_stops_after_max_retries():
+    """
+    Scenario: 429 responses wait for Retry-After and the last response is returned when retries run out.
+    """
+
+    # Arrange
+    client, sleeps = make_client(
+        [make_response(429, {"Retry-After": "2"})] * 3, retries=2
+    )
+
+    # Act
+    response = client.get("http://usgs.test")
+
+    # Assert
+    assert response.status_code == 429
+    assert sleeps == [2.0, 2.0]
+    assert client.statistics()["failures"] == 1
+
+
+def test_breaker_opens_and_recovers_after_reset_timeout():
+    """
+    Scenario: Consecutive failures open the breaker, and a successful trial call closes it.
+    """
+
+    # Arrange
+    now = [0.0]
+    client, _ = make_client(
+        [requests.ConnectionError(), requests.ConnectionError(), make_response(200)],
+        retries=0,
+    )
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, timer=lambda: now[0])
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.get("http://usgs.test")
+
+    # Act
+    with pytest.raises(CircuitOpenError):
+        client.get("http://usgs.test")
+    now[0] = 31.0
+    response = client.get("http://usgs.test")
+
+    # Assert
+    assert response.status_code == 200
+    stats = client.statistics()
+    assert stats["breaker_state"] == CircuitBreaker.CLOSED
+    assert stats["breaker_open_count"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_get_async_retries_transport_errors():
+    """
+    Scenario: The async client retries a connection error over the shared connection pool.
+    """
+
+    # Arrange
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(200, json={"features": []})
+
+    client = HttpClient("test", backoff=0.0)
+
+    async def run():
+        client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await client.get_async("http://usgs.test", params={"format": "geojson"})
+        finally:
+            await client.aclose()
+
+    # Act
+    response = asyncio.run(run())
+
+    # Assert
+    assert response.json() == {"features": []}
+    assert len(calls) == 2
+    assert client.statistics()["retries"] == 1
+
+
+def test_each_event_loop_keeps_its_own_async_client():
+    """
+    Scenario: Using the client from a second event loop neither replaces nor leaks the client of the first.
+    """
+
+    # Arrange
+    client = HttpClient("test")
+    first_loop = asyncio.new_event_loop()
+
+    async def get_client():
+        return client.get_async_client()
+
+    async def get_and_close_client():
+        async_client = client.get_async_client()
+        await client.aclose()
+        return async_client
+
+    # Act
+    try:
+        first = first_loop.run_until_complete(get_client())
+        second = asyncio.run(get_and_close_client())
+        first_again = first_loop.run_until_complete(get_client())
+        first_loop.run_until_complete(client.aclose())
+    finally:
+        first_loop.close()
+
+    # Assert
+    assert first is first_again
+    assert second is not first
+    assert second.is_closed
+    assert first.is_closed
+    assert len(client._async_clients) == 0
+
+
+def test_open_breaker_is_reported_as_service_unavailable(monkeypatch):
+    """
+    Scenario: While the USGS breaker is open earthquake queries fail fast with 503.
+    """
+
+    # Arrange
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+    monkeypatch.setattr(EarthquakeService.http_client, "breaker", breaker)
+
+    # Act
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(EarthquakeService().fetch_earthquake_catalog_async("2021-01-01", "2021-01-02"))
+
+    # Assert
+    assert exc_info.value.status_code == 503
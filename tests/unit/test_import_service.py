@@ -0,0 +1,78 @@
+import io
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from helper.database import session_scope
+from main import app
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.state_model import State
+from services.import_service import ImportService
+
+client = TestClient(app)
+
+GAZETTEER_CSV = """country,state,state_abbreviation,city,latitude,longitude
+USA,California,CA,Los Angeles,34.05,-118.24
+USA,California,CA,San Francisco,37.77,-122.42
+USA,Nevada,NV,Reno,,
+Japan,Tokyo,TK,Tokyo,35.68,139.69
+USA,California,CA,Los Angeles,34.05,-118.24
+,California,CA,Nowhere,1,1
+Japan,,,Osaka,34.69,135.50
+Japan,Kyoto,KY,Kyoto,95,135.76
+Portugal,,,,,
+"""
+
+
+def test_import_creates_hierarchy_in_batches_and_reports_rejected_rows(sqlite_database):
+    """
+    Scenario: A CSV gazetteer creates its countries, states and cities across batches, reusing existing rows and rejecting invalid ones.
+    """
+
+    # Arrange
+    with session_scope() as db:
+        db.add(Country(id=1, name="USA"))
+        db.commit()
+
+    # Act
+    summary = ImportService(batch_size=3).import_file(io.StringIO(GAZETTEER_CSV), "csv")
+
+    # Assert
+    assert (summary.rows, summary.countries, summary.states, summary.cities) == (9, 2, 4, 4)
+    assert [(error.row, error.error.split(":")[0]) for error in summary.errors] == [
+        (5, "Already exists city with name"),
+        (6, "name"),
+        (7, "A city needs the name of its state."),
+        (8, "latitude"),
+    ]
+    assert summary.failed == 4
+    with session_scope() as db:
+        states = dict(db.execute(select(State.name, State.country_id)).all())
+        cities = dict(db.execute(select(City.name, City.latitude)).all())
+        countries = set(db.scalars(select(Country.name)))
+    assert countries == {"USA", "Japan", "Portugal"}
+    assert states["California"] == 1 and states["Nevada"] == 1
+    assert cities == {"Los Angeles": 34.05, "San Francisco": 37.77, "Reno": None, "Tokyo": 35.68}
+
+
+def test_import_endpoint_streams_json_lines(sqlite_database):
+    """
+    Scenario: The import endpoint reads JSON Lines from the request body and rejects unsupported content types.
+    """
+
+    # Arrange
+    body = (
+        '{"country": "Chile", "state": "Santiago", "state_abbreviation": "SA", "city": "Santiago"}\n'
+        "not json\n"
+    )
+
+    # Act
+    response = client.post("/v1/import/", content=body, headers={"Content-Type": "application/x-ndjson"})
+    unsupported = client.post("/v1/import/", content=body, headers={"Content-Type": "text/plain"})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["cities"] == 1
+    assert response.json()["errors"] == [{"row": 2, "error": "The row is not a JSON object."}]
+    assert unsupported.status_code == 415
@@ -0,0 +1,115 @@
+import json
+import logging
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from utils import logger as logger_module
+from utils.logger import Logger, configure_logging, request_id, shutdown_logging
+
+
+@pytest.fixture
+def configured_logging(monkeypatch):
+    """Reconfigures logging for the test from its environment, and back from the default one afterwards."""
+    yield lambda: configure_logging(force=True)
+    shutdown_logging()
+    monkeypatch.undo()
+    configure_logging(force=True)
+
+
+def logged_records(capsys) -> list:
+    shutdown_logging()
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_json_output_carries_request_id_and_skips_disabled_levels(monkeypatch, capsys, configured_logging):
+    """
+    Scenario: With JSON output, records are formatted lazily with the request id, and disabled levels are dropped.
+    """
+
+    # Arrange
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    configured_logging()
+    logger = Logger(name="test_logger")
+    token = request_id.set("abc123")
+
+    # Act
+    logger.info("Fetched %s events from %s.", 3, "USGS")
+    logger.debug("Not written %s", object())
+    request_id.reset(token)
+    records = logged_records(capsys)
+
+    # Assert
+    assert len(records) == 1
+    assert records[0]["message"] == "Fetched 3 events from USGS."
+    assert records[0]["logger"] == "test_logger"
+    assert records[0]["level"] == "INFO"
+    assert records[0]["request_id"] == "abc123"
+
+
+def test_sampling_keeps_one_record_in_n_below_warning(monkeypatch, capsys, configured_logging):
+    """
+    Scenario: A sampled logger writes one info record in four, and every warning.
+    """
+
+    # Arrange
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_SAMPLING", "sampled_logger=0.25")
+    configured_logging()
+    logger = Logger(name="sampled_logger")
+
+    # Act
+    for number in range(8):
+        logger.info("Hot path %s", number)
+    logger.warning("Always written")
+    records = logged_records(capsys)
+
+    # Assert
+    assert [record["message"] for record in records] == ["Hot path 0", "Hot path 4", "Always written"]
+
+
+def test_logging_does_not_block_on_slow_handlers(configured_logging):
+    """
+    Scenario: The logging thread only enqueues records; a slow handler runs in the listener thread.
+    """
+
+    # Arrange
+    configured_logging()
+
+    class SlowHandler(logging.Handler):
+        def emit(self, record):
+            time.sleep(0.05)
+
+    root_queue = logging.getLogger().handlers[0].queue
+    listener = next(listener for listener in logger_module._listeners if listener.queue is root_queue)
+    listener.handlers = listener.handlers + (SlowHandler(),)
+    logger = Logger(name="slow_logger")
+
+    # Act
+    start = time.perf_counter()
+    for number in range(10):
+        logger.info("Record %s", number)
+    elapsed = time.perf_counter() - start
+
+    # Assert
+    assert elapsed < 0.25
+
+
+def test_request_id_is_returned_in_response_headers():
+    """
+    Scenario: The request id sent by the client is echoed, and one is generated when missing.
+    """
+
+    # Arrange
+    client = TestClient(app)
+
+    # Act
+    given = client.get("/v1/metrics", headers={"X-Request-ID": "req-42"})
+    generated = client.get("/v1/metrics")
+
+    # Assert
+    assert given.headers["x-request-id"] == "req-42"
+    assert len(generated.headers["x-request-id"]) == 32
@@ -1,6 +1,13 @@
+from datetime import datetime, timezone
+
 from fastapi.testclient import TestClient
 
-from main import app
+from helper.database import session_scope
+from main import app, preload_worker
+from models.db.earthquake_event_model import EarthquakeEvent
+from models.db.reverse_geocode_model import ReverseGeocode
+from services.earthquake_catalog_service import EarthquakeCatalogService
+from services.geocoding_service import GeocodingService
 
 client = TestClient(app)
 
@@ -14,9 +21,52 @@ def test_app_includes_all_routers():
         "/v1/cities/",
         "/v1/countries/",
         "/v1/states/",
+        "/v1/metrics",
     ]
     actual_routes = [route.path for route in app.routes]
     for route in expected_routes:
         assert (
             route in actual_routes
         ), f"Route {route} not found in the registered routes."
+
+
+def test_metrics_endpoint_reports_database_pools():
+    """
+    Test that the metrics endpoint exposes the database pool statistics.
+    """
+    response = client.get("/v1/metrics")
+
+    assert response.status_code == 200
+    assert "database_pools" in response.json()
+
+
+def test_preload_worker_builds_index_and_fills_reverse_cache(sqlite_database):
+    """
+    Test that a worker preloads the local catalog index and the reverse geocoding cache at startup.
+    """
+    with session_scope() as db:
+        db.add(
+            EarthquakeEvent(
+                id="us1",
+                time=1614592800000,
+                latitude=34.0,
+                longitude=-118.0,
+                depth=10.0,
+                magnitude=5.5,
+                place="Near LA",
+                updated=1614592800000,
+            )
+        )
+        db.add(
+            ReverseGeocode(
+                key="event:us1",
+                address="Los Angeles, California",
+                created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            )
+        )
+        db.commit()
+
+    preload_worker()
+
+    assert len(EarthquakeCatalogService._index) == 1
+    assert GeocodingService.reverse_cache.get("event:us1") == "Los Angeles, California"
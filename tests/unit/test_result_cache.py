@@ -0,0 +1,220 @@
+import asyncio
+import fnmatch
+
+import pytest
+
+from helper.result_cache import (
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    ResultCache,
+    etag,
+    etag_matches,
+    invalidate_result_caches,
+)
+from services.earthquake_catalog_service import date_to_timestamp_ms
+
+
+class FakeRedis:
+    """A local stand-in for `redis.Redis` keeping string values and their expiry in a dict."""
+
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+        self.fail = False
+
+    def get(self, key):
+        if self.fail:
+            raise ConnectionError("Redis is down")
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.fail:
+            raise ConnectionError("Redis is down")
+        self.values[key] = value.encode()
+        self.expiries[key] = ex
+
+    def scan_iter(self, match="*"):
+        return [key.encode() for key in list(self.values) if fnmatch.fnmatchcase(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key.decode(), None)
+
+
+def test_concurrent_misses_are_coalesced():
+    """
+    Scenario: Concurrent identical misses share one computation.
+    """
+
+    # Arrange
+    cache = ResultCache(MemoryCacheBackend())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"message": "result"}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute, 60) for _ in range(5)))
+
+    # Act
+    results = asyncio.run(run())
+
+    # Assert
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [{"message": "result"}] * 5
+    stats = cache.statistics()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+
+
+def test_cancelled_leader_does_not_abort_coalesced_waiters():
+    """
+    Scenario: The request that started a computation goes away, and the request waiting on it still gets the result.
+    """
+
+    # Arrange
+    cache = ResultCache(MemoryCacheBackend())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"message": "result"}
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("key", compute, 60))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute, 60))
+        await asyncio.sleep(0)
+        leader.cancel()
+        waited = await waiter
+        cached = await cache.get_or_compute("key", compute, 60)
+        return leader.cancelled(), waited, cached
+
+    # Act
+    leader_cancelled, waited, cached = asyncio.run(run())
+
+    # Assert
+    assert leader_cancelled
+    assert waited == ({"message": "result"}, False)
+    assert cached == ({"message": "result"}, True)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("backend", [MemoryCacheBackend, lambda: RedisCacheBackend(FakeRedis())])
+def test_invalidation_evicts_results_overlapping_changed_events(backend):
+    """
+    Scenario: A changed event evicts the cached results whose date range contains it and keeps the others.
+    """
+
+    # Arrange
+    cache = ResultCache(backend())
+    keys = [
+        "closest:1:2021-01-01:2021-07-02:5",
+        "nearby:1:2021-03-01:2021-04-01:3:None:5.0",
+        "closest:1:2021-05-01:2021-07-02:5",
+    ]
+
+    async def compute():
+        return {"message": "result"}
+
+    async def fill():
+        for key in keys:
+            await cache.get_or_compute(key, compute, 60)
+
+    async def lookup():
+        return [(await cache.get_or_compute(key, compute, 60))[1] for key in keys]
+
+    asyncio.run(fill())
+
+    # Act
+    invalidate_result_caches(date_to_timestamp_ms("2021-03-15"), date_to_timestamp_ms("2021-03-16"))
+
+    # Assert
+    assert asyncio.run(lookup()) == [False, False, True]
+    assert cache.statistics()["invalidated"] == 2
+
+
+def test_result_computed_during_invalidation_is_not_stored():
+    """
+    Scenario: A computation that read the catalog before it changed is answered but not cached.
+    """
+
+    # Arrange
+    cache = ResultCache(MemoryCacheBackend())
+    key = "closest:1:2021-01-01:2021-07-02:5"
+
+    async def compute():
+        cache.invalidate_range(date_to_timestamp_ms("2021-03-15"), date_to_timestamp_ms("2021-03-15"))
+        return {"message": "stale"}
+
+    # Act
+    value, cached = asyncio.run(cache.get_or_compute(key, compute, 60))
+
+    # Assert
+    assert value == {"message": "stale"}
+    assert cached is False
+    assert asyncio.run(cache.backend.get(key)) is None
+
+
+def test_redis_backend_stores_json_with_ttl():
+    """
+    Scenario: The Redis backend stores results as JSON with an expiry, and later lookups hit.
+    """
+
+    # Arrange
+    redis = FakeRedis()
+    cache = ResultCache(RedisCacheBackend(redis))
+
+    async def compute():
+        return {"message": "result"}
+
+    # Act
+    first = asyncio.run(cache.get_or_compute("closest:1", compute, 300.5))
+    second = asyncio.run(cache.get_or_compute("closest:1", compute, 300.5))
+
+    # Assert
+    assert first == ({"message": "result"}, False)
+    assert second == ({"message": "result"}, True)
+    assert redis.values["earthquakes:closest:1"] == b'{"message": "result"}'
+    assert redis.expiries["earthquakes:closest:1"] == 300
+
+
+def test_unavailable_backend_is_treated_as_miss():
+    """
+    Scenario: A failing backend never fails the request.
+    """
+
+    # Arrange
+    redis = FakeRedis()
+    redis.fail = True
+    cache = ResultCache(RedisCacheBackend(redis))
+
+    async def compute():
+        return {"message": "result"}
+
+    # Act
+    value, cached = asyncio.run(cache.get_or_compute("closest:1", compute, 60))
+
+    # Assert
+    assert value == {"message": "result"}
+    assert cached is False
+    assert cache.statistics()["errors"] == 2
+
+
+def test_etag_matches_weak_and_listed_tags():
+    """
+    Scenario: If-None-Match matches strong, weak and listed ETags.
+    """
+
+    # Arrange
+    tag = etag({"message": "result"})
+
+    # Assert
+    assert etag_matches(tag, tag)
+    assert etag_matches(f'"other", W/{tag}', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches('"other"', tag)
+    assert not etag_matches(None, tag)
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from helper.database import session_scope
+from models.db.city_model import City
+from models.db.country_model import Country
+from models.db.earthquake_search_model import EarthquakeSearch
+from models.db.state_model import State
+from services.earthquake_catalog_service import EarthquakeCatalogService
+from services.earthquake_service import EarthquakeService
+from services.search_history_service import SearchHistoryService
+
+
+def record_search(
+    searched_at, is_current=True, start_date=datetime(2021, 1, 1), end_date=datetime(2021, 7, 2)
+):
+    with session_scope() as db:
+        db.add(
+            EarthquakeSearch(
+                city_id=1,
+                start_date=start_date,
+                end_date=end_date,
+                closest_earthquake_date=datetime(2021, 6, 5, 10, 0),
+                closest_earthquake_magnitude=5.25,
+                closest_earthquake_distance=120.0,
+                closest_earthquake_location="Imperial County, California",
+                searched_at=searched_at,
+                is_current=is_current,
+            )
+        )
+        db.commit()
+
+
+def add_los_angeles():
+    with session_scope() as db:
+        db.add(Country(id=1, name="United States"))
+        db.add(State(id=1, name="California", state_abbreviation="CA", country_id=1))
+        db.add(City(id=1, name="Los Angeles", state_province_id=1, latitude=34.05, longitude=-118.24))
+        db.commit()
+
+
+def test_recorded_historical_search_is_reused_without_external_calls(
+    fake_fdsn_server, sqlite_database
+):
+    """
+    Scenario: A search recorded after its range ended is answered from the table.
+    """
+
+    # Arrange
+    add_los_angeles()
+    record_search(searched_at=datetime(2022, 1, 1))
+    earthquake_service = EarthquakeService()
+    earthquake_service.catalog_source = "usgs"
+    earthquake_service.geolocator = MagicMock()
+
+    # Act
+    result = asyncio.run(
+        earthquake_service.closest_earthquake_for_city_async(1, "2021-01-01", "2021-07-02")
+    )
+
+    # Assert
+    assert result["message"].endswith(
+        "The closest earthquake to Los Angeles was an M 5.25 - Imperial County, California on June 05"
+    )
+    assert fake_fdsn_server.requests == []
+    earthquake_service.geolocator.reverse.assert_not_called()
+    with session_scope() as db:
+        assert db.query(EarthquakeSearch).count() == 1
+
+
+def test_search_recorded_before_range_ended_is_not_reused(sqlite_database):
+    """
+    Scenario: A search made while its range was still open may miss later events.
+    """
+
+    # Arrange
+    record_search(searched_at=datetime(2021, 7, 2, 12, 0))
+
+    # Act
+    search = asyncio.run(SearchHistoryService().find_reusable_async(1, "2021-01-01", "2021-07-02"))
+
+    # Assert
+    assert search is None
+
+
+def test_catalog_revision_invalidates_overlapping_searches(sqlite_database):
+    """
+    Scenario: Synchronizing a revised event inside the range invalidates the recorded search.
+    """
+
+    # Arrange
+    record_search(searched_at=datetime(2022, 1, 1))
+    revised = {
+        "id": "us1",
+        "properties": {"mag": 6.0, "place": "", "time": 1_617_271_200_000, "updated": 1_640_995_200_000},
+        "geometry": {"coordinates": [-118.0, 34.0, 10.0]},
+    }
+    invalidated_before = SearchHistoryService.statistics()["invalidated"]
+
+    # Act
+    with session_scope() as db:
+        EarthquakeCatalogService.apply_features(db, [revised])
+        db.commit()
+
+    # Assert
+    assert asyncio.run(SearchHistoryService().find_reusable_async(1, "2021-01-01", "2021-07-02")) is None
+    assert SearchHistoryService.statistics()["invalidated"] == invalidated_before + 1
+
+
+def test_scattered_revisions_only_invalidate_searches_around_them(sqlite_database):
+    """
+    Scenario: Revisions months apart leave the searches between them reusable.
+    """
+
+    # Arrange
+    record_search(datetime(2022, 1, 1), start_date=datetime(2021, 1, 1), end_date=datetime(2021, 2, 1))
+    record_search(datetime(2022, 1, 1), start_date=datetime(2021, 4, 1), end_date=datetime(2021, 5, 1))
+    record_search(datetime(2022, 1, 1), start_date=datetime(2021, 8, 1), end_date=datetime(2021, 9, 1))
+    revised = [
+        {
+            "id": event_id,
+            "properties": {"mag": 6.0, "place": "", "time": event_time, "updated": 1_640_995_200_000},
+            "geometry": {"coordinates": [-118.0, 34.0, 10.0]},
+        }
+        # 2021-01-15 and 2021-08-15.
+        for event_id, event_time in [("us1", 1_610_712_000_000), ("us2", 1_629_028_800_000)]
+    ]
+
+    # Act
+    with session_scope() as db:
+        EarthquakeCatalogService.apply_features(db, revised)
+        db.commit()
+
+    # Assert
+    with session_scope() as db:
+        searches = db.query(EarthquakeSearch).order_by(EarthquakeSearch.start_date)
+        assert [search.is_current for search in searches] == [False, True, False]
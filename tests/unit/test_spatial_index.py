@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from helper.earthquake_catalog import EarthquakeCatalog
+from helper.spatial_index import EarthquakeSpatialIndex
+
+
+def synthetic_catalog(size, seed=3, prefix="ev") -> EarthquakeCatalog:
+    rng = np.random.default_rng(seed)
+    return EarthquakeCatalog(
+        ids=[f"{prefix}{i}" for i in range(size)],
+        times=rng.integers(0, 1_000_000, size),
+        latitudes=np.degrees(np.arcsin(rng.uniform(-1, 1, size))),
+        longitudes=rng.uniform(-180, 180, size),
+        depths=rng.uniform(0, 700, size),
+        magnitudes=rng.uniform(5, 9, size),
+        places=[f"place {i}" for i in range(size)],
+    )
+
+
+def brute_force(catalog, origin, start_ms, end_ms, min_magnitude):
+    distances = {
+        catalog.ids[i]: geodesic(origin, (catalog.latitudes[i], catalog.longitudes[i])).kilometers
+        for i in range(len(catalog))
+        if start_ms <= catalog.times[i] <= end_ms and catalog.magnitudes[i] >= min_magnitude
+    }
+    return sorted(distances.items(), key=lambda item: item[1])
+
+
+@pytest.mark.parametrize("origin", [(34.05, -118.24), (-89.5, 10.0), (0.0, 179.9), (64.1, -21.9)])
+def test_nearest_matches_brute_force(origin):
+    """
+    Scenario: The indexed nearest search with filters returns the same event as a full scan.
+    """
+
+    # Arrange
+    catalog = synthetic_catalog(3000)
+    index = EarthquakeSpatialIndex(cell_degrees=10)
+    index.build(catalog)
+
+    # Act
+    position, distance = index.nearest(*origin, 200_000, 700_000, 6.5)
+
+    # Assert
+    expected_id, expected_distance = brute_force(catalog, origin, 200_000, 700_000, 6.5)[0]
+    assert index.event(position)["id"] == expected_id
+    assert distance == pytest.approx(expected_distance)
+
+
+def test_within_radius_matches_brute_force():
+    """
+    Scenario: The radius search returns every matching event inside the radius, nearest first.
+    """
+
+    # Arrange
+    catalog = synthetic_catalog(3000)
+    index = EarthquakeSpatialIndex()
+    index.build(catalog)
+    origin = (35.68, 139.69)
+
+    # Act
+    results = index.within_radius(*origin, 2500, 0, 1_000_000, 6.0)
+
+    # Assert
+    expected = [item for item in brute_force(catalog, origin, 0, 1_000_000, 6.0) if item[1] <= 2500]
+    assert [index.event(position)["id"] for position, _ in results] == [i for i, _ in expected]
+
+
+
+@pytest.mark.parametrize("origin", [(34.05, -118.24), (-89.5, 10.0), (0.0, 179.9)])
+def test_nearest_k_matches_brute_force(origin):
+    """
+    Scenario: The indexed top-k search with filters returns the same ranking as a full scan and a catalog scan.
+    """
+
+    # Arrange
+    catalog = synthetic_catalog(3000)
+    index = EarthquakeSpatialIndex(cell_degrees=10)
+    index.build(catalog)
+
+    # Act
+    results = index.nearest_k(*origin, 15, 200_000, 700_000, 6.5)
+
+    # Assert
+    expected = brute_force(catalog, origin, 200_000, 700_000, 6.5)[:15]
+    assert [index.event(position)["id"] for position, _ in results] == [i for i, _ in expected]
+    assert [distance for _, distance in results] == pytest.approx([d for _, d in expected])
+    selected = index.select(200_000, 700_000, 6.5)
+    assert [selected.ids[position] for position, _ in selected.nearest_k(*origin, 15)] == [
+        i for i, _ in expected
+    ]
+    assert index.nearest_k(*origin, 0) == []
+
+def test_incremental_upsert_and_remove():
+    """
+    Scenario: New, revised and removed events are reflected without a rebuild.
+    """
+
+    # Arrange
+    index = EarthquakeSpatialIndex()
+    index.build(synthetic_catalog(100))
+    origin = (10.0, 10.0)
+    revised = EarthquakeCatalog(["ev0"], [500], [10.1], [10.1], [5.0], [7.0], ["revised"])
+
+    # Act
+    index.upsert(revised)
+    position, _ = index.nearest(*origin)
+    nearest_after_upsert = index.event(position)
+    index.remove(["ev0"])
+    position, _ = index.nearest(*origin)
+
+    # Assert
+    assert nearest_after_upsert["place"] == "revised"
+    assert index.event(position)["id"] != "ev0"
+    assert len(index) == 99
+    assert index.stored_events == 101
+
+
+def test_nearest_on_empty_index():
+    """
+    Scenario: Querying an empty index returns no result.
+    """
+
+    # Act
+    position, distance = EarthquakeSpatialIndex().nearest(0.0, 0.0)
+
+    # Assert
+    assert position is None
+    assert distance == float("inf")
+
+
+def test_select_and_statistics():
+    """
+    Scenario: Filtered events are exported ordered by time and statistics are reported.
+    """
+
+    # Arrange
+    catalog = synthetic_catalog(500)
+    index = EarthquakeSpatialIndex()
+    index.build(catalog)
+    index.nearest(0.0, 0.0)
+
+    # Act
+    selected = index.select(100_000, 400_000, 7.0)
+    stats = index.statistics()
+
+    # Assert
+    assert np.all(np.diff(selected.times) >= 0)
+    assert np.all(selected.magnitudes >= 7.0)
+    assert len(selected) == int(
+        np.sum((catalog.times >= 100_000) & (catalog.times <= 400_000) & (catalog.magnitudes >= 7.0))
+    )
+    assert stats["events"] == 500
+    assert stats["memory_bytes"] > 0
+    assert stats["build_count"] == 1
+    assert stats["query_count"] == 1